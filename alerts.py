@@ -0,0 +1,310 @@
+"""
+Threshold alert engine over streamed predictions.
+
+Subscriptions (JSON list) come in two kinds:
+
+    {"id": "s1", "station": "klang", "type": "threshold", "threshold": 150,
+     "hysteresis": 10, "cooldown_minutes": 60}
+    {"id": "s2", "station": "*", "type": "worsen", "steps": 2, "window_hours": 3,
+     "cooldown_minutes": 180}
+
+"threshold" fires when a station's AQI rises above the threshold. The rule then stays
+quiet until the AQI falls back to threshold - hysteresis, so a value hovering around
+the line doesn't flap. "worsen" fires when the AQI category is at least `steps` bands
+worse than the best band seen in the last `window_hours`. Every rule also has a
+cooldown. "*" applies a rule to every station.
+
+Rules are indexed rather than scanned. Thresholds are kept sorted per station, and an
+upward move from p to v only visits thresholds in [p, v) by bisection. Only rules that
+have fired and are waiting to re-arm are checked on the way down. Worsen rules are
+grouped by (steps, window). Each group costs one pass over the station's recent
+history and keeps its fired/re-armed state as a whole; its rules are only visited
+when the group fires. A rule whose condition holds during its cooldown is remembered
+and delivered once the cooldown ends, unless it has re-armed by then.
+
+    python alerts.py subscriptions.json readings.jsonl --sink alerts.jsonl \
+        [--webhook http://127.0.0.1:8765/alerts]   # stations_fixture.py stands in for a receiver
+
+Each input line is {"station", "ts", "aqi"}, or {"station", "ts", <model features>} to
+be checked by sensor_qc.py and scored in micro-batches through the pipeline.
+"""
+import argparse
+import json
+import queue
+import sys
+import threading
+from bisect import bisect_left, insort
+from collections import defaultdict, deque
+from datetime import datetime, timedelta
+
+from schema import AQI_CATEGORIES, AQI_BREAKPOINTS, FEATURES
+from sensor_qc import SensorQC
+from truncation import trees_arg
+
+ANY_STATION = "*"
+
+
+def band(aqi: float) -> int:
+    """Index into AQI_CATEGORIES for a (rounded) AQI value"""
+    return bisect_left(AQI_BREAKPOINTS, round(aqi))
+
+
+class FileSink:
+    """Appends one JSON line per alert"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def deliver(self, alert: dict):
+        with open(self.path, "a", encoding="utf-8") as fh:
+            fh.write(json.dumps(alert) + "\n")
+
+
+class WebhookSink:
+    """POSTs alerts as JSON from a background thread so evaluation never waits on the network"""
+
+    def __init__(self, url: str, timeout: float = 5.0, queue_size: int = 10_000):
+        import requests
+        self.url = url
+        self.timeout = timeout
+        self.failed = 0
+        self._http = requests.Session()
+        self._queue = queue.Queue(maxsize=queue_size)
+        threading.Thread(target=self._run, name="alert-webhook", daemon=True).start()
+
+    def deliver(self, alert: dict):
+        try:
+            self._queue.put_nowait(alert)
+        except queue.Full:
+            self.failed += 1
+
+    def _run(self):
+        while True:
+            alert = self._queue.get()
+            try:
+                self._http.post(self.url, json=alert, timeout=self.timeout).raise_for_status()
+            except Exception:
+                self.failed += 1
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        self._queue.join()
+
+
+class AlertEngine:
+    """Indexed evaluation of threshold and worsen subscriptions"""
+
+    def __init__(self, subscriptions: list, sinks: list):
+        self.rules = {s["id"]: s for s in subscriptions}
+        self.sinks = sinks
+        # station -> sorted [(threshold, rule_id)]
+        self._thresholds = defaultdict(list)
+        # station -> {(steps, window_hours): [rule_id]}
+        self._worsen = defaultdict(lambda: defaultdict(list))
+        for rule in subscriptions:
+            station = rule.get("station", ANY_STATION)
+            if rule["type"] == "threshold":
+                insort(self._thresholds[station], (float(rule["threshold"]), rule["id"]))
+            elif rule["type"] == "worsen":
+                self._worsen[station][(int(rule["steps"]), float(rule["window_hours"]))].append(rule["id"])
+            else:
+                raise ValueError(f"Unknown subscription type {rule['type']!r} in {rule['id']!r}")
+
+        self._max_window = {station: timedelta(hours=max(w for _, w in groups))
+                            for station, groups in self._worsen.items()}
+        self._last_aqi = {}                        # station -> last AQI
+        self._history = defaultdict(deque)          # station -> (ts, band) within the longest window
+        self._armed_out = defaultdict(set)          # station -> threshold rules waiting to re-arm
+        self._worsened = defaultdict(set)           # station -> worsen groups waiting to re-arm
+        # Rules whose condition held while they were in cooldown; delivered once it ends
+        self._cooling = defaultdict(dict)           # station -> {threshold rule_id: threshold}
+        self._cooling_worsen = defaultdict(dict)    # station -> {worsen group: {rule_id}}
+        self._last_fired = {}                       # (station, rule_id) -> ts
+        self.fired = 0
+
+    def _fire(self, station, rule_id, ts, aqi, reason):
+        rule = self.rules[rule_id]
+        cooldown = timedelta(minutes=float(rule.get("cooldown_minutes", 0)))
+        last = self._last_fired.get((station, rule_id))
+        if last is not None and ts - last < cooldown:
+            return None
+        self._last_fired[(station, rule_id)] = ts
+        alert = {"subscription": rule_id, "station": station, "ts": ts.isoformat(),
+                 "aqi": round(aqi), "category": AQI_CATEGORIES[band(aqi)][0], "reason": reason}
+        for sink in self.sinks:
+            sink.deliver(alert)
+        self.fired += 1
+        return alert
+
+    def _threshold_rules(self, station, lo, hi):
+        """Rules for this station (and '*') with lo <= threshold < hi"""
+        for key in (station, ANY_STATION):
+            entries = self._thresholds.get(key)
+            if not entries:
+                continue
+            start = bisect_left(entries, (lo, ""))
+            stop = bisect_left(entries, (hi, ""))
+            yield from entries[start:stop]
+
+    def observe(self, station: str, ts: datetime, aqi: float) -> list:
+        """Evaluate one prediction; returns the alerts it fired"""
+        fired = []
+        previous = self._last_aqi.get(station, float("-inf"))
+        self._last_aqi[station] = aqi
+        waiting = self._armed_out[station]
+        cooling = self._cooling[station]
+
+        # Re-arm rules whose value has fallen back below threshold - hysteresis
+        if waiting and aqi < previous:
+            for rule_id in list(waiting):
+                rule = self.rules[rule_id]
+                if aqi <= float(rule["threshold"]) - float(rule.get("hysteresis", 0)):
+                    waiting.discard(rule_id)
+
+        # Crossings suppressed by a cooldown: deliver once it has passed if the AQI is
+        # still above the threshold, forget them if the value re-armed meanwhile
+        for rule_id, threshold in list(cooling.items()):
+            if aqi <= threshold - float(self.rules[rule_id].get("hysteresis", 0)):
+                del cooling[rule_id]
+            elif aqi > threshold:
+                alert = self._fire(station, rule_id, ts, aqi, f"AQI rose above {threshold:g}")
+                if alert:
+                    del cooling[rule_id]
+                    waiting.add(rule_id)
+                    fired.append(alert)
+
+        # Upward crossings: only thresholds between the previous and current value
+        if aqi > previous:
+            for threshold, rule_id in self._threshold_rules(station, previous, aqi):
+                if rule_id in waiting or rule_id in cooling:
+                    continue
+                alert = self._fire(station, rule_id, ts, aqi, f"AQI rose above {threshold:g}")
+                if alert:
+                    waiting.add(rule_id)
+                    fired.append(alert)
+                else:
+                    cooling[rule_id] = threshold
+
+        # Category worsening within a window; state is per group, rules are visited only to fire
+        groups = [((key, *group), ids) for key in (station, ANY_STATION)
+                  for group, ids in self._worsen.get(key, {}).items()]
+        if groups:
+            history = self._history[station]
+            current = band(aqi)
+            history.append((ts, current))
+            horizon = ts - max(self._max_window.get(station, timedelta(0)),
+                               self._max_window.get(ANY_STATION, timedelta(0)))
+            while history and history[0][0] < horizon:
+                history.popleft()
+            worsened = self._worsened[station]
+            cooling = self._cooling_worsen[station]
+            for group, rule_ids in groups:
+                _, steps, window_hours = group
+                since = ts - timedelta(hours=window_hours)
+                best = min(b for t, b in history if t >= since)
+                if current - best < steps:
+                    worsened.discard(group)  # re-arms every rule in the group
+                    cooling.pop(group, None)
+                    continue
+                if group in worsened:
+                    # Still worse: retry only the rules a cooldown held back
+                    rule_ids = cooling.pop(group, ())
+                    if not rule_ids:
+                        continue
+                worsened.add(group)
+                for rule_id in rule_ids:
+                    alert = self._fire(station, rule_id, ts, aqi,
+                                       f"Category worsened {current - best} steps within {window_hours:g} h")
+                    if alert:
+                        fired.append(alert)
+                    else:
+                        cooling.setdefault(group, set()).add(rule_id)
+        return fired
+
+
+def read_predictions(lines, batch_size: int = 256, bundle=None, trees=None, qc=None, quarantine=None):
+    """
+    Yield (station, ts, aqi) from JSON lines, scoring raw readings in micro-batches.
+    With a sensor_qc.SensorQC, raw readings are checked first: flagged values are imputed,
+    or the reading is passed to `quarantine` (a sink) and never scored.
+    """
+    batch = []
+
+    def _flush():
+        raw = [r for r in batch if "aqi" not in r]
+        if raw:
+            import pandas as pd
+
+            from pipeline import score_frame
+            frame = pd.DataFrame(raw, columns=FEATURES).apply(pd.to_numeric, errors="coerce")
+            if qc is not None:
+                checked = qc.process([r["station"] for r in raw], frame.to_numpy())
+                for record, reasons, held in zip(raw, checked["reasons"], checked["quarantined"]):
+                    if held:
+                        record["quarantined"] = reasons
+                        if quarantine is not None:
+                            quarantine.deliver(record)
+                keep = ~checked["quarantined"]
+                raw = [r for r, k in zip(raw, keep) if k]
+                frame = pd.DataFrame(checked["values"][keep], columns=FEATURES)
+            scored = score_frame(frame, bundle, trees) if raw else []
+            for record, aqi in zip(raw, scored):
+                record["aqi"] = float(aqi)
+        for record in batch:
+            if "quarantined" not in record:
+                yield record["station"], datetime.fromisoformat(record["ts"]), float(record["aqi"])
+        batch.clear()
+
+    for line in lines:
+        if line.strip():
+            batch.append(json.loads(line))
+        if len(batch) >= batch_size:
+            yield from _flush()
+    yield from _flush()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("subscriptions", help="JSON file with a list of subscriptions")
+    parser.add_argument("input", nargs="?", default="-", help="JSON-lines predictions/readings (default: stdin)")
+    parser.add_argument("--sink", default="alerts.jsonl", help="File that receives alerts as JSON lines")
+    parser.add_argument("--webhook", help="Also POST each alert to this URL")
+    parser.add_argument("--batch", type=int, default=256, help="Micro-batch size for scoring raw readings")
+    parser.add_argument("--bundle", help="Model bundle for raw readings (default: repo root)")
+    parser.add_argument("--trees", type=trees_arg, help="Boosting iterations to evaluate, or 'early' "
+                        "(exact categories for worsen rules, approximate AQI for thresholds)")
+    parser.add_argument("--qc", choices=["impute", "quarantine", "off"], default="impute",
+                        help="Sensor fault handling for raw readings (see sensor_qc.py)")
+    parser.add_argument("--quarantine-out", default="quarantine.jsonl",
+                        help="File that receives quarantined readings with their reasons")
+    args = parser.parse_args(argv)
+
+    with open(args.subscriptions, encoding="utf-8") as fh:
+        subscriptions = json.load(fh)
+    sinks = [FileSink(args.sink)]
+    if args.webhook:
+        sinks.append(WebhookSink(args.webhook))
+    engine = AlertEngine(subscriptions, sinks)
+
+    from pipeline import ROOT, load_bundle
+    bundle = load_bundle(args.bundle or ROOT)
+    qc = None if args.qc == "off" else SensorQC(args.qc)
+    stream = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    observed = 0
+    with stream:
+        for station, ts, aqi in read_predictions(stream, args.batch, bundle, args.trees, qc,
+                                                 FileSink(args.quarantine_out)):
+            engine.observe(station, ts, aqi)
+            observed += 1
+    for sink in sinks:
+        if hasattr(sink, "flush"):
+            sink.flush()
+    print(f"{observed:,} predictions, {len(subscriptions):,} subscriptions, {engine.fired:,} alerts -> {args.sink}")
+    if qc is not None:
+        print(f"{qc.flagged:,} readings flagged by QC, {qc.quarantined:,} quarantined -> {args.quarantine_out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
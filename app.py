@@ -1,15 +1,11 @@
 import streamlit as st
-import pandas as pd
 import numpy as np
-import joblib
-import plotly.express as px
-import plotly.graph_objects as go
 import base64
-import shap
+import threading
+import time
 import urllib.parse
-from plotly.subplots import make_subplots
 from pathlib import Path
-from base64 import b64encode
+from schema import AQI_BREAKPOINTS, AQI_CATEGORIES, FEATURE_RANGES, FEATURES, get_aqi_category
 from streamlit.components.v1 import html
 from datetime import datetime
 import warnings
@@ -26,6 +22,12 @@ st.set_page_config(
     initial_sidebar_state="collapsed",
 )
 
+# One-shot cProfile capture armed from the operator panel; a single dict lookup otherwise
+_run_profiler = None
+if st.session_state.pop("profile_next_run", False):
+    import runprof
+    _run_profiler = runprof.start()
+
 defaults = {
     "current_tab": "Predict AQI",
     "aqi_value": None,
@@ -237,9 +239,61 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Load transformers and model
-pt_features = joblib.load('pt_features.pkl')
-pt_target = joblib.load('pt_target.pkl')
-model = joblib.load('lgb_tuned_model_20250901_105103.pkl')
+# Heavy libraries (pandas, scikit-learn, LightGBM, SHAP, Plotly) are imported inside the
+# functions and tabs that use them, so Learn/Contact and Products never pay for them and
+# the Predict tab never loads SHAP. Run bench/import_times.py to check the per-tab cost.
+@st.cache_resource(show_spinner=False)
+def load_model_pool():
+    """Region -> bundle routing (regions.json), one pool per process"""
+    from model_pool import ModelPool
+    return ModelPool.from_config()
+
+
+def load_artifacts():
+    """The default region's transformers and model, loaded once per process"""
+    return load_model_pool().get()
+
+
+@st.cache_resource(show_spinner=False)
+def load_station_feed():
+    """Shared live station feed client, or None when no feed is configured"""
+    feed_url = st.secrets.get("STATION_FEED_URL", "")
+    if not feed_url:
+        return None
+    from stations import StationFeed
+    return StationFeed(feed_url, list_url=st.secrets.get("STATION_LIST_URL", "") or None)
+
+
+@st.cache_resource(show_spinner=False)
+def load_snapshot_store():
+    """Hourly per-station AQI written by `python snapshots.py hourly`"""
+    from snapshots import SnapshotStore
+    return SnapshotStore()
+
+
+@st.cache_resource(show_spinner=False)
+def load_shadow_scorer():
+    """Candidate bundle scored in the background on live inputs, or None when not configured"""
+    bundle_dir = st.secrets.get("SHADOW_BUNDLE", "")
+    if not bundle_dir:
+        return None
+    from shadow import ShadowScorer
+    return ShadowScorer(bundle_dir, st.secrets.get("SHADOW_STORE", "shadow.sqlite"),
+                        primary_version=load_artifacts()["version"])
+
+
+# How often the drift monitor scores the inputs collected since its last run
+DRIFT_INTERVAL_SECONDS = 15 * 60
+
+
+@st.cache_resource(show_spinner=False)
+def load_drift_monitor(region):
+    """Input/prediction drift monitor for one resolved region, scored against that region's
+    bundle (reports from every region go to drift_log.jsonl, tagged with the region)"""
+    from drift import DriftMonitor, load_reference
+    monitor = DriftMonitor(load_reference(load_model_pool().get(region)), region=region)
+    monitor.start(DRIFT_INTERVAL_SECONDS, "drift_log.jsonl")
+    return monitor
 
 # Initialize session state
 if 'current_tab' not in st.session_state:
@@ -269,6 +323,14 @@ with col4:
         st.session_state.current_tab = "Products"
         
 
+# Input keys in predict_aqi argument order
+INPUT_KEYS = ["so2", "co", "o3", "o3_8hr", "pm10", "pm25", "no2", "nox", "co_8hr",
+              "pm25_avg", "pm10_avg", "so2_avg", "windspeed", "winddirec"]
+
+# Model feature behind each input key (same order as FEATURES)
+FEATURE_BY_KEY = dict(zip(INPUT_KEYS, FEATURES))
+
+
 # Boxes for precise user input
 def precise_slider(label, min_val, max_val, default, step, *, key, help=""):
     """
@@ -282,12 +344,18 @@ def precise_slider(label, min_val, max_val, default, step, *, key, help=""):
     if base_key not in st.session_state:
         st.session_state[base_key] = default
 
-    # Local callbacks that only update the shared value
+    # The widgets take their value from their keys (not value=), so the shared value can
+    # also be changed from outside the widgets, see set_input_value
+    for widget_key in (slider_key, num_key):
+        if widget_key not in st.session_state:
+            st.session_state[widget_key] = st.session_state[base_key]
+
+    # Local callbacks that keep the shared value and the other widget in sync
     def _from_slider():
-        st.session_state[base_key] = st.session_state[slider_key]
+        st.session_state[base_key] = st.session_state[num_key] = st.session_state[slider_key]
 
     def _from_number():
-        st.session_state[base_key] = st.session_state[num_key]
+        st.session_state[base_key] = st.session_state[slider_key] = st.session_state[num_key]
 
     col_s, col_n = st.columns([5, 1], gap="small")
     
@@ -298,7 +366,6 @@ def precise_slider(label, min_val, max_val, default, step, *, key, help=""):
         max_value=max_val,
         step=step,
         key=slider_key,
-        value=st.session_state[base_key],
         help=help,
         on_change=_from_slider,
     )
@@ -314,7 +381,6 @@ def precise_slider(label, min_val, max_val, default, step, *, key, help=""):
         max_value=max_val,
         step=step,
         key=num_key,
-        value=st.session_state[base_key],
         format="%.1f",
         label_visibility="hidden",
         on_change=_from_number,
@@ -323,32 +389,99 @@ def precise_slider(label, min_val, max_val, default, step, *, key, help=""):
     return float(st.session_state[base_key])
 
 
-# To display images
-def get_base64_image(image_path):
-    """Convert local image to base64 string"""
+def set_input_value(key, value):
+    """Set a precise_slider's value from code; call from a callback or before the widgets render"""
+    min_val, max_val, step = FEATURE_RANGES[FEATURE_BY_KEY[key]]
+    # Snap to the slider's step grid (rounding away float noise such as 0.30000000000000004)
+    value = round(min_val + round((float(value) - min_val) / step) * step, 6)
+    value = float(min(max(value, min_val), max_val))
+    for prefix in ("val", "sl", "ni"):
+        st.session_state[f"{prefix}_{key}"] = value
+
+
+def prefill_from_station(feed, station):
+    """Button callback: load a station's latest readings into the inputs"""
+    from stations import StationFeedError
+    try:
+        readings = feed.readings(station)
+    except StationFeedError as e:
+        st.session_state.station_error = str(e)
+        return
+    st.session_state.station_error = None
+    for key, feature in FEATURE_BY_KEY.items():
+        if feature in readings:
+            set_input_value(key, readings[feature])
+
+
+def fetch_station_list(feed):
+    """
+    Store the feed's station list in session state. Called once per full run, so moving
+    a slider (which reruns only input_panel) never waits on the feed.
+    """
+    from stations import StationFeedError
     try:
-        with open(image_path, "rb") as img_file:
-            return base64.b64encode(img_file.read()).decode()
-    except FileNotFoundError:
-        st.error(f"Image not found: {image_path}")
+        st.session_state.station_list, st.session_state.station_list_error = feed.stations(), None
+    except StationFeedError as e:
+        st.session_state.station_list, st.session_state.station_list_error = [], str(e)
+
+
+def station_picker(feed):
+    """Station selector that prefills the sliders from the live feed"""
+    if st.session_state.get("station_list_error"):
+        st.warning(f"Station list unavailable: {st.session_state.station_list_error}")
+        return
+    stations = st.session_state.get("station_list")
+    if not stations:
+        return
+    names = {s["id"]: s["name"] for s in stations}
+
+    col_s, col_b = st.columns([3, 1], gap="small", vertical_alignment="bottom")
+    station = col_s.selectbox("Monitoring station", list(names), format_func=names.get, key="station")
+    col_b.button("📡 Load readings", key="load_station", use_container_width=True,
+                 on_click=prefill_from_station, args=(feed, station))
+
+    # Today's precomputed hourly AQI for the station, when the snapshot job has run
+    today = load_snapshot_store().day(station, datetime.now().date())
+    if today is not None and not np.isnan(today).all():
+        latest_hour = int(np.flatnonzero(~np.isnan(today))[-1])
+        st.caption(f"{names[station]} at {latest_hour:02d}:00: AQI {today[latest_hour]:.0f}")
+        st.line_chart({"AQI": today[:latest_hour + 1]}, height=120)
+    if st.session_state.get("station_error"):
+        st.warning(st.session_state.station_error)
+
+
+# To display images
+@st.cache_data(show_spinner=False)
+def get_base64_asset(asset_path):
+    """Base64-encode a static asset once per process instead of on every rerun"""
+    path = Path(asset_path)
+    if not path.exists():
         return None
+    return base64.b64encode(path.read_bytes()).decode("ascii")
 
 
 # Helper functions
-def get_aqi_category(aqi_value):
-    """Return AQI category and color based on the range it falls into"""
-    if aqi_value <= 50:
-        return "Good", "good", "#00e400"
-    elif aqi_value <= 100:
-        return "Moderate", "moderate", "#ffff00"
-    elif aqi_value <= 150:
-        return "Unhealthy for Sensitive Groups", "unhealthy-sensitive", "#ff7e00"
-    elif aqi_value <= 200:
-        return "Unhealthy", "unhealthy", "#ff0000"
-    elif aqi_value <= 300:
-        return "Very Unhealthy", "very-unhealthy", "#9f7aea"
-    else:
-        return "Hazardous", "hazardous", "#7e0023"
+def aqi_interval_band(lower, median, upper, scale_max=500):
+    """HTML AQI scale with the category colors, a shaded lower-upper band and a median marker"""
+    pct = lambda v: min(max(v, 0), scale_max) / scale_max * 100
+    bounds = [0] + AQI_BREAKPOINTS + [scale_max]
+    segments = "".join(
+        f'<div style="position:absolute;left:{pct(lo)}%;width:{pct(hi) - pct(lo)}%;height:100%;'
+        f'background:{color};opacity:0.35"></div>'
+        for (lo, hi), (_, _, color) in zip(zip(bounds, bounds[1:]), AQI_CATEGORIES)
+    )
+    return f"""
+    <div style="position:relative;height:18px;border-radius:9px;overflow:hidden;background:#edf2f7;margin:6px 0 4px">
+        {segments}
+        <div style="position:absolute;left:{pct(lower)}%;width:{max(pct(upper) - pct(lower), 0.6)}%;height:100%;
+                    background:rgba(45,55,72,0.45);border-radius:4px"></div>
+        <div style="position:absolute;left:calc({pct(median)}% - 1px);width:3px;height:100%;background:#1a202c"></div>
+    </div>
+    <div style="display:flex;justify-content:space-between;color:#718096;font-size:0.75rem">
+        <span>0</span><span>{scale_max}+</span>
+    </div>
+    """
+
 
 def get_health_recommendations(aqi_value, category):
     # Return health recommendations based on AQI
@@ -386,19 +519,6 @@ def get_health_recommendations(aqi_value, category):
     }
     return recommendations.get(category, [])
 
-# Define skewed features that were transformed during training
-SKEWED_FEATURES = [
-    "o3_8hr",
-    "pm10",
-    "pm2.5",
-    "no2",
-    "nox",
-    "pm2.5_avg",
-    "pm10_avg",
-    "so2_avg",
-    "windspeed"
-]
-
 # Define label names for plots
 FEATURE_LABELS = {
     "pm2.5": "PM₂.₅ (µg/m³)",
@@ -418,14 +538,47 @@ FEATURE_LABELS = {
 }
 
 
+# model_ms is set by score_inputs when its body runs, i.e. on a cache miss, for this thread
+_scoring = threading.local()
+
+
+@st.cache_data(show_spinner=False, max_entries=4096)
+def score_inputs(items: tuple, num_iteration=None, region=None):
+    """
+    Score one input vector given as ((feature, value), ...) with the region's bundle.
+    Returns (aqi_int, transformed 1-row DF, (lower, median, upper) or None).
+    num_iteration truncates the ensemble (see truncation.py).
+    """
+    import pandas as pd
+    from intervals import has_interval, predict_interval
+    from pipeline import predict_model_space, transform_features
+    bundle = load_model_pool().get(region)
+
+    # Apply pt_features to the skewed subset, predict, then invert pt_target
+    transformed = transform_features(pd.DataFrame([dict(items)]), bundle)
+    # Only the point model's single-row predict is timed, as the shadow scorer times its candidate
+    start = time.perf_counter()
+    y_model = predict_model_space(transformed, bundle, num_iteration)
+    _scoring.model_ms = (time.perf_counter() - start) * 1000
+    if not has_interval(bundle):
+        aqi = bundle["pt_target"].inverse_transform(y_model.reshape(-1, 1))[0, 0]
+        return int(round(aqi)), transformed, None
+
+    # Interval members share the transformed input; the median is the point model
+    lower, aqi, upper = predict_interval(transformed, bundle, num_iteration, y_med=y_model)[0]
+    return int(round(aqi)), transformed, (int(round(lower)), int(round(aqi)), int(round(upper)))
+
+
 def predict_aqi(so2, co, o3, o3_8hr, pm10, pm25, no2, nox, co_8hr, pm25_avg, 
-                pm10_avg, so2_avg, windspeed, winddirec, record_history: bool = False):
+                pm10_avg, so2_avg, windspeed, winddirec, record_history: bool = False,
+                num_iteration=None, region=None, preview: bool = False):
     """
     Build a 1-row DataFrame with all features, then:
       1) Apply pt_features only to the skewed subset,
       2) Pass the full transformed DataFrame to the model,
       3) Inverse-transform the model's output via pt_target back to real AQI.
       4) Store everything for Analytics. If record_history=True, it will append to a simple in-memory history.
+    Live previews (preview=True) are intermediate values and are kept out of the drift monitor.
     """
     # 1) Assemble inputs (including untransformed features)
     data = {
@@ -445,27 +598,28 @@ def predict_aqi(so2, co, o3, o3_8hr, pm10, pm25, no2, nox, co_8hr, pm25_avg,
         "winddirec":  winddirec,
     }
 
-    # Create DataFrame
-    input_df = pd.DataFrame([data])
-
-    # 2) Copy and transform only the skewed columns
-    transformed = input_df.copy()
-    # This will only touch the columns in SKEWED_FEATURES that are present in input_df
-    to_transform = [c for c in SKEWED_FEATURES if c in input_df.columns]
-    transformed[to_transform] = pt_features.transform(input_df[to_transform])
-
-    # 3) Model prediction in the transformed target space
-    y_trans = model.predict(transformed).reshape(-1, 1)
-
-    # 4) Invert Yeo–Johnson transform back to original AQI units
-    aqi = pt_target.inverse_transform(y_trans).flatten()[0]
-    aqi_int = int(round(aqi))
+    # 2-3) Transform, predict and invert (shared across sessions for repeated input vectors)
+    pool = load_model_pool()
+    region = pool.resolve(region)
+    _scoring.model_ms = None
+    aqi_int, transformed, interval = score_inputs(tuple(data.items()), num_iteration, region)
+    # None on cache hits, which say nothing about the model's latency
+    primary_model_ms = _scoring.model_ms
+
+    if not preview:
+        load_drift_monitor(region).observe(data.values(), aqi_int)
+    shadow = load_shadow_scorer()
+    # The shadow candidate is compared against the full default-region model only
+    if shadow is not None and num_iteration is None and region == pool.default:
+        shadow.submit(data.values(), aqi_int, primary_model_ms)
 
     # Store prediction data in session state for analytics
     st.session_state.prediction_data = {
         'overall_aqi': aqi_int,
         'input_values': data,
-        'transformed_input': transformed
+        'transformed_input': transformed,
+        'interval': interval,
+        'region': region
     }
 
     # Maintain a small prediction history
@@ -479,21 +633,30 @@ def predict_aqi(so2, co, o3, o3_8hr, pm10, pm25, no2, nox, co_8hr, pm25_avg,
     return aqi_int
 
 
-# SHAP helper function
-def compute_shap(row_df: pd.DataFrame):
-    """Returns (shap_values_1d, expected_value, feature_names) for a single-row DF"""
-    explainer = shap.TreeExplainer(model)
-    shap_vals = explainer.shap_values(row_df)
+# SHAP helper functions
+@st.cache_resource(show_spinner=False)
+def load_explainer():
+    """Process-wide explanation admission control (see explain.py)"""
+    from explain import Explainer
+    return Explainer(shap_slots=int(st.secrets.get("EXPLAIN_SLOTS", 2)),
+                     max_waiting=int(st.secrets.get("EXPLAIN_MAX_WAITING", 8)))
 
-    if isinstance(shap_vals, list):
-        shap_vals = shap_vals[0]
-    shap_row = shap_vals[0]
 
-    exp_val = explainer.expected_value
-    if isinstance(exp_val, (list, np.ndarray)):
-        exp_val = exp_val[0]
+def load_tree_explainer(region):
+    """One TreeExplainer per resident regional model, held by the pool (see ModelPool.derived)"""
+    def _build(bundle):
+        import shap
+        return shap.TreeExplainer(bundle["model"])
+    return load_model_pool().derived(region, "tree_explainer", _build)
 
-    return shap_row, exp_val, list(row_df.columns)
+
+def compute_shap(row_df: "pd.DataFrame", region=None):
+    """
+    {"values", "expected", "features", "method"} for a single-row DF. Under load this
+    degrades to cached, pred_contrib or no per-row values ("importance").
+    """
+    return load_explainer().explain_row(row_df, load_model_pool().get(region),
+                                        lambda: load_tree_explainer(region))
 
 
 # Clinic Finder using Google Maps API
@@ -777,7 +940,7 @@ def amazon_search_link(query: str, marketplace: str = "www.amazon.com") -> str:
 def product_card(title: str, description: str, url: str, image_path: str | None = None):
     if image_path and Path(image_path).exists():
         # Get base64 encoded image
-        img_base64 = get_base64_image(image_path)
+        img_base64 = get_base64_asset(image_path)
         if img_base64:
             # Detect image format
             image_format = Path(image_path).suffix.lower().replace('.', '')
@@ -805,167 +968,695 @@ def product_card(title: str, description: str, url: str, image_path: str | None
     )
 
 
+# Operator tools
+def is_operator():
+    """Operator tools are only shown with ?ops=<OPS_TOKEN> when OPS_TOKEN is set in st.secrets"""
+    token = st.secrets.get("OPS_TOKEN", "")
+    return bool(token) and st.query_params.get("ops") == token
+
+
+@st.cache_resource(show_spinner=False)
+def load_memory_profiler():
+    from memprof import MemoryProfiler
+    return MemoryProfiler()
+
+
+def memory_section():
+    profiler = load_memory_profiler()
+    st.markdown("**Memory**")
+    col_a, col_b = st.columns(2)
+    if not profiler.tracing:
+        col_a.button("Start tracing", key="mem_start", on_click=profiler.start, use_container_width=True)
+    else:
+        col_a.button("Stop tracing", key="mem_stop", on_click=profiler.stop, use_container_width=True)
+        if col_b.button("Snapshot", key="mem_snap", disabled=profiler.busy, use_container_width=True):
+            profiler.request_snapshot(datetime.now().strftime("%H:%M:%S"))
+            st.caption("Snapshot requested; refresh in a moment.")
+
+    # Options are snapshot timestamps, so a selection stays on its snapshot as the deque rotates
+    labels = {taken_at: label for label, taken_at, _ in list(profiler.snapshots)}
+    if len(labels) >= 2:
+        times = list(labels)
+        older = st.selectbox("From", times, format_func=labels.__getitem__, index=len(times) - 2, key="mem_from")
+        newer = st.selectbox("To", times, format_func=labels.__getitem__, index=len(times) - 1, key="mem_to")
+        rows = profiler.diff(older, newer)
+        if rows is None:
+            st.caption("That snapshot has just been rotated out; pick another.")
+        else:
+            st.table([{"where": owner, "KiB": round(size / 1024, 1), "blocks": count}
+                      for owner, size, count in rows])
+
+    # The heap walk is shared between operators and refreshed at most once per TTL
+    if st.button("Count objects", key="mem_objects", use_container_width=True):
+        st.json(profiler.object_report(st.session_state.to_dict()), expanded=False)
+
+
+def profile_section():
+    st.markdown("**Run profile**")
+    if st.button("Profile a rerun of this view", key="prof_now", use_container_width=True):
+        st.session_state.profile_next_run = True
+        st.rerun()
+    if st.button("Profile my next page change", key="prof_next", use_container_width=True):
+        st.session_state.profile_next_run = True
+        st.caption("Armed: the next full script run will be captured.")
+    st.caption("Widgets inside panels rerun only their fragment and are not captured.")
+
+    result = st.session_state.get("run_profile")
+    if result is None:
+        return
+    with st.expander(f"{result['label']} · {result['total_ms']:,} ms", expanded=True):
+        st.dataframe(result["top"], hide_index=True, use_container_width=True)
+        stamp = result["label"].replace(" ", "_").replace(":", "")
+        st.download_button("Raw stats (.pstats)", result["pstats"], file_name=f"{stamp}.pstats",
+                           mime="application/octet-stream", key="prof_pstats", use_container_width=True)
+        st.download_button("Collapsed stacks", result["collapsed"], file_name=f"{stamp}.folded",
+                           mime="text/plain", key="prof_folded", use_container_width=True)
+
+
+@st.fragment
+def operator_panel():
+    st.subheader("🛠️ Operator")
+    profile_section()
+    memory_section()
+    st.markdown("**Explanations**")
+    st.json(load_explainer().metrics(), expanded=False)
+    if len(load_model_pool().regions) > 1:
+        st.markdown("**Model pool**")
+        st.json(load_model_pool().stats(), expanded=False)
+
+
 # MAIN content based on selected tab
-if st.session_state.current_tab == "Predict AQI":
-    # Main prediction interface
-    col1, col2 = st.columns([1, 1], gap="large")
+# Each panel below is a fragment: a widget inside it only reruns that fragment, not the
+# CSS, header, navigation and footer around it.
+@st.fragment
+def input_panel():
+    st.markdown("""
+    <div class="feature-card">
+        <div style="display: flex; align-items: center; gap: 10px; margin-bottom: 20px;">
+            <div class="feature-icon">🎛️</div>
+            <h2>Environmental Parameters</h2>
+        </div>
+    """, unsafe_allow_html=True)
     
-    with col1:
-        st.markdown("""
-        <div class="feature-card">
-            <div style="display: flex; align-items: center; gap: 10px; margin-bottom: 20px;">
-                <div class="feature-icon">🎛️</div>
-                <h2>Environmental Parameters</h2>
-            </div>
-        """, unsafe_allow_html=True)
-        
-        # Input sliders
-        so2         = precise_slider(
-                          "SO₂ Concentration (ppb)", 0.0, 1004.0, 10.0, 1.0, 
-                          key="so2", help="Sulphur dioxide level"
-                      )
-        co          = precise_slider(
-                          "CO Concentration (ppm)", 0.0, 50.4, 0.5, 0.1, 
-                          key="co", help="Carbon monoxide level"
-                      )
-        o3          = precise_slider(
-                          "O₃ 1-hr Concentration (ppb)", 0.0, 604.0, 0.0, 1.0, 
-                          key="o3", help="Ozone level over the past hour"
-                      )
-        o3_8hr      = precise_slider(
-                          "O₃ 8-hr Average Concentration (ppb)", 0.0, 200.0, 45.0, 1.0, 
-                          key="o3_8hr", help="Mean O₃ over the past 8 hours"
-                      )
-        pm10        = precise_slider(
-                          "PM₁₀ Concentration (µg/m³)", 0.0, 604.0, 50.0, 0.1, 
-                          key="pm10", help="Coarse particulate matter"
-                      )
-        pm25        = precise_slider(
-                          "PM₂.₅ Concentration (µg/m³)", 0.0, 500.4, 35.0, 0.1, 
-                          key="pm25", help="Fine particulate matter"
-                      )
-        no2         = precise_slider(
-                          "NO₂ Concentration (ppb)", 0.0, 2049.0, 15.0, 1.0, 
-                          key="no2", help="Nitrogen dioxide level"
-                      )
-        nox         = precise_slider(
-                          "NOₓ Concentration (ppb)", 0.0, 2049.0, 20.0, 1.0, 
-                          key="nox", help="Total NOₓ level"
-                      )
-        co_8hr      = precise_slider(
-                          "CO 8-hr Average Concentration (ppm)", 0.0, 50.4, 1.0, 0.1, 
-                          key="co_8hr", help="Mean CO over the past 8 hours"
-                      )
-        pm25_avg    = precise_slider(
-                          "PM₂.₅ 24-hr Average Concentration (µg/m³)", 0.0, 500.4, 35.0, 0.1, 
-                          key="pm25_avg", help="Mean PM₂.₅ over the past 24 hours"
-                      )
-        pm10_avg    = precise_slider(
-                          "PM₁₀ 24-hr Average Concentration (µg/m³)", 0.0, 604.0, 50.0, 0.1, 
-                          key="pm10_avg", help="Mean PM₁₀ over the past 24 hours"
-                      )
-        so2_avg     = precise_slider(
-                          "SO₂ 24-hr Average Concentration (ppb)", 0.0, 1004.0, 8.0, 1.0, 
-                          key="so2_avg", help="Mean SO₂ over the past 24 hours"
-                      )
-        windspeed   = precise_slider(
-                          "Wind Speed (m/s)", 0.0, 30.0, 5.0, 0.1, 
-                          key="windspeed", help="Dispersion effect"
-                      )
-        winddirec   = precise_slider(
-                          "Wind Direction (°)", 0.0, 359.0, 10.0, 1.0, 
-                          key="winddirec", help="Direction from which wind originates"
-                      )
-        
-        predict_button = st.button("🔮 Predict Air Quality", type="primary", use_container_width=True)
-        
-        st.markdown("</div>", unsafe_allow_html=True)
+    # Optional live station data
+    feed = load_station_feed()
+    if feed is not None:
+        station_picker(feed)
+
+    # Regional models, when regions.json lists more than one
+    regions = list(load_model_pool().regions)
+    if len(regions) > 1:
+        # "region" is plain session state; the widget key is dropped whenever Predict isn't
+        # rendered, so it is re-seeded from "region" (as precise_slider does with its base key)
+        st.session_state.setdefault("region", load_model_pool().resolve(st.query_params.get("region")))
+        if "sel_region" not in st.session_state:
+            st.session_state.sel_region = st.session_state.region
+
+        def _from_select():
+            st.session_state.region = st.session_state.sel_region
+
+        st.selectbox("Regional model", regions, key="sel_region", on_change=_from_select,
+                     help="Transformers and model trained for this region's monitoring network")
+
+    # Input sliders
+    so2         = precise_slider(
+                      "SO₂ Concentration (ppb)", 0.0, 1004.0, 10.0, 1.0, 
+                      key="so2", help="Sulphur dioxide level"
+                  )
+    co          = precise_slider(
+                      "CO Concentration (ppm)", 0.0, 50.4, 0.5, 0.1, 
+                      key="co", help="Carbon monoxide level"
+                  )
+    o3          = precise_slider(
+                      "O₃ 1-hr Concentration (ppb)", 0.0, 604.0, 0.0, 1.0, 
+                      key="o3", help="Ozone level over the past hour"
+                  )
+    o3_8hr      = precise_slider(
+                      "O₃ 8-hr Average Concentration (ppb)", 0.0, 200.0, 45.0, 1.0, 
+                      key="o3_8hr", help="Mean O₃ over the past 8 hours"
+                  )
+    pm10        = precise_slider(
+                      "PM₁₀ Concentration (µg/m³)", 0.0, 604.0, 50.0, 0.1, 
+                      key="pm10", help="Coarse particulate matter"
+                  )
+    pm25        = precise_slider(
+                      "PM₂.₅ Concentration (µg/m³)", 0.0, 500.4, 35.0, 0.1, 
+                      key="pm25", help="Fine particulate matter"
+                  )
+    no2         = precise_slider(
+                      "NO₂ Concentration (ppb)", 0.0, 2049.0, 15.0, 1.0, 
+                      key="no2", help="Nitrogen dioxide level"
+                  )
+    nox         = precise_slider(
+                      "NOₓ Concentration (ppb)", 0.0, 2049.0, 20.0, 1.0, 
+                      key="nox", help="Total NOₓ level"
+                  )
+    co_8hr      = precise_slider(
+                      "CO 8-hr Average Concentration (ppm)", 0.0, 50.4, 1.0, 0.1, 
+                      key="co_8hr", help="Mean CO over the past 8 hours"
+                  )
+    pm25_avg    = precise_slider(
+                      "PM₂.₅ 24-hr Average Concentration (µg/m³)", 0.0, 500.4, 35.0, 0.1, 
+                      key="pm25_avg", help="Mean PM₂.₅ over the past 24 hours"
+                  )
+    pm10_avg    = precise_slider(
+                      "PM₁₀ 24-hr Average Concentration (µg/m³)", 0.0, 604.0, 50.0, 0.1, 
+                      key="pm10_avg", help="Mean PM₁₀ over the past 24 hours"
+                  )
+    so2_avg     = precise_slider(
+                      "SO₂ 24-hr Average Concentration (ppb)", 0.0, 1004.0, 8.0, 1.0, 
+                      key="so2_avg", help="Mean SO₂ over the past 24 hours"
+                  )
+    windspeed   = precise_slider(
+                      "Wind Speed (m/s)", 0.0, 30.0, 5.0, 0.1, 
+                      key="windspeed", help="Dispersion effect"
+                  )
+    winddirec   = precise_slider(
+                      "Wind Direction (°)", 0.0, 359.0, 10.0, 1.0, 
+                      key="winddirec", help="Direction from which wind originates"
+                  )
     
-    with col2:
-        st.markdown("""
-        <div class="feature-card">
-            <div style="display: flex; align-items: center; gap: 10px; margin-bottom: 20px;">
-                <div class="feature-icon">📈</div>
-                <h2>AQI Prediction Results</h2>
-            </div>
-        """, unsafe_allow_html=True)
-        
-        # Make prediction
-        aqi_value = st.session_state.get("aqi_value")
+    # Combinations no working sensor set produces (e.g. NOx below NO2), usually a faulty reading
+    from sensor_qc import check_rules
+    _, violations = check_rules([[so2, co, o3, o3_8hr, pm10, pm25, no2, nox, co_8hr, pm25_avg,
+                                  pm10_avg, so2_avg, windspeed, winddirec]])
+    for _, message in violations.values():
+        st.warning(f"Check the readings: {message}.", icon="⚠️")
+
+    # Live mode: the result panel only polls while the inputs differ from the last live
+    # prediction. Moving a slider reruns just this fragment, so start the polling here.
+    if st.session_state.get("live_predict") and not st.session_state.get("live_polling"):
+        values = tuple(st.session_state.get(f"val_{k}") for k in INPUT_KEYS)
+        if values != st.session_state.get("live_scored"):
+            st.session_state.live_polling = True
+            st.rerun()
+
+    if st.button("🔮 Predict Air Quality", key="predict", type="primary", use_container_width=True):
+        st.session_state.aqi_value = predict_aqi(so2, co, o3, o3_8hr, pm10, pm25, no2, nox, co_8hr, pm25_avg,
+                                                 pm10_avg, so2_avg, windspeed, winddirec, record_history=True,
+                                                 region=st.session_state.get("region"))
+        # The result panel is its own fragment, so a new prediction reruns the whole app to refresh it
+        st.rerun()
+    
+    st.markdown("</div>", unsafe_allow_html=True)
+
+
+# Live mode polls the inputs at this interval and only scores once they have stayed the
+# same for a full tick, so a burst of slider moves costs one prediction. Polling stops
+# once that prediction is made and restarts when an input changes (see input_panel).
+LIVE_DEBOUNCE_SECONDS = 0.6
+# Live previews may use a truncated ensemble: an iteration count or "early" (see
+# bench/truncation_curve.py). The Predict button always scores with every tree.
+LIVE_PREVIEW_ITERATIONS = st.secrets.get("LIVE_PREVIEW_ITERATIONS") or None
+
+
+def live_predict():
+    """Score the current slider values once they have settled (live mode only)"""
+    values = tuple(st.session_state.get(f"val_{k}") for k in INPUT_KEYS)
+    if None in values:
+        return  # inputs not rendered yet
+    if values != st.session_state.get("live_scored"):
+        if values != st.session_state.get("live_pending"):
+            st.session_state.live_pending = values  # still moving; wait for the next tick
+            return
+        st.session_state.aqi_value = predict_aqi(*values, num_iteration=LIVE_PREVIEW_ITERATIONS,
+                                                 region=st.session_state.get("region"), preview=True)
+        st.session_state.live_scored = values
+    if st.session_state.get("live_polling"):
+        # Settled: rerun the app once so the panel is rebuilt without run_every
+        st.session_state.live_polling = False
+        st.rerun()
+
+
+def result_panel():
+    if st.session_state.get("live_predict"):
+        live_predict()
 
-        if predict_button:
-            aqi_value = predict_aqi(so2, co, o3, o3_8hr, pm10, pm25, no2, nox, co_8hr, pm25_avg, 
-                                    pm10_avg, so2_avg, windspeed, winddirec, record_history=True)
-            st.session_state.aqi_value = aqi_value
-        
-        if aqi_value is None:
-            st.info("Adjust the inputs and click *Predict Air Quality* to generate result.")
-            st.stop()
-        
-        category, css_class, color = get_aqi_category(aqi_value)
-        
-        # Display AQI circle
+    st.markdown("""
+    <div class="feature-card">
+        <div style="display: flex; align-items: center; gap: 10px; margin-bottom: 20px;">
+            <div class="feature-icon">📈</div>
+            <h2>AQI Prediction Results</h2>
+        </div>
+    """, unsafe_allow_html=True)
+    
+    aqi_value = st.session_state.get("aqi_value")
+    if aqi_value is None:
+        st.info("Adjust the inputs and click *Predict Air Quality* to generate result.")
+        return
+    
+    category, css_class, color = get_aqi_category(aqi_value)
+    
+    # Display AQI circle
+    st.markdown(f"""
+    <div style="text-align: center; margin-bottom: 30px;">
+        <div class="aqi-circle {css_class}">
+            {aqi_value}
+        </div>
+        <h2 style="color: {color}; margin-bottom: 10px;">{category}</h2>
+        <p style="color: #666;">Current Air Quality Index</p>
+    </div>
+    """, unsafe_allow_html=True)
+
+    # Likely range from the interval members, when the bundle has them
+    payload = st.session_state.get("prediction_data") or {}
+    interval = payload.get("interval") if payload.get("overall_aqi") == aqi_value else None
+    if interval:
+        lower, median, upper = interval
+        st.markdown(aqi_interval_band(lower, median, upper), unsafe_allow_html=True)
+        low_category, high_category = get_aqi_category(lower)[0], get_aqi_category(upper)[0]
+        if low_category == high_category:
+            st.caption(f"Likely range: {lower}–{upper} (firmly *{category}*)")
+        else:
+            st.caption(f"Likely range: {lower}–{upper}, which spans *{low_category}* to *{high_category}*")
+    
+    # Health recommendations
+    st.markdown("""
+    <div class="health-card">
+        <h3 style="margin-bottom: 15px; color: #2d3748;">🏥 Health Recommendations</h3>
+    """, unsafe_allow_html=True)
+    
+    recommendations = get_health_recommendations(aqi_value, category)
+    for rec in recommendations:
         st.markdown(f"""
-        <div style="text-align: center; margin-bottom: 30px;">
-            <div class="aqi-circle {css_class}">
-                {aqi_value}
-            </div>
-            <h2 style="color: {color}; margin-bottom: 10px;">{category}</h2>
-            <p style="color: #666;">Current Air Quality Index</p>
+        <div class="recommendation-item">
+            <span>{rec}</span>
         </div>
         """, unsafe_allow_html=True)
-        
-        # Health recommendations
-        st.markdown("""
-        <div class="health-card">
-            <h3 style="margin-bottom: 15px; color: #2d3748;">🏥 Health Recommendations</h3>
-        """, unsafe_allow_html=True)
-        
-        recommendations = get_health_recommendations(aqi_value, category)
-        for rec in recommendations:
-            st.markdown(f"""
-            <div class="recommendation-item">
-                <span>{rec}</span>
-            </div>
-            """, unsafe_allow_html=True)
-        
-        st.markdown("</div>", unsafe_allow_html=True)
+    
+    st.markdown("</div>", unsafe_allow_html=True)
+
+    uncertainty_panel(aqi_value)
+    similar_conditions_panel(aqi_value)
+    goal_seek_panel(aqi_value)
+    breakpoints_panel()
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def sensor_uncertainty(items: tuple, n: int, region=None):
+    """AQI distribution for one input vector under sensor noise (see uncertainty.py)"""
+    from uncertainty import propagate
+    start = time.perf_counter()
+    result = propagate(dict(items), load_model_pool().get(region), n)
+    result["ms"] = (time.perf_counter() - start) * 1000
+    return result
+
+
+def load_similar_index(region=None):
+    """Memory-mapped nearest-neighbour index of historical readings (see similar.py), held by the pool"""
+    from similar import load_index
+    return load_model_pool().derived(region, "similar_index", load_index)
+
+
+@st.cache_data(show_spinner=False, max_entries=1024)
+def similar_conditions(items: tuple, region=None, k: int = 5):
+    from similar import query
+    return query(load_similar_index(region), dict(items), load_model_pool().get(region), k)
+
+
+def similar_conditions_panel(aqi_value):
+    """Historical hours whose readings were closest to the current inputs"""
+    payload = st.session_state.get("prediction_data")
+    if not payload or payload.get("overall_aqi") != aqi_value:
+        return
+    region = payload.get("region")
+    if load_similar_index(region) is None:
+        return  # no index built for this model
+
+    with st.expander("📅 Past hours that looked like this"):
+        matches = similar_conditions(tuple(payload["input_values"].items()), region)
+        st.table([{
+            "When": m["time"] or "–",
+            "Station": m["station"] or "–",
+            "Measured AQI": round(m["aqi"]),
+            "Category": get_aqi_category(m["aqi"])[0],
+            "PM₂.₅": round(m["inputs"]["pm2.5"], 1),
+            "Wind (m/s)": round(m["inputs"]["windspeed"], 1),
+        } for m in matches])
+        st.caption("The closest historical readings to yours, after the same transformation the model applies.")
+
+
+def uncertainty_panel(aqi_value):
+    """How sensor error in the readings spreads into the predicted AQI"""
+    payload = st.session_state.get("prediction_data")
+    if not payload or payload.get("overall_aqi") != aqi_value:
+        return
+
+    with st.expander("🎲 How sure is this, given sensor error?"):
+        # Expander bodies run even when collapsed, so only simulate once asked to
+        if not st.toggle("Simulate sensor error", key="mc_on"):
+            return
+        n = st.select_slider("Simulated readings", [250, 500, 1000, 2000, 3000], value=1000, key="mc_n")
+        result = sensor_uncertainty(tuple(payload["input_values"].items()), n, payload.get("region"))
+        st.markdown(f"With typical low-cost sensor error, the AQI is most likely **{result['p50']:.0f}**, "
+                    f"and 90% of outcomes fall between **{result['p05']:.0f}** and **{result['p95']:.0f}**.")
+        for name, probability in result["bands"].items():
+            if probability >= 0.005:
+                st.progress(probability, text=f"{name}: {probability:.0%}")
+        st.caption(f"{n:,} perturbed readings scored in one batch ({result['ms']:.0f} ms).")
+
+
+# Inputs a user can realistically reduce (wind is weather, not an emission)
+REDUCIBLE_FEATURES = [f for f in FEATURES if f not in ("windspeed", "winddirec")]
+
+
+def goal_seek_panel(aqi_value):
+    """Smallest input reductions that bring the prediction down to a better category"""
+    payload = st.session_state.get("prediction_data")
+    band = sum(aqi_value > bp for bp in AQI_BREAKPOINTS)
+    if not payload or band == 0:
+        return
+
+    with st.expander("🎯 What would it take to improve?"):
+        # Nearest better category first
+        targets = {AQI_CATEGORIES[i][0]: AQI_BREAKPOINTS[i] for i in reversed(range(band))}
+        target_name = st.selectbox("Target category", list(targets), key="gs_target")
+        features = st.multiselect("Pollutants that could be reduced", REDUCIBLE_FEATURES,
+                                  default=["pm2.5", "pm2.5_avg"], format_func=FEATURE_LABELS.get,
+                                  key="gs_features")
+        inputs = payload["input_values"]
+        if st.button("Find reductions", key="gs_run", disabled=not features):
+            from goal_seek import goal_seek
+            start = time.perf_counter()
+            result = goal_seek(inputs, features, targets[target_name],
+                               load_model_pool().get(payload.get("region")))
+            st.session_state.goal_seek = {"inputs": inputs, "target": target_name, "result": result,
+                                          "ms": (time.perf_counter() - start) * 1000}
+
+        # Kept in session state so it survives live-mode refreshes of this panel
+        solved = st.session_state.get("goal_seek")
+        if not solved or solved["inputs"] != inputs:
+            return
+
+        def _change(feature, value):
+            old = inputs[feature]
+            pct = f" ({(value - old) / old:+.0%})" if old else ""
+            return f"**{FEATURE_LABELS.get(feature, feature)}** {old:g} → {value:.1f}{pct}"
+
+        joint, target = solved["result"]["joint"], solved["target"]
+        if joint is None:
+            st.warning(f"Even cutting the selected pollutants to zero doesn't reach *{target}*.")
+        else:
+            st.markdown(f"To reach **{target}** together (predicted AQI {joint['aqi']:.0f}):")
+            for feature, value in joint["values"].items():
+                if value < inputs[feature]:
+                    st.markdown(f"- {_change(feature, value)}")
+        singles = solved["result"]["single"]
+        if len(singles) > 1:
+            st.markdown("Or on its own:")
+            for feature, single in singles.items():
+                if single is None:
+                    st.markdown(f"- **{FEATURE_LABELS.get(feature, feature)}** alone can't get there")
+                else:
+                    st.markdown(f"- {_change(feature, single['values'][feature])}")
+        st.caption(f"Solved in {solved['ms']:.0f} ms by scoring candidate inputs through the model.")
+
+
+def breakpoints_panel():
+    # AQI Breakpoints
+    st.markdown("""
+    <div style="margin-top: 1rem;">
+        <h4 style="margin-bottom: 0.5rem; color: #2d3748;">AQI Breakpoints</h4>
+    </div>
+    """, unsafe_allow_html=True)
+
+    b64 = get_base64_asset("assets/aqi_breakpoints.svg")
+    if b64:
+        st.markdown(
+            f'<img alt="AQI Breakpoints" '
+            f'src="data:image/svg+xml;base64,{b64}" '
+            f'style="max-width:100%; height:auto; display:block;" />',
+            unsafe_allow_html=True
+        )
+        st.caption("""**Note:**\n
+            1. Areas are generally required to report the AQI based on 8-hour ozone values.
+               However, there are a small number of areas where an AQI based on 1-hour ozone
+               values would be more precautionary. In these cases, in addition to calculating
+               the 8-hour ozone index value, the 1-hour ozone value may be calculated, and 
+               the maximum of the two values reported.\n
+            2. 8-hour O₃ values do not define higher AQI values (≥ 301). AQI values of 301 or
+               higher are calculated with 1-hour O₃ concentrations.\n
+            3. 1-hour SO₂ values do not define higher AQI values (≥ 200). AQI values of 200 or
+               greater are calculated with 24-hour SO₂ concentrations.\n
+
+            \nSource: https://air.moenv.gov.tw/airepaEn/EnvTopics/AirQuality_9.aspx
+        """)
+    else:
+        st.info("Place *'assets/aqi_breakpoints.svg'* in the assets folder to show the image.")
 
-        # AQI Breakpoints
+
+def predict_tab():
+    feed = load_station_feed()
+    if feed is not None:
+        fetch_station_list(feed)
+
+    live = st.toggle("⚡ Live prediction", key="live_predict",
+                     help="Update the result automatically as the inputs change")
+
+    # Main prediction interface
+    col1, col2 = st.columns([1, 1], gap="large")
+
+    with col1:
+        input_panel()
+
+    with col2:
+        # In live mode the result panel polls the inputs until they settle; otherwise it
+        # only reruns with the app
+        polling = live and st.session_state.get("live_polling")
+        st.fragment(result_panel, run_every=LIVE_DEBOUNCE_SECONDS if polling else None)()
+
+
+def station_snapshot(feed):
+    """
+    ((lat, lon, aqi), ...) and station names for every feed station. The hourly snapshot
+    store answers most stations; the rest are scored in one batch per region.
+    """
+    import pandas as pd
+    from model_pool import score_by_region
+    from stations import StationFeedError, is_complete
+
+    store, now = load_snapshot_store(), datetime.now()
+    scored, rows, missing = [], [], []
+    for station in feed.stations():
+        aqi = store.lookup(station["id"], now)
+        if aqi is not None:
+            scored.append((station, aqi))
+            continue
+        try:
+            readings = feed.readings(station["id"])
+        except StationFeedError:
+            continue
+        if is_complete(readings):
+            rows.append(readings)
+            missing.append(station)
+    if rows:
+        aqi = score_by_region(pd.DataFrame(rows, columns=FEATURES), [s.get("region") for s in missing],
+                              load_model_pool())
+        scored.extend(zip(missing, aqi))
+    snapshot = tuple((s["lat"], s["lon"], round(float(a), 1)) for s, a in scored)
+    return snapshot, [s["name"] for s, _ in scored]
+
+
+def station_map_section():
+    """Interpolated AQI heatmap between the live feed's stations"""
+    feed = load_station_feed()
+    if feed is None:
+        return
+    from stations import StationFeedError
+    try:
+        snapshot, names = station_snapshot(feed)
+    except StationFeedError as e:
+        st.warning(f"Station data unavailable: {e}")
+        return
+    if len(snapshot) < 3:
+        return
+
+    import plotly.graph_objects as go
+    from spatial import interpolate_snapshot
+
+    st.markdown("<br>", unsafe_allow_html=True)
+    st.subheader("🗺️ Air Quality Around The Monitoring Stations")
+    method = st.radio("Interpolation", ["IDW", "Kriging"], horizontal=True, key="map_method")
+    lats, lons, grid = interpolate_snapshot(snapshot, method=method.lower())
+
+    # Discrete AQI colors at the category breakpoints (scale 0-500)
+    bounds = [0] + AQI_BREAKPOINTS + [500]
+    colorscale = []
+    for (lo, hi), (_, _, color) in zip(zip(bounds, bounds[1:]), AQI_CATEGORIES):
+        colorscale += [[lo / 500, color], [hi / 500, color]]
+
+    fig = go.Figure(go.Heatmap(z=grid, x=lons, y=lats, zmin=0, zmax=500, colorscale=colorscale,
+                               opacity=0.75, colorbar={"title": "AQI"},
+                               hovertemplate="AQI %{z:.0f}<extra></extra>"))
+    fig.add_trace(go.Scatter(x=[s[1] for s in snapshot], y=[s[0] for s in snapshot], mode="markers+text",
+                             text=[f"{n} ({s[2]:.0f})" for n, s in zip(names, snapshot)],
+                             textposition="top center", marker={"color": "#1a202c", "size": 8},
+                             hoverinfo="text", showlegend=False))
+    fig.update_layout(height=520, xaxis_title="Longitude", yaxis_title="Latitude",
+                      yaxis={"scaleanchor": "x", "scaleratio": 1 / np.cos(np.radians(np.mean(lats)))})
+    st.plotly_chart(fig, use_container_width=True)
+    st.caption(f"Predicted AQI at {len(snapshot)} stations from the live feed, interpolated "
+               f"onto a {grid.shape[0]}×{grid.shape[1]} grid.")
+
+
+def explanation_charts(explanation, X_row, inputs):
+    """SHAP bar and donut for the latest prediction"""
+    import pandas as pd
+    import plotly.express as px
+    shap_row, feat_names = explanation["values"], explanation["features"]
+
+    # Build a tidy DF for plotting
+    df_shap = pd.DataFrame({
+        "feature": feat_names,
+        "display": [FEATURE_LABELS.get(f, f) for f in feat_names],
+        "shap": shap_row,
+        "abs_shap": np.abs(shap_row),
+        "value": [inputs.get(f, X_row.iloc[0][f]) for f in feat_names]
+    }).sort_values("abs_shap", ascending=True)
+
+    # Layout: left = SHAP bar, right = donut
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.subheader("🔎 What's Driving The Predicted AQI?")
         st.markdown("""
-        <div style="margin-top: 1rem;">
-            <h4 style="margin-bottom: 0.5rem; color: #2d3748;">AQI Breakpoints</h4>
+        <div style="background: #f7fafc; padding: 1rem; border-radius: 8px; margin-bottom: 1rem; border-left: 4px solid #4299e1;">
+            <p style="margin: 0; color: #2d3748; font-size: 0.9rem;">
+                <strong>How to read this chart:</strong> Factors with positive values (right) increases AQI, 
+                and negative values (left) decreases AQI. The longer the bar, the bigger the impact 
+                on your prediction.
+            </p>
         </div>
         """, unsafe_allow_html=True)
+        fig_bar = px.bar(
+            df_shap,
+            x="shap",
+            y="display",
+            orientation="h",
+            hover_data={"value": True, "shap": ":.3f", "display": False, "abs_shap": False, "feature": False},
+            title=None
+        )
+        fig_bar.update_layout(
+            height=520,
+            xaxis_title="Contribution to predicted AQI",
+            yaxis_title="",
+            showlegend=False
+        )
+        st.plotly_chart(fig_bar, use_container_width=True)
+        st.caption("The graph above shows how much each factors affects the AQI prediction.")
 
-        img_path = Path("assets/aqi_breakpoints.svg")
-        if img_path.exists():
-            svg_text = img_path.read_text(encoding="utf-8")
-            b64 = b64encode(svg_text.encode("utf-8")).decode("ascii")
-            st.markdown(
-                f'<img alt="AQI Breakpoints" '
-                f'src="data:image/svg+xml;base64,{b64}" '
-                f'style="max-width:100%; height:auto; display:block;" />',
-                unsafe_allow_html=True
-            )
-            st.caption("""**Note:**\n
-                1. Areas are generally required to report the AQI based on 8-hour ozone values.
-                   However, there are a small number of areas where an AQI based on 1-hour ozone
-                   values would be more precautionary. In these cases, in addition to calculating
-                   the 8-hour ozone index value, the 1-hour ozone value may be calculated, and 
-                   the maximum of the two values reported.\n
-                2. 8-hour O₃ values do not define higher AQI values (≥ 301). AQI values of 301 or
-                   higher are calculated with 1-hour O₃ concentrations.\n
-                3. 1-hour SO₂ values do not define higher AQI values (≥ 200). AQI values of 200 or
-                   greater are calculated with 24-hour SO₂ concentrations.\n
-
-                \nSource: https://air.moenv.gov.tw/airepaEn/EnvTopics/AirQuality_9.aspx
-            """)
+    with col2:
+        st.subheader("🍩 Influence of each input on AQI")
+        # Donut from absolute SHAP values
+        df_pie = df_shap.sort_values("abs_shap", ascending=False).copy()
+
+        # Group long tails into 'Other'
+        TOP_K = 8
+        if len(df_pie) > TOP_K:
+            top = df_pie.head(TOP_K)
+            other = pd.DataFrame({
+                "display": ["Other"],
+                "abs_shap": [df_pie.iloc[TOP_K:]["abs_shap"].sum()]
+            })
+            pie_df = pd.concat([top[["display","abs_shap"]], other], ignore_index=True)
         else:
-            st.info("Place *'assets/aqi_breakpoints.svg'* in the assets folder to show the image.")
-
-
-elif st.session_state.current_tab == "Analytics":
+            pie_df = df_pie[["display","abs_shap"]]
+
+        fig_pie = px.pie(
+            pie_df,
+            names="display",
+            values="abs_shap",
+            hole=0.55
+        )
+        fig_pie.update_layout(
+            height=520,
+            showlegend=True
+        )
+        st.plotly_chart(fig_pie, use_container_width=True)
+        st.caption("*Share is based on |SHAP| (absolute impact) so positives/negatives don’t cancel out.")
+
+    if explanation["method"] == "contrib":
+        st.caption("Contributions computed with LightGBM's built-in method while explanations are busy.")
+
+
+@st.cache_resource(show_spinner=False)
+def load_interaction_service():
+    """Background worker and LRU for pairwise interaction matrices (see interactions.py)"""
+    from interactions import InteractionService
+    return InteractionService()
+
+
+def interactions_section(inputs, X_row, region=None):
+    """Pairwise interaction heatmap for the latest prediction"""
+    import plotly.express as px
+    service = load_interaction_service()
+    bundle = load_model_pool().get(region)
+
+    st.subheader("🧩 Which Inputs Amplify Each Other?")
+    method = st.radio("Method", ["Fast approximation", "Exact (SHAP interaction values)"],
+                      horizontal=True, key="ix_method")
+    if method.startswith("Fast"):
+        matrix = service.fast(inputs, bundle)
+        caption = ("Each cell is how much nudging one input changes the effect of nudging the other, in AQI "
+                   "points; the diagonal is each input's own effect.")
+    else:
+        matrix, status = service.exact(inputs, X_row, bundle, load_tree_explainer(region))
+        if status == "pending":
+            st.info("Computing interaction values in the background. This takes a few seconds.")
+            st.button("Check again", key="ix_refresh")
+            return
+        if status == "refused":
+            st.warning("Too many interaction requests right now. Use the fast approximation or try again shortly.")
+            return
+        if status == "error":
+            st.error(f"Couldn't compute the interaction values ({matrix}). Use the fast approximation or try again.")
+            st.button("Try again", key="ix_retry")
+            return
+        caption = ("SHAP interaction values: off-diagonal cells split each pair's joint effect, and the "
+                   "diagonal holds the main effects (model output units).")
+
+    labels = [FEATURE_LABELS.get(f, f) for f in FEATURES]
+    limit = float(np.abs(matrix).max()) or 1.0
+    fig = px.imshow(matrix, x=labels, y=labels, color_continuous_scale="RdBu_r", zmin=-limit, zmax=limit,
+                    aspect="auto")
+    fig.update_layout(height=560, coloraxis_colorbar_title="")
+    st.plotly_chart(fig, use_container_width=True)
+    st.caption(caption)
+
+
+def sensitivity_section(region=None):
+    """Sobol indices for the loaded model, if `python sensitivity.py compute` has been run"""
+    import pandas as pd
+    import plotly.express as px
+    from sensitivity import load_indices
+
+    indices = load_indices(load_model_pool().get(region))
+    if indices is None:
+        return
+    st.markdown("""
+    <div style="margin-top: 2rem;">
+        <h3 style="color: #2d3748; margin-bottom: 0.5rem;"><strong>How Much Of The AQI Variation Does Each Input Explain?</strong></h3>
+        <p style="color: #4a5568; margin-bottom: 1.5rem;">
+            Across many realistic combinations of readings, the <em>alone</em> bar is the share of the
+            variation in predicted AQI caused by that input by itself. The <em>with interactions</em> bar
+            adds its combined effects with other inputs.
+        </p>
+    </div>
+    """, unsafe_allow_html=True)
+    df = pd.DataFrame(indices["features"])
+    df["display"] = df["feature"].map(lambda f: FEATURE_LABELS.get(f, f))
+    df = df.sort_values("total")
+    long = df.melt(id_vars="display", value_vars=["first", "total"], var_name="index", value_name="share")
+    long["index"] = long["index"].map({"first": "Alone (first-order)", "total": "With interactions (total)"})
+    fig = px.bar(long, x="share", y="display", color="index", orientation="h", barmode="group")
+    fig.update_layout(height=520, xaxis_title="Share of AQI variance", yaxis_title="", legend_title="")
+    st.plotly_chart(fig, use_container_width=True)
+    st.caption(f"*Sobol indices from {indices['evaluations']:,} model evaluations with inputs drawn from "
+               f"{indices['inputs']}.")
+
+
+@st.fragment
+def analytics_tab():
     st.markdown("""
     <div class="feature-card">
         <div style="display: flex; align-items: center; gap: 10px; margin-bottom: 20px;">
@@ -979,84 +1670,26 @@ elif st.session_state.current_tab == "Analytics":
     payload = st.session_state.get("prediction_data")
     if not payload:
         st.info("Make a prediction first on *Predict AQI* to see SHAP and the donut chart here.")
-        st.stop()
+        station_map_section()
+        return
     else:
+        import pandas as pd
+        import plotly.express as px
+        region = payload.get("region")
+        model = load_model_pool().get(region)["model"]
+
         latest = payload
         X_row  = latest['transformed_input']      # 1-row DF passed to the model
         inputs = latest['input_values']           # raw values (dict)
 
         # ----- SHAP values for the single prediction -----
-        shap_row, expected_val, feat_names = compute_shap(X_row)
-
-        # Build a tidy DF for plotting
-        df_shap = pd.DataFrame({
-            "feature": feat_names,
-            "display": [FEATURE_LABELS.get(f, f) for f in feat_names],
-            "shap": shap_row,
-            "abs_shap": np.abs(shap_row),
-            "value": [inputs.get(f, X_row.iloc[0][f]) for f in feat_names]
-        }).sort_values("abs_shap", ascending=True)
-
-        # Layout: left = SHAP bar, right = donut
-        col1, col2 = st.columns(2)
-
-        with col1:
-            st.subheader("🔎 What's Driving The Predicted AQI?")
-            st.markdown("""
-            <div style="background: #f7fafc; padding: 1rem; border-radius: 8px; margin-bottom: 1rem; border-left: 4px solid #4299e1;">
-                <p style="margin: 0; color: #2d3748; font-size: 0.9rem;">
-                    <strong>How to read this chart:</strong> Factors with positive values (right) increases AQI, 
-                    and negative values (left) decreases AQI. The longer the bar, the bigger the impact 
-                    on your prediction.
-                </p>
-            </div>
-            """, unsafe_allow_html=True)
-            fig_bar = px.bar(
-                df_shap,
-                x="shap",
-                y="display",
-                orientation="h",
-                hover_data={"value": True, "shap": ":.3f", "display": False, "abs_shap": False, "feature": False},
-                title=None
-            )
-            fig_bar.update_layout(
-                height=520,
-                xaxis_title="Contribution to predicted AQI",
-                yaxis_title="",
-                showlegend=False
-            )
-            st.plotly_chart(fig_bar, use_container_width=True)
-            st.caption("The graph above shows how much each factors affects the AQI prediction.")
-
-        with col2:
-            st.subheader("🍩 Influence of each input on AQI")
-            # Donut from absolute SHAP values
-            df_pie = df_shap.sort_values("abs_shap", ascending=False).copy()
-
-            # Group long tails into 'Other'
-            TOP_K = 8
-            if len(df_pie) > TOP_K:
-                top = df_pie.head(TOP_K)
-                other = pd.DataFrame({
-                    "display": ["Other"],
-                    "abs_shap": [df_pie.iloc[TOP_K:]["abs_shap"].sum()]
-                })
-                pie_df = pd.concat([top[["display","abs_shap"]], other], ignore_index=True)
-            else:
-                pie_df = df_pie[["display","abs_shap"]]
-
-            fig_pie = px.pie(
-                pie_df,
-                names="display",
-                values="abs_shap",
-                hole=0.55
-            )
-            fig_pie.update_layout(
-                height=520,
-                showlegend=True
-            )
-            st.plotly_chart(fig_pie, use_container_width=True)
-            st.caption("*Share is based on |SHAP| (absolute impact) so positives/negatives don’t cancel out.")
+        explanation = compute_shap(X_row, region)
+        if explanation["values"] is None:
+            st.info("Explanations are busy right now, so only the model's overall priorities are shown. "
+                    "Try again in a moment for a breakdown of your prediction.")
+        else:
+            explanation_charts(explanation, X_row, inputs)
+        interactions_section(inputs, X_row, region)
 
         # Global Feature Importance for model (not user-input-driven)
         st.markdown("<br>", unsafe_allow_html=True)  # Add some spacing
@@ -1097,8 +1730,12 @@ elif st.session_state.current_tab == "Analytics":
         except Exception as e:
             st.warning(f"Could not read model feature importances: {e}")
 
+        sensitivity_section(region)
+        station_map_section()
+
 
-elif st.session_state.current_tab == "Learn/Contact":
+@st.fragment
+def learn_tab():
     st.markdown("""
     <div class="feature-card">
         <div style="display:flex;align-items:center;gap:10px;margin-bottom:20px;">
@@ -1149,7 +1786,9 @@ elif st.session_state.current_tab == "Learn/Contact":
                 height=570
             )
 
-elif st.session_state.current_tab == "Products":
+
+@st.fragment
+def products_tab():
     st.markdown("""
     <div class="feature-card">
         <div style="display: flex; align-items: center; gap: 10px; margin-bottom: 20px;">
@@ -1244,12 +1883,20 @@ elif st.session_state.current_tab == "Products":
             for item in section['items']:
                 st.write(f"• {item}")
 
-# Footer
-logo_file = Path("assets/Sustainable_Development_Goal_03GoodHealth.png")
-logo_bytes = logo_file.read_bytes()
-b64 = base64.b64encode(logo_bytes).decode()
 
-st.markdown(f"""
+TABS = {
+    "Predict AQI": predict_tab,
+    "Analytics": analytics_tab,
+    "Learn/Contact": learn_tab,
+    "Products": products_tab,
+}
+try:
+    TABS[st.session_state.current_tab]()
+
+    # Footer
+    b64 = get_base64_asset("assets/Sustainable_Development_Goal_03GoodHealth.png")
+
+    st.markdown(f"""
 ---
 <div style="text-align: center; color: #666; margin-top: 2rem;">
     <p>⛅ Air Quality Prediction System</p>
@@ -1261,4 +1908,14 @@ st.markdown(f"""
         </span>
     </div>
 </div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+""", unsafe_allow_html=True)
+finally:
+    # Also stops the capture when the run is interrupted by a rerun
+    if _run_profiler is not None:
+        st.session_state.run_profile = runprof.finish(
+            _run_profiler, f"{st.session_state.current_tab} {datetime.now():%H:%M:%S}")
+
+if is_operator():
+    # Fragments can't open st.sidebar themselves, so call the panel inside it
+    with st.sidebar:
+        operator_panel()
\ No newline at end of file
@@ -0,0 +1,161 @@
+"""
+Offline backtest of a model bundle against archived station readings.
+
+Streams a CSV/Parquet file in chunks, scores each chunk in a worker process through
+the same transform/model/inverse path as predict_aqi, and aggregates MAE/RMSE and a
+confusion matrix between AQI bands per station and per season. Only per-group
+aggregates are kept, so memory stays bounded regardless of the input size.
+
+    python backtest.py history.csv --out backtest_report.csv
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from pipeline import ROOT, imap_bounded, load_bundle, read_chunks, score_frame
+from schema import AQI_CATEGORIES, FEATURES, aqi_band_index
+
+# Meteorological seasons by month
+SEASONS = {12: "DJF", 1: "DJF", 2: "DJF", 3: "MAM", 4: "MAM", 5: "MAM",
+           6: "JJA", 7: "JJA", 8: "JJA", 9: "SON", 10: "SON", 11: "SON"}
+
+GROUP_KEYS = ["station", "season"]
+
+# Set in each worker by _init_worker
+_bundle = None
+_columns = None
+
+
+def _init_worker(bundle_dir, columns):
+    global _bundle, _columns
+    _bundle = load_bundle(bundle_dir)
+    _columns = columns
+
+
+def score_chunk(chunk: pd.DataFrame):
+    """Score one chunk and reduce it to (metrics, confusion, dropped_rows) partial aggregates"""
+    station_col, time_col, target_col = _columns
+    # Archived feeds mark missing readings with strings such as "ND" or "-"
+    numeric = [*FEATURES, target_col]
+    chunk = chunk.assign(**{c: pd.to_numeric(chunk[c], errors="coerce") for c in numeric})
+    scorable = chunk.dropna(subset=numeric)
+    dropped = len(chunk) - len(scorable)
+    chunk = scorable
+    if chunk.empty:
+        return None, None, dropped
+
+    frame = pd.DataFrame(index=chunk.index)
+    frame["station"] = chunk[station_col].astype(str) if station_col else "all"
+    if time_col:
+        months = pd.to_datetime(chunk[time_col], errors="coerce").dt.month
+        frame["season"] = months.map(SEASONS).fillna("unknown")
+    else:
+        frame["season"] = "all"
+    actual = chunk[target_col].to_numpy(dtype=float)
+    predicted = score_frame(chunk, _bundle)
+    error = predicted - actual
+
+    frame["n"] = 1
+    frame["abs_err"] = np.abs(error)
+    frame["sq_err"] = error ** 2
+    frame["true_band"] = aqi_band_index(actual)
+    frame["pred_band"] = aqi_band_index(predicted)
+    frame["band_hit"] = (frame["true_band"] == frame["pred_band"]).astype(int)
+
+    metrics = frame.groupby(GROUP_KEYS)[["n", "abs_err", "sq_err", "band_hit"]].sum()
+    confusion = frame.groupby(GROUP_KEYS + ["true_band", "pred_band"]).size().rename("n")
+    return metrics, confusion, dropped
+
+
+def _merge(total, part):
+    if part is None:
+        return total
+    return part if total is None else total.add(part, fill_value=0)
+
+
+def run_backtest(path, bundle_dir=ROOT, chunksize=200_000, workers=None,
+                 station_col="sitename", time_col="date", target_col="aqi", progress=True):
+    """Run the backtest and return (metrics, confusion) DataFrames"""
+    workers = workers or os.cpu_count() or 1
+    columns = FEATURES + [c for c in (station_col, time_col, target_col) if c]
+    metrics = confusion = None
+    rows = dropped = 0
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(workers, initializer=_init_worker,
+                             initargs=(str(bundle_dir), (station_col, time_col, target_col))) as pool:
+        for _, (part_metrics, part_confusion, part_dropped) in imap_bounded(
+                pool, score_chunk, read_chunks(path, chunksize, columns), max_pending=2 * workers):
+            metrics = _merge(metrics, part_metrics)
+            confusion = _merge(confusion, part_confusion)
+            dropped += part_dropped
+            if part_metrics is not None:
+                rows += int(part_metrics["n"].sum())
+            if progress:
+                elapsed = time.perf_counter() - start
+                print(f"\r{rows:,} rows scored ({rows / elapsed:,.0f} rows/s)", end="", file=sys.stderr)
+    if progress:
+        print(file=sys.stderr)
+        if dropped:
+            print(f"Skipped {dropped:,} rows with missing features or observed AQI", file=sys.stderr)
+
+    if metrics is None:
+        raise ValueError(f"No scorable rows in {path}")
+    metrics = metrics.assign(
+        mae=metrics["abs_err"] / metrics["n"],
+        rmse=np.sqrt(metrics["sq_err"] / metrics["n"]),
+        band_accuracy=metrics["band_hit"] / metrics["n"],
+    )
+    return metrics, confusion.astype(int)
+
+
+def confusion_table(confusion: pd.Series) -> pd.DataFrame:
+    """Overall true-band x predicted-band counts, labelled with the AQI category names"""
+    names = [name for name, _, _ in AQI_CATEGORIES]
+    table = confusion.groupby(["true_band", "pred_band"]).sum().unstack(fill_value=0)
+    table = table.reindex(index=range(len(names)), columns=range(len(names)), fill_value=0)
+    table.index = names
+    table.columns = names
+    return table
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("data", help="CSV or Parquet file of historical readings with observed AQI")
+    parser.add_argument("--bundle", default=str(ROOT), help="Model bundle directory (default: repo root)")
+    parser.add_argument("--chunksize", type=int, default=200_000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--station-col", default="sitename", help="Empty to treat all rows as one station")
+    parser.add_argument("--time-col", default="date", help="Empty to skip the per-season split")
+    parser.add_argument("--target-col", default="aqi")
+    parser.add_argument("--out", default="backtest_report.csv", help="Per station/season metrics CSV")
+    parser.add_argument("--confusion-out", default="backtest_confusion.csv")
+    args = parser.parse_args(argv)
+
+    metrics, confusion = run_backtest(args.data, args.bundle, args.chunksize, args.workers,
+                                      args.station_col or None, args.time_col or None, args.target_col)
+    metrics[["n", "mae", "rmse", "band_accuracy"]].to_csv(args.out)
+    confusion.to_csv(args.confusion_out)
+
+    n = metrics["n"].sum()
+    print(f"Rows: {int(n):,}   MAE: {metrics['abs_err'].sum() / n:.2f}   "
+          f"RMSE: {np.sqrt(metrics['sq_err'].sum() / n):.2f}   "
+          f"Band accuracy: {metrics['band_hit'].sum() / n:.1%}")
+    print("\nSeason summary")
+    by_season = metrics.groupby("season")[["n", "abs_err", "sq_err"]].sum()
+    print(pd.DataFrame({"n": by_season["n"].astype(int),
+                        "mae": by_season["abs_err"] / by_season["n"],
+                        "rmse": np.sqrt(by_season["sq_err"] / by_season["n"])}).round(2).to_string())
+    print("\nBand confusion (rows: observed, columns: predicted)")
+    print(confusion_table(confusion).to_string())
+    print(f"\nWrote {args.out} and {args.confusion_out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
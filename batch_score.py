@@ -0,0 +1,139 @@
+"""
+Out-of-core batch scoring to Parquet.
+
+Reads a CSV/Parquet file in fixed-size chunks and fans them out to worker processes.
+Each worker loads the model bundle once, scores its chunk through the same
+transform/model/inverse path as predict_aqi, and writes one Parquet part file with
+the AQI and its category. Parts are written atomically, so an interrupted run
+resumes at chunk granularity: rerunning the same command skips finished parts.
+
+    python batch_score.py archive.csv scored/ --chunksize 500000 --keep sitename date
+
+--trees K (or "early") scores with a truncated ensemble; see truncation.py.
+--region-col routes each row to its region's bundle from regions.json (see
+model_pool.py), one vectorized predict per region per chunk.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from model_pool import ModelPool, score_by_region
+from pipeline import ROOT, bundle_files, imap_bounded, load_bundle, read_chunks, score_frame
+from schema import AQI_CATEGORIES, FEATURES, aqi_band_index
+from truncation import trees_arg
+
+CATEGORY_NAMES = [name for name, _, _ in AQI_CATEGORIES]
+
+# Set in each worker by _init_worker
+_bundle = None
+_out_dir = None
+_keep = None
+_trees = None
+_region_col = None
+_pool = None
+
+
+def _init_worker(bundle_dir, out_dir, keep, trees, region_col):
+    global _bundle, _out_dir, _keep, _trees, _region_col, _pool
+    if region_col:
+        _pool = ModelPool.from_config()
+    else:
+        _bundle = load_bundle(bundle_dir)
+    _out_dir = Path(out_dir)
+    _keep = keep
+    _trees = trees
+    _region_col = region_col
+
+
+def part_path(out_dir, index: int) -> Path:
+    return Path(out_dir) / f"part-{index:06d}.parquet"
+
+
+def score_chunk(task):
+    """Score one (index, chunk) task and write its part file; returns (rows, seconds)"""
+    index, chunk = task
+    start = time.perf_counter()
+    # Archived feeds mark missing readings with strings such as "ND"; the transformers
+    # keep NaN and LightGBM routes it down its missing-value branches
+    features = chunk[FEATURES].apply(pd.to_numeric, errors="coerce")
+    if _region_col:
+        aqi = score_by_region(features, chunk[_region_col], _pool, _trees)
+    else:
+        aqi = score_frame(features, _bundle, _trees)
+
+    out = chunk[_keep].reset_index(drop=True)
+    out["aqi"] = pd.Series(aqi).round().astype("Int16")
+    out["category"] = pd.Categorical.from_codes(aqi_band_index(aqi), CATEGORY_NAMES)
+
+    final = part_path(_out_dir, index)
+    tmp = final.with_suffix(".parquet.tmp")
+    out.to_parquet(tmp, index=False)
+    os.replace(tmp, final)
+    return len(out), time.perf_counter() - start
+
+
+def _todo(chunks, out_dir):
+    """(index, chunk) for every chunk whose part file doesn't exist yet"""
+    for index, chunk in enumerate(chunks):
+        if not part_path(out_dir, index).exists():
+            yield index, chunk
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("data", help="CSV or Parquet input")
+    parser.add_argument("out_dir", help="Directory for part-NNNNNN.parquet files")
+    parser.add_argument("--bundle", default=str(ROOT), help="Model bundle directory (default: repo root)")
+    parser.add_argument("--chunksize", type=int, default=500_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--keep", nargs="*", default=[], help="Input columns to copy into the output")
+    parser.add_argument("--trees", type=trees_arg, help="Boosting iterations to evaluate, or 'early' (default: all)")
+    parser.add_argument("--region-col", help="Column with each row's region; routes rows via regions.json "
+                                             "instead of --bundle")
+    args = parser.parse_args(argv)
+
+    out_dir = Path(args.out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    # Chunk boundaries and models must match between runs for resuming to be safe
+    if args.region_col:
+        bundle_dirs = ModelPool.from_config().regions
+    else:
+        bundle_dirs = {"bundle": str(Path(args.bundle).resolve())}
+    bundles = {key: {"path": path, "version": bundle_files(path)[1]} for key, path in bundle_dirs.items()}
+    settings = {"data": str(Path(args.data).resolve()), "chunksize": args.chunksize, "keep": args.keep,
+                "trees": args.trees, "region_col": args.region_col, "bundles": bundles}
+    settings_path = out_dir / "_settings.json"
+    if settings_path.exists() and json.loads(settings_path.read_text()) != settings:
+        parser.error(f"{out_dir} holds parts from a run with different settings; use a new directory")
+    settings_path.write_text(json.dumps(settings, indent=2))
+
+    columns = FEATURES + args.keep
+    if args.region_col and args.region_col not in columns:
+        columns.append(args.region_col)
+    chunks = read_chunks(args.data, args.chunksize, columns)
+    rows = parts = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(args.workers, initializer=_init_worker,
+                             initargs=(args.bundle, str(out_dir), args.keep, args.trees, args.region_col)) as pool:
+        for _, (n, _) in imap_bounded(pool, score_chunk, _todo(chunks, out_dir), max_pending=2 * args.workers):
+            rows += n
+            parts += 1
+            elapsed = time.perf_counter() - start
+            print(f"\r{parts} parts, {rows:,} rows, {rows / elapsed:,.0f} rows/s", end="", file=sys.stderr)
+
+    elapsed = time.perf_counter() - start
+    skipped = sum(1 for _ in out_dir.glob("part-*.parquet")) - parts
+    print(file=sys.stderr)
+    print(f"Scored {rows:,} rows in {parts} new parts ({skipped} already done) in {elapsed:.1f}s"
+          f" -> {rows / elapsed if elapsed else 0:,.0f} rows/s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
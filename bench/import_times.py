@@ -0,0 +1,92 @@
+"""
+Import-time report for app.py.
+
+For each heavy dependency, measures its cold import time in a fresh interpreter.
+Then runs app.py headlessly once per tab (again in a fresh interpreter each time)
+and reports the wall time of the first run and which heavy modules it pulled in.
+
+Exits non-zero if a tab other than Analytics loads SHAP, or if a first run goes over
+--budget-ms, so the script can be used as a regression check.
+
+    python bench/import_times.py [--budget-ms 4000]
+"""
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+HEAVY_MODULES = ["pandas", "numpy", "joblib", "sklearn", "lightgbm", "shap", "plotly", "plotly.express"]
+TABS = ["Predict AQI", "Analytics", "Learn/Contact", "Products"]
+
+# Tabs that are allowed to import SHAP
+SHAP_TABS = {"Analytics"}
+
+_IMPORT_SNIPPET = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+print(json.dumps({{"seconds": time.perf_counter() - start}}))
+"""
+
+_TAB_SNIPPET = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+
+at = AppTest.from_file("app.py", default_timeout=120)
+at.session_state["current_tab"] = {tab!r}
+start = time.perf_counter()
+at.run()
+first = time.perf_counter() - start
+start = time.perf_counter()
+at.run()
+rerun = time.perf_counter() - start
+print(json.dumps({{
+    "first_run": first,
+    "rerun": rerun,
+    "loaded": [m for m in {heavy!r} if m in sys.modules],
+    "errors": [str(e.value) for e in at.exception],
+}}))
+"""
+
+
+def _run_snippet(code: str) -> dict:
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=None, help="Fail if a tab's first run exceeds this")
+    args = parser.parse_args(argv)
+
+    print("Cold import time per dependency")
+    for module in HEAVY_MODULES:
+        try:
+            seconds = _run_snippet(_IMPORT_SNIPPET.format(module=module))["seconds"]
+            print(f"  {module:<16} {seconds * 1000:8.1f} ms")
+        except subprocess.CalledProcessError:
+            print(f"  {module:<16} not installed")
+
+    failures = []
+    print("\nPer-tab cold start (first run / rerun)")
+    for tab in TABS:
+        report = _run_snippet(_TAB_SNIPPET.format(tab=tab, heavy=HEAVY_MODULES))
+        print(f"  {tab:<14} {report['first_run'] * 1000:8.1f} ms / {report['rerun'] * 1000:7.1f} ms"
+              f"   loads: {', '.join(report['loaded']) or '-'}")
+        for err in report["errors"]:
+            failures.append(f"{tab}: app raised {err}")
+        if "shap" in report["loaded"] and tab not in SHAP_TABS:
+            failures.append(f"{tab}: imported shap")
+        if args.budget_ms is not None and report["first_run"] * 1000 > args.budget_ms:
+            failures.append(f"{tab}: first run {report['first_run'] * 1000:.0f} ms > {args.budget_ms:.0f} ms budget")
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
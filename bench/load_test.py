@@ -0,0 +1,134 @@
+"""
+Concurrent-session load test for app.py on a local machine.
+
+Starts one Streamlit server (one worker) and, for each value of --sessions, drives
+that many simulated browser sessions at once over the websocket. Each session
+replays interaction scripts from bench/scripts/*.json (switch tabs, move sliders,
+press Predict) with a think time between steps.
+
+For each concurrency level it reports rerun latency percentiles per tab, along with
+server CPU utilisation and peak RSS.
+
+    python bench/load_test.py --sessions 1 5 10 25 --iterations 3
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from session_client import Session, process_usage, streamlit_server
+
+SCRIPTS_DIR = Path(__file__).resolve().parent / "scripts"
+
+# Navigation button keys in app.py
+TAB_KEYS = {"Predict AQI": "tab1", "Analytics": "tab2", "Learn/Contact": "tab3", "Products": "tab4"}
+
+
+def load_scripts(names):
+    paths = [SCRIPTS_DIR / f"{n}.json" for n in names] if names else sorted(SCRIPTS_DIR.glob("*.json"))
+    return [json.loads(p.read_text()) for p in paths]
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+async def _step(session, step):
+    action = step["action"]
+    if action == "tab":
+        return await session.click(TAB_KEYS[step["tab"]])
+    if action == "click":
+        return await session.click(step["key"])
+    if action == "slider":
+        return await session.set_slider(step["key"], step["value"])
+    if action == "number":
+        return await session.set_number(step["key"], step["value"])
+    if action == "toggle":
+        return await session.set_checkbox(step["key"], step["value"])
+    raise ValueError(f"Unknown action {action!r}")
+
+
+async def run_session(url, scripts, iterations, think_ms, samples, rng):
+    """Replay the scripts; append (tab, seconds, bytes, errors) for every rerun to `samples`"""
+    session = Session(url)
+    result = await session.connect()
+    tab = "Predict AQI"
+    samples.append((tab, result.seconds, result.bytes, result.errors))
+    try:
+        for _ in range(iterations):
+            for script in rng.sample(scripts, len(scripts)):
+                for step in script["steps"]:
+                    await asyncio.sleep(rng.uniform(0.5, 1.5) * think_ms / 1000)
+                    if step["action"] == "tab":
+                        tab = step["tab"]
+                    result = await _step(session, step)
+                    samples.append((tab, result.seconds, result.bytes, result.errors))
+    finally:
+        session.close()
+
+
+async def run_level(url, pid, n_sessions, scripts, iterations, think_ms, seed):
+    samples = []
+    peak_rss = 0
+    done = asyncio.Event()
+
+    async def _sample_rss():
+        nonlocal peak_rss
+        while not done.is_set():
+            peak_rss = max(peak_rss, process_usage(pid)[1])
+            await asyncio.sleep(0.2)
+
+    cpu_start, _ = process_usage(pid)
+    wall_start = time.perf_counter()
+    sampler = asyncio.ensure_future(_sample_rss())
+    await asyncio.gather(*(run_session(url, scripts, iterations, think_ms, samples, random.Random(seed + i))
+                           for i in range(n_sessions)))
+    done.set()
+    await sampler
+    wall = time.perf_counter() - wall_start
+    cpu = process_usage(pid)[0] - cpu_start
+    return samples, wall, cpu, peak_rss
+
+
+def report(n_sessions, samples, wall, cpu, peak_rss):
+    by_tab = defaultdict(list)
+    for tab, seconds, _, _ in samples:
+        by_tab[tab].append(seconds * 1000)
+    errors = sum(s[3] for s in samples)
+    print(f"\n{n_sessions} session(s): {len(samples)} reruns in {wall:.1f}s, "
+          f"server CPU {cpu / wall:.0%}, peak RSS {peak_rss / 2**20:.0f} MiB"
+          + (f", {errors} app exceptions" if errors else ""))
+    print(f"  {'tab':<14} {'reruns':>7} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for tab in TAB_KEYS:
+        values = by_tab.get(tab)
+        if values:
+            print(f"  {tab:<14} {len(values):7d} {_percentile(values, 0.5):8.1f} {_percentile(values, 0.9):8.1f} "
+                  f"{_percentile(values, 0.99):8.1f} {max(values):8.1f}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 5, 10, 25])
+    parser.add_argument("--scripts", nargs="*", help="Script names in bench/scripts (default: all)")
+    parser.add_argument("--iterations", type=int, default=2, help="Times each session replays its scripts")
+    parser.add_argument("--think-ms", type=float, default=300, help="Mean pause between steps")
+    parser.add_argument("--port", type=int, default=8599)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    scripts = load_scripts(args.scripts)
+    with streamlit_server(args.port) as (proc, url):
+        for n_sessions in args.sessions:
+            result = asyncio.run(run_level(url, proc.pid, n_sessions, scripts, args.iterations,
+                                           args.think_ms, args.seed))
+            report(n_sessions, *result)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+"""
+Per-interaction cost of a slider move, with and without fragment-scoped reruns.
+
+Starts app.py headlessly, opens one session, then moves a Predict-tab slider
+--moves times in two modes:
+
+  fragment  - the rerun request carries the slider's fragment id (what the browser sends)
+  full      - the same request without a fragment id, i.e. a whole-script rerun
+
+and reports median/p95 latency, server CPU per interaction and bytes sent to the browser.
+
+    python bench/rerun_bench.py [--moves 50] [--slider sl_pm25]
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+
+from session_client import Session, process_usage, streamlit_server
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+async def _measure(url, pid, slider, moves, use_fragments):
+    session = Session(url)
+    await session.connect()
+    results = []
+    cpu_start, _ = process_usage(pid)
+    try:
+        for i in range(moves):
+            value = 20.0 + (i % 10) * 5.0
+            results.append(await session.set_slider(slider, value, use_fragments=use_fragments))
+    finally:
+        session.close()
+    cpu_end, _ = process_usage(pid)
+    return results, (cpu_end - cpu_start) / moves
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--moves", type=int, default=50)
+    parser.add_argument("--slider", default="sl_pm25", help="Widget key of the slider to move")
+    parser.add_argument("--port", type=int, default=8599)
+    args = parser.parse_args(argv)
+
+    with streamlit_server(args.port) as (proc, url):
+        print(f"{'mode':<9} {'median ms':>10} {'p95 ms':>8} {'cpu ms':>8} {'bytes':>9} {'elements':>9}")
+        for mode, use_fragments in (("full", False), ("fragment", True)):
+            results, cpu = asyncio.run(_measure(url, proc.pid, args.slider, args.moves, use_fragments))
+            latencies = [r.seconds * 1000 for r in results]
+            print(f"{mode:<9} {statistics.median(latencies):10.1f} {_percentile(latencies, 0.95):8.1f} "
+                  f"{cpu * 1000:8.1f} {statistics.mean(r.bytes for r in results):9.0f} "
+                  f"{statistics.mean(r.deltas for r in results):9.1f}")
+            if any(r.errors for r in results):
+                print(f"  warning: the app rendered exceptions during the {mode} run")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""
+Headless Streamlit session used by the benchmark scripts.
+
+Talks to a running `streamlit run app.py` server over the same websocket protocol as
+the browser: every interaction sends a BackMsg rerun request with the current widget
+states (plus the fragment id when the widget lives inside a fragment, exactly as the
+frontend does) and reads ForwardMsgs until the run finishes.
+"""
+import contextlib
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+from typing import NamedTuple
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from tornado.websocket import websocket_connect
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+class RunResult(NamedTuple):
+    seconds: float      # request sent -> script_finished received
+    bytes: int          # total ForwardMsg payload sent to the "browser"
+    messages: int
+    deltas: int         # elements (re)drawn
+    errors: int         # exception elements rendered by the app
+
+
+class Widget(NamedTuple):
+    id: str
+    kind: str
+    fragment_id: str
+
+
+@contextlib.contextmanager
+def streamlit_server(port: int = 8599, app: str = "app.py", extra_args=()):
+    """Start `streamlit run` headlessly and yield its websocket URL"""
+    cmd = [sys.executable, "-m", "streamlit", "run", app, "--server.headless", "true",
+           "--server.port", str(port), "--browser.gatherUsageStats", "false", *extra_args]
+    proc = subprocess.Popen(cmd, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                with urllib.request.urlopen(f"http://localhost:{port}/_stcore/health", timeout=1) as resp:
+                    if resp.status == 200:
+                        break
+            except OSError:
+                if proc.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("Streamlit server did not start")
+                time.sleep(0.25)
+        yield proc, f"ws://localhost:{port}/_stcore/stream"
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def process_usage(pid: int) -> tuple[float, int]:
+    """(cpu_seconds, rss_bytes) of a local process, read from /proc"""
+    with open(f"/proc/{pid}/stat") as fh:
+        fields = fh.read().rsplit(")", 1)[1].split()
+    ticks = os.sysconf("SC_CLK_TCK")
+    cpu = (int(fields[11]) + int(fields[12])) / ticks
+    rss = int(fields[21]) * os.sysconf("SC_PAGE_SIZE")
+    return cpu, rss
+
+
+class Session:
+    """One simulated browser tab"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.ws = None
+        self.page_script_hash = ""
+        self.widgets: dict[str, Widget] = {}
+        self.states: dict[str, WidgetState] = {}
+
+    async def connect(self) -> RunResult:
+        self.ws = await websocket_connect(self.url, max_message_size=256 * 1024 * 1024)
+        return await self._rerun()
+
+    def close(self):
+        if self.ws is not None:
+            self.ws.close()
+
+    # Interactions ---------------------------------------------------------------------
+    async def set_slider(self, key: str, value: float, use_fragments: bool = True) -> RunResult:
+        state = self._state(key)
+        state.double_array_value.data[:] = [float(value)]
+        return await self._rerun(self._fragment_for(key, use_fragments))
+
+    async def set_number(self, key: str, value: float, use_fragments: bool = True) -> RunResult:
+        self._state(key).double_value = float(value)
+        return await self._rerun(self._fragment_for(key, use_fragments))
+
+    async def set_checkbox(self, key: str, value: bool, use_fragments: bool = True) -> RunResult:
+        self._state(key).bool_value = bool(value)
+        return await self._rerun(self._fragment_for(key, use_fragments))
+
+    async def click(self, key: str, use_fragments: bool = True) -> RunResult:
+        self._state(key).trigger_value = True
+        try:
+            return await self._rerun(self._fragment_for(key, use_fragments))
+        finally:
+            # Triggers are only true for the run they were sent with
+            self.states.pop(self.widgets[key].id, None)
+
+    # Protocol -------------------------------------------------------------------------
+    def _state(self, key: str) -> WidgetState:
+        if key not in self.widgets:
+            raise KeyError(f"Widget {key!r} is not on the current page")
+        widget_id = self.widgets[key].id
+        state = self.states.get(widget_id)
+        if state is None:
+            state = self.states[widget_id] = WidgetState(id=widget_id)
+        return state
+
+    def _fragment_for(self, key: str, use_fragments: bool) -> str:
+        return self.widgets[key].fragment_id if use_fragments else ""
+
+    def _record_widget(self, msg: ForwardMsg):
+        delta = msg.delta
+        if delta.WhichOneof("type") != "new_element":
+            return
+        element = delta.new_element
+        kind = element.WhichOneof("type")
+        widget_id = getattr(getattr(element, kind), "id", "") if kind else ""
+        if not widget_id:
+            return
+        # Keyed widget ids end with the user key: "$$ID-<hash>-<key>"
+        key = widget_id.split("-", 2)[-1]
+        self.widgets[key] = Widget(widget_id, kind, getattr(delta, "fragment_id", ""))
+
+    async def _rerun(self, fragment_id: str = "") -> RunResult:
+        back = BackMsg()
+        request = back.rerun_script
+        request.query_string = ""
+        request.page_script_hash = self.page_script_hash
+        request.widget_states.widgets.extend(self.states.values())
+        if fragment_id:
+            request.fragment_id = fragment_id
+
+        start = time.perf_counter()
+        await self.ws.write_message(back.SerializeToString(), binary=True)
+
+        n_bytes = n_msgs = n_deltas = n_errors = 0
+        while True:
+            raw = await self.ws.read_message()
+            if raw is None:
+                raise ConnectionError("Streamlit server closed the session")
+            n_bytes += len(raw)
+            n_msgs += 1
+            msg = ForwardMsg()
+            msg.ParseFromString(raw)
+            kind = msg.WhichOneof("type")
+            if kind == "new_session":
+                self.page_script_hash = getattr(msg.new_session, "page_script_hash", "") or self.page_script_hash
+            elif kind == "delta":
+                n_deltas += 1
+                if msg.delta.new_element.WhichOneof("type") == "exception":
+                    n_errors += 1
+                self._record_widget(msg)
+            elif kind == "script_finished":
+                # st.rerun() inside the app ends the run early and immediately starts another
+                if msg.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    break
+        return RunResult(time.perf_counter() - start, n_bytes, n_msgs, n_deltas, n_errors)
@@ -0,0 +1,139 @@
+"""
+Accuracy-vs-latency curve for truncated tree evaluation (see truncation.py).
+
+Scores a reference set with the first K boosting iterations for a range of K, and in
+"early" mode. For each setting it reports:
+
+  us/row     batch latency per row, whole reference set in one call (batch scoring)
+  1-row ms   median latency of single-row calls (live preview, alerts)
+  MAE full   mean |AQI - full-model AQI|
+  max full   worst-case |AQI - full-model AQI|
+  band %     rows whose AQI category matches the full model
+  MAE obs    mean |AQI - observed AQI|, when --target-col is present
+  trees      mean trees evaluated per row
+
+    python bench/truncation_curve.py reference.csv [--rows 20000] [--json curve.json]
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from pipeline import load_bundle, predict_model_space, read_chunks, transform_features  # noqa: E402
+from schema import FEATURES, aqi_band_index  # noqa: E402
+from truncation import iterations, predict_early_exit  # noqa: E402
+
+FRACTIONS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0)
+
+
+def _load_reference(path, rows: int, target_col: str, chunksize: int = 200_000) -> pd.DataFrame:
+    """Uniform sample of at most `rows` rows, read in chunks (bounded memory)"""
+    columns = FEATURES + ([target_col] if target_col else [])
+    rng = np.random.default_rng(0)
+    sample = None
+    for chunk in read_chunks(path, chunksize, columns):
+        # Random keys + keep the `rows` smallest = uniform sample without replacement
+        chunk = chunk.apply(pd.to_numeric, errors="coerce").assign(_key=rng.random(len(chunk)))
+        sample = chunk if sample is None else pd.concat([sample, chunk])
+        if len(sample) > rows:
+            sample = sample.nsmallest(rows, "_key")
+    if sample is None:
+        raise ValueError(f"No rows in {path}")
+    return sample.drop(columns="_key").reset_index(drop=True)
+
+
+def _timed(fn, repeats: int):
+    """(result, best wall seconds) over `repeats` calls"""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def _single_row_ms(fn, transformed, samples: int) -> float:
+    times = []
+    for i in range(min(samples, len(transformed))):
+        row = transformed.iloc[[i]]
+        start = time.perf_counter()
+        fn(row)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("data", help="CSV or Parquet reference set with the model features")
+    parser.add_argument("--bundle", default=str(ROOT), help="Model bundle directory (default: repo root)")
+    parser.add_argument("--rows", type=int, default=20_000, help="Rows sampled from the reference set")
+    parser.add_argument("--target-col", default="aqi", help="Observed AQI column; empty to skip")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--single", type=int, default=200, help="Single-row calls timed per setting")
+    parser.add_argument("--json", help="Also write the curve to this JSON file")
+    args = parser.parse_args(argv)
+
+    bundle = load_bundle(args.bundle)
+    target_col = args.target_col
+    frame = _load_reference(args.data, args.rows, target_col)
+    if target_col and target_col not in frame:
+        target_col = ""
+    transformed = transform_features(frame, bundle)
+    inverse = bundle["pt_target"].inverse_transform
+
+    def to_aqi(y):
+        return inverse(np.asarray(y).reshape(-1, 1)).ravel()
+
+    n_trees = iterations(bundle["model"])
+    full = to_aqi(predict_model_space(transformed, bundle))
+    full_band = aqi_band_index(full)
+    predict_early_exit(transformed.iloc[:1], bundle)  # build the tree bounds outside the timings
+
+    settings = sorted({max(1, round(f * n_trees)) for f in FRACTIONS}) + ["early"]
+    curve = []
+    print(f"{len(frame):,} reference rows, {n_trees} iterations")
+    print(f"{'trees':>7} {'us/row':>8} {'1-row ms':>9} {'MAE full':>9} {'max full':>9} "
+          f"{'band %':>7} {'MAE obs':>8} {'trees':>7}")
+    for setting in settings:
+        if setting == "early":
+            (y, used), seconds = _timed(lambda: predict_early_exit(transformed, bundle), args.repeats)
+            mean_trees = float(used.mean())
+            single = _single_row_ms(lambda row: predict_early_exit(row, bundle), transformed, args.single)
+        else:
+            y, seconds = _timed(lambda: predict_model_space(transformed, bundle, setting), args.repeats)
+            mean_trees = float(setting)
+            single = _single_row_ms(lambda row: predict_model_space(row, bundle, setting), transformed,
+                                    args.single)
+        aqi = to_aqi(y)
+        error = np.abs(aqi - full)
+        point = {
+            "trees": setting,
+            "us_per_row": seconds / len(frame) * 1e6,
+            "single_row_ms": single,
+            "mae_vs_full": float(np.nanmean(error)),
+            "max_vs_full": float(np.nanmax(error)),
+            "band_agreement": float(np.mean(aqi_band_index(aqi) == full_band)),
+            "mae_vs_observed": float(np.nanmean(np.abs(aqi - frame[target_col]))) if target_col else None,
+            "mean_trees": mean_trees,
+        }
+        curve.append(point)
+        observed = f"{point['mae_vs_observed']:8.2f}" if target_col else f"{'-':>8}"
+        print(f"{setting!s:>7} {point['us_per_row']:8.2f} {single:9.3f} {point['mae_vs_full']:9.2f} "
+              f"{point['max_vs_full']:9.2f} {point['band_agreement'] * 100:7.2f} {observed} {mean_trees:7.1f}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({"version": bundle["version"], "rows": len(frame),
+                                               "iterations": n_trees, "curve": curve}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
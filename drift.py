@@ -0,0 +1,232 @@
+"""
+Streaming drift monitoring of model inputs and predicted AQI.
+
+Every prediction updates fixed-bin histograms, one per input feature plus AQI. An
+update is a bisect and an integer increment per value, a few microseconds in total
+and no allocation. On a schedule, a background thread takes the window of counts
+collected since the previous run, compares it with a stored reference profile
+(PSI and a binned KS statistic) and appends the scores to a JSON-lines log.
+
+The reference profile stores bin edges in raw units and lives in the bundle directory,
+so every regional bundle has its own. Build one from historical data:
+
+    python drift.py build-reference history.csv [--bundle bundles/tw-20250901]
+
+Without a reference file, the skewed features and the predicted AQI fall back to a
+profile derived from pt_features and pt_target: with standardize=True the training data
+was roughly N(0, 1) after the transform, so standard-normal deciles mapped back through
+inverse_transform give approximately equal-mass bins in raw units. The other inputs
+(so2, co, o3, co_8hr, winddirec) aren't transformed, so nothing in the bundle describes
+them; they are listed as "untracked" in the reference and in every report until a
+reference file is built.
+"""
+import argparse
+import json
+import math
+import sys
+import threading
+import time
+from bisect import bisect_right
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from schema import FEATURES, SKEWED_FEATURES
+
+REFERENCE_FILE = "drift_reference.json"
+
+# Standard-normal deciles (inner edges of 10 equal-mass bins)
+NORMAL_DECILES = [-1.2816, -0.8416, -0.5244, -0.2533, 0.0, 0.2533, 0.5244, 0.8416, 1.2816]
+
+PSI_ALERT = 0.2         # conventional "significant shift" threshold
+MIN_WINDOW_COUNT = 50   # don't score windows smaller than this; keep accumulating
+_EPS = 1e-4
+
+
+def _decile_profiles(transformer, names) -> dict:
+    """Equal-mass raw-unit bins for the columns of a standardized PowerTransformer"""
+    if not getattr(transformer, "standardize", False):
+        return {}
+    z = np.tile(np.array(NORMAL_DECILES)[:, None], (1, len(names)))
+    raw_edges = transformer.inverse_transform(z)
+    profiles = {}
+    for j, name in enumerate(names):
+        edges = raw_edges[:, j]
+        if np.all(np.isfinite(edges)) and np.all(np.diff(edges) > 0):
+            profiles[name] = {"edges": edges.tolist(), "probs": [0.1] * 10}
+    return profiles
+
+
+def default_reference(bundle: dict) -> dict:
+    """Approximate reference derived from pt_features (skewed inputs) and pt_target (AQI)"""
+    features = {**_decile_profiles(bundle["pt_features"], SKEWED_FEATURES),
+                **_decile_profiles(bundle["pt_target"], ["aqi"])}
+    return {"version": bundle["version"], "source": "pt_features/pt_target" if features else "none",
+            "features": features, "untracked": [n for n in FEATURES + ["aqi"] if n not in features]}
+
+
+def load_reference(bundle: dict, path=None) -> dict:
+    """The bundle's stored reference profile if there is one, else default_reference(bundle)"""
+    path = Path(path) if path is not None else Path(bundle["path"]) / REFERENCE_FILE
+    if path.exists():
+        return json.loads(path.read_text())
+    return default_reference(bundle)
+
+
+def psi(actual, expected) -> float:
+    """Population stability index between two binned distributions"""
+    total = 0.0
+    for a, e in zip(actual, expected):
+        a, e = max(a, _EPS), max(e, _EPS)
+        total += (a - e) * math.log(a / e)
+    return total
+
+
+def binned_ks(actual, expected) -> float:
+    """Largest gap between the two CDFs, evaluated at the bin edges"""
+    gap = cum_a = cum_e = 0.0
+    for a, e in zip(actual, expected):
+        cum_a += a
+        cum_e += e
+        gap = max(gap, abs(cum_a - cum_e))
+    return gap
+
+
+class DriftMonitor:
+    """Fixed-memory histograms of live inputs and predictions, scored against a reference"""
+
+    def __init__(self, reference: dict, region=None):
+        self.reference = reference
+        self.region = region
+        profiles = reference["features"]
+        # (position in the observed vector, name, edges); AQI is appended after FEATURES
+        names = FEATURES + ["aqi"]
+        self._tracked = [(i, name, profiles[name]["edges"]) for i, name in enumerate(names) if name in profiles]
+        self.untracked = [name for name in names if name not in profiles]
+        self._expected = {name: profiles[name]["probs"] for _, name, _ in self._tracked}
+        self._lock = threading.Lock()
+        self._counts = self._empty_counts()
+        self._window_n = 0
+        self.last_report = None
+        self._thread = None
+
+    def _empty_counts(self):
+        return [[0] * (len(edges) + 1) for _, _, edges in self._tracked]
+
+    def observe(self, values, aqi):
+        """Record one prediction: `values` are the raw inputs in FEATURES order"""
+        row = (*values, aqi)
+        with self._lock:
+            for counts, (i, _, edges) in zip(self._counts, self._tracked):
+                counts[bisect_right(edges, row[i])] += 1
+            self._window_n += 1
+
+    def score_window(self):
+        """Score the counts collected since the last call and start a new window"""
+        with self._lock:
+            if self._window_n < MIN_WINDOW_COUNT:
+                return None
+            counts, n = self._counts, self._window_n
+            self._counts, self._window_n = self._empty_counts(), 0
+
+        scores = {}
+        for (_, name, _), bins in zip(self._tracked, counts):
+            actual = [c / n for c in bins]
+            expected = self._expected[name]
+            scores[name] = {"psi": round(psi(actual, expected), 4), "ks": round(binned_ks(actual, expected), 4)}
+        report = {
+            "ts": datetime.now().isoformat(timespec="seconds"),
+            "n": n,
+            "region": self.region,
+            "reference": self.reference.get("version"),
+            "untracked": self.untracked,
+            "drifted": sorted(name for name, s in scores.items() if s["psi"] >= PSI_ALERT),
+            "scores": scores,
+        }
+        self.last_report = report
+        return report
+
+    def start(self, interval: float, log_path):
+        """Score a window every `interval` seconds in a daemon thread, appending reports to log_path"""
+        if self._thread is not None:
+            return self._thread
+
+        def _loop():
+            while True:
+                time.sleep(interval)
+                report = self.score_window()
+                if report is not None:
+                    with open(log_path, "a", encoding="utf-8") as fh:
+                        fh.write(json.dumps(report) + "\n")
+
+        self._thread = threading.Thread(target=_loop, name=f"drift-monitor-{self.region or 'default'}", daemon=True)
+        self._thread.start()
+        return self._thread
+
+
+def build_reference(path, bundle: dict, chunksize=200_000, n_bins=10, sample_rows=200_000) -> dict:
+    """
+    Reference profile from historical readings: quantile bin edges taken from the first
+    `sample_rows` rows, then counts over the whole file (two streaming passes).
+    """
+    import pandas as pd
+
+    from pipeline import read_chunks, score_frame
+
+    def _clean(chunk):
+        chunk = chunk[FEATURES].apply(pd.to_numeric, errors="coerce").dropna()
+        return chunk.assign(aqi=score_frame(chunk, bundle)) if len(chunk) else None
+
+    # Pass 1: edges from a bounded sample
+    sample, taken = [], 0
+    for chunk in read_chunks(path, chunksize, FEATURES):
+        chunk = _clean(chunk)
+        if chunk is None:
+            continue
+        sample.append(chunk.head(sample_rows - taken))
+        taken += len(sample[-1])
+        if taken >= sample_rows:
+            break
+    sample = pd.concat(sample)
+    quantiles = np.linspace(0, 1, n_bins + 1)[1:-1]
+    edges = {name: np.unique(np.quantile(sample[name], quantiles)) for name in FEATURES + ["aqi"]}
+
+    # Pass 2: counts over everything
+    counts = {name: np.zeros(len(e) + 1, dtype=np.int64) for name, e in edges.items()}
+    for chunk in read_chunks(path, chunksize, FEATURES):
+        chunk = _clean(chunk)
+        if chunk is None:
+            continue
+        for name, e in edges.items():
+            counts[name] += np.bincount(np.searchsorted(e, chunk[name].to_numpy(), side="right"),
+                                        minlength=len(e) + 1)
+
+    features = {}
+    for name, e in edges.items():
+        features[name] = {"edges": e.tolist(), "probs": (counts[name] / counts[name].sum()).tolist()}
+    return {"version": bundle["version"], "source": str(path), "features": features}
+
+
+def main(argv=None) -> int:
+    from pipeline import ROOT, load_bundle
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build-reference", help="Build a reference profile from historical readings")
+    build.add_argument("data", help="CSV or Parquet file of historical readings")
+    build.add_argument("--bundle", default=str(ROOT))
+    build.add_argument("--bins", type=int, default=10)
+    build.add_argument("--chunksize", type=int, default=200_000)
+    build.add_argument("--out", help=f"Output file (default: {REFERENCE_FILE} in the bundle directory)")
+    args = parser.parse_args(argv)
+
+    reference = build_reference(args.data, load_bundle(args.bundle), args.chunksize, args.bins)
+    out = args.out or str(Path(args.bundle) / REFERENCE_FILE)
+    Path(out).write_text(json.dumps(reference, indent=2))
+    print(f"Wrote reference profile for {len(reference['features'])} series to {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
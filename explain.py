@@ -0,0 +1,161 @@
+"""
+Admission control and graceful degradation for per-prediction explanations.
+
+SHAP is the most expensive thing the app does per request. During a traffic spike,
+unbounded inline SHAP calls compete with plain predictions for CPU. explain_row()
+therefore goes down a ladder and stops at the first rung that succeeds:
+
+  cached      the same bundle, model version and input were explained with SHAP
+              recently (LRU). Degraded results aren't cached, so the next request for
+              that input can still get full SHAP.
+  shap        TreeExplainer, run only while holding one of the gate's slots
+  contrib     LightGBM's built-in pred_contrib (TreeSHAP in C++, no Python per-tree
+              overhead), used when no SHAP slot frees up within the wait
+  importance  nothing per-row. The caller shows global feature importances only.
+              Used when even the cheap path's slots are all busy.
+
+ExplanationGate is a bounded semaphore with a bounded waiting room. Requests beyond
+the waiting room are turned away at once instead of queueing, so the number of threads
+stuck in explanations stays bounded and Predict keeps its headroom. metrics() reports
+queue depth, how often each rung served, and recent SHAP latency for the operator panel.
+"""
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+
+import numpy as np
+
+LATENCY_WINDOW = 200
+
+
+class ExplanationGate:
+    """At most `slots` concurrent holders and `max_waiting` queued ones; the rest are refused"""
+
+    def __init__(self, slots: int, max_waiting: int):
+        self.slots = slots
+        self.max_waiting = max_waiting
+        self._semaphore = threading.BoundedSemaphore(slots)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.waiting = 0
+        self.refused = 0
+
+    def acquire(self, timeout: float) -> bool:
+        with self._lock:
+            if self.waiting >= self.max_waiting:
+                self.refused += 1
+                return False
+            self.waiting += 1
+        acquired = self._semaphore.acquire(timeout=timeout)
+        with self._lock:
+            self.waiting -= 1
+            if acquired:
+                self.active += 1
+            else:
+                self.refused += 1
+        return acquired
+
+    def release(self):
+        with self._lock:
+            self.active -= 1
+        self._semaphore.release()
+
+
+class ExplanationCache:
+    """Thread-safe LRU of explanations keyed by (bundle path, model version, input vector)"""
+
+    def __init__(self, maxsize: int = 2048):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class Explainer:
+    """The degradation ladder for one process: SHAP gate, cheap-path gate, cache and metrics"""
+
+    def __init__(self, shap_slots: int = 2, contrib_slots: int = 4, max_waiting: int = 8,
+                 wait_seconds: float = 1.0, cache_size: int = 2048):
+        self.shap_gate = ExplanationGate(shap_slots, max_waiting)
+        self.contrib_gate = ExplanationGate(contrib_slots, max_waiting)
+        self.wait_seconds = wait_seconds
+        self.cache = ExplanationCache(cache_size)
+        self.served = Counter()
+        self.shap_ms = deque(maxlen=LATENCY_WINDOW)
+
+    def explain_row(self, row_df, bundle: dict, tree_explainer) -> dict:
+        """
+        {"values", "expected", "features", "method"} for a 1-row transformed frame.
+        `tree_explainer` is a callable returning a (cached) shap.TreeExplainer, so SHAP is
+        only imported on the rung that uses it. "values" is None for "importance".
+        """
+        features = list(row_df.columns)
+        # Regional bundles without a manifest can share a version string, so key by path too
+        key = (bundle["path"], bundle["version"], tuple(np.asarray(row_df, dtype=float)[0].tolist()))
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.served["cached"] += 1
+            return {**cached, "method": "cached"}
+
+        result = None
+        if self.shap_gate.acquire(self.wait_seconds):
+            try:
+                start = time.perf_counter()
+                result = self._shap(row_df, tree_explainer())
+                self.shap_ms.append((time.perf_counter() - start) * 1000)
+            finally:
+                self.shap_gate.release()
+        elif self.contrib_gate.acquire(0):
+            try:
+                contrib = bundle["model"].predict(row_df, pred_contrib=True)[0]
+                result = {"values": contrib[:-1], "expected": float(contrib[-1]), "method": "contrib"}
+            finally:
+                self.contrib_gate.release()
+
+        if result is None:
+            self.served["importance"] += 1
+            return {"values": None, "expected": None, "features": features, "method": "importance"}
+        result["features"] = features
+        if result["method"] == "shap":
+            self.cache.put(key, result)
+        self.served[result["method"]] += 1
+        return result
+
+    @staticmethod
+    def _shap(row_df, explainer) -> dict:
+        shap_vals = explainer.shap_values(row_df)
+        if isinstance(shap_vals, list):
+            shap_vals = shap_vals[0]
+        exp_val = explainer.expected_value
+        if isinstance(exp_val, (list, np.ndarray)):
+            exp_val = exp_val[0]
+        return {"values": shap_vals[0], "expected": float(exp_val), "method": "shap"}
+
+    def metrics(self) -> dict:
+        latencies = sorted(self.shap_ms)
+        return {
+            "shap_active": self.shap_gate.active,
+            "shap_waiting": self.shap_gate.waiting,
+            "shap_slots": self.shap_gate.slots,
+            "refused": self.shap_gate.refused,
+            "served": dict(self.served),
+            "cache_entries": len(self.cache),
+            "shap_p50_ms": round(latencies[len(latencies) // 2], 1) if latencies else None,
+            "shap_p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))], 1) if latencies else None,
+        }
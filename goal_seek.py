@@ -0,0 +1,116 @@
+"""
+Goal seek: the smallest pollutant reductions that bring the predicted AQI under a target.
+
+Starting from the inputs of the current prediction, each search scores a batch of
+candidate inputs in one call through the pipeline, then zooms in on the first
+candidate that meets the target. The model is piecewise constant, so a few rounds of
+grid refinement find the crossing to well within a slider step.
+
+- single: for each chosen feature on its own, the smallest cut that reaches the target
+- joint:  all chosen features cut by the same fraction of their way down to the slider
+          minimum, then each one backed off again as far as the target allows
+          (coordinate search), so no feature is cut more than it needs to be
+"""
+import numpy as np
+import pandas as pd
+
+from pipeline import score_frame
+from schema import FEATURE_RANGES, FEATURES
+
+GRID = 48        # candidates per search line per round
+ROUNDS = 3       # refinement rounds; resolution is 1/GRID**ROUNDS of the search range
+
+
+def _meets(aqi, target_aqi):
+    # The app reports rounded AQI, so compare the value a user would see
+    return np.rint(aqi) <= target_aqi
+
+
+def _search_lines(lines, bundle, target_aqi):
+    """
+    Grid-refine along several lines at once; each line is a (start, end) pair of
+    feature vectors. Returns, per line, (t, aqi) for the smallest t in [0, 1] where
+    start + t * (end - start) meets the target, or (None, None) if no point does.
+    """
+    n = len(lines)
+    starts = np.array([start for start, _ in lines])
+    spans = np.array([end - start for start, end in lines])
+    lo, hi = np.zeros(n), np.ones(n)
+    best_t, best_aqi = np.full(n, np.nan), np.full(n, np.nan)
+    active = np.ones(n, dtype=bool)
+
+    for round_ in range(ROUNDS):
+        idx = np.flatnonzero(active)
+        if not len(idx):
+            break
+        # First round covers [0, 1]; later rounds only (lo, hi], where lo failed and hi met
+        steps = np.linspace(0, 1, GRID) if round_ == 0 else np.linspace(0, 1, GRID + 1)[1:]
+        ts = lo[idx, None] + (hi - lo)[idx, None] * steps[None, :]                      # (lines, GRID)
+        candidates = starts[idx, None, :] + ts[..., None] * spans[idx, None, :]        # (lines, GRID, features)
+        aqi = score_frame(pd.DataFrame(candidates.reshape(-1, len(FEATURES)), columns=FEATURES), bundle)
+        ok = _meets(aqi.reshape(len(idx), GRID), target_aqi)
+        aqi = aqi.reshape(len(idx), GRID)
+
+        for row, i in enumerate(idx):
+            hits = np.flatnonzero(ok[row])
+            if not len(hits):
+                active[i] = False
+                continue
+            j = hits[0]
+            best_t[i], best_aqi[i] = ts[row, j], aqi[row, j]
+            lo[i], hi[i] = (ts[row, j - 1] if j else lo[i]), ts[row, j]
+            if j == 0 and round_ == 0:
+                active[i] = False   # the start point already meets the target
+
+    return [(None, None) if np.isnan(best_t[i]) else (float(best_t[i]), float(best_aqi[i])) for i in range(n)]
+
+
+def goal_seek(inputs: dict, features: list, target_aqi: float, bundle: dict) -> dict:
+    """
+    inputs:   raw values by model feature name (as in prediction_data['input_values'])
+    features: model feature names that may be reduced
+    Returns {"single": {feature: result or None}, "joint": result or None}, where a result
+    is {"values": {feature: new value}, "aqi": predicted AQI}.
+    """
+    base = np.array([float(inputs[f]) for f in FEATURES])
+    floor = base.copy()
+    for f in features:
+        floor[FEATURES.index(f)] = FEATURE_RANGES[f][0]
+
+    def _point(values):
+        return {FEATURES[i]: float(values[i]) for i in range(len(FEATURES)) if FEATURES[i] in features}
+
+    # One line per single feature plus the joint (proportional) line, searched together
+    lines = []
+    for f in features:
+        end = base.copy()
+        end[FEATURES.index(f)] = floor[FEATURES.index(f)]
+        lines.append((base, end))
+    lines.append((base, floor))
+    hits = _search_lines(lines, bundle, target_aqi)
+
+    single = {}
+    for f, (t, aqi) in zip(features, hits):
+        i = FEATURES.index(f)
+        single[f] = None if t is None else {
+            "values": {f: float(base[i] + t * (floor[i] - base[i]))}, "aqi": aqi}
+
+    t, aqi = hits[-1]
+    if t is None:
+        return {"single": single, "joint": None}
+
+    # Coordinate back-off: raise each feature back towards its current value while the
+    # target still holds, given the others' cuts
+    solution = base + t * (floor - base)
+    for f in features:
+        i = FEATURES.index(f)
+        if solution[i] >= base[i]:
+            continue
+        restored = solution.copy()
+        restored[i] = base[i]
+        # Search from the fully restored value down to the current cut
+        (u, u_aqi), = _search_lines([(restored, solution)], bundle, target_aqi)
+        if u is not None:
+            solution = restored + u * (solution - restored)
+            aqi = u_aqi
+    return {"single": single, "joint": {"values": _point(solution), "aqi": aqi}}
@@ -0,0 +1,128 @@
+"""
+Pairwise feature interactions for one prediction.
+
+Two methods:
+
+  exact   SHAP interaction values from TreeExplainer.shap_interaction_values, a
+          14x14 matrix whose off-diagonal cells split each pair's joint effect and
+          whose diagonal holds the main effects (model output units). Roughly
+          features times the cost of plain SHAP, so it runs on a background worker.
+  fast    local cross-differences in AQI units. Every feature is nudged by STEP of
+          its slider range, alone and in every pair. Cell (i, j) is
+          f(x + di + dj) - f(x + di) - f(x + dj) + f(x): how much moving one input
+          changes the effect of moving the other. The diagonal is f(x + di) - f(x).
+          That is 1 + 14 + 91 rows in one batched predict, fast enough to run inline.
+
+InteractionService caches results in an LRU keyed by bundle, model version, method and
+input vector. It runs exact jobs on a small ThreadPoolExecutor, and refuses new jobs
+once MAX_PENDING are queued, so a spike falls back to the fast method instead of
+building a backlog. A job that raises is recorded against its key and reported once as
+"error"; the next request for the same inputs tries again.
+"""
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from explain import ExplanationCache
+from pipeline import predict_transformed, transform_features
+from schema import FEATURE_RANGES, FEATURES
+
+STEP = 0.1          # fraction of the slider range
+MAX_PENDING = 8
+MAX_FAILED = 64     # failed keys remembered until they are next requested
+
+
+def fast_interactions(inputs: dict, bundle: dict) -> np.ndarray:
+    """(14, 14) local cross-differences of the AQI around `inputs`"""
+    d = len(FEATURES)
+    base = np.array([float(inputs[f]) for f in FEATURES])
+    low = np.array([FEATURE_RANGES[f][0] for f in FEATURES])
+    high = np.array([FEATURE_RANGES[f][1] for f in FEATURES])
+    step = STEP * (high - low)
+    step = np.where(base + step <= high, step, -step)  # nudge down at the top of a range
+
+    pairs = list(combinations(range(d), 2))
+    rows = np.repeat(base[np.newaxis], 1 + d + len(pairs), axis=0)
+    rows[1 + np.arange(d), np.arange(d)] += step
+    for k, (i, j) in enumerate(pairs):
+        rows[1 + d + k, [i, j]] += step[[i, j]]
+    aqi = predict_transformed(transform_features(pd.DataFrame(rows, columns=FEATURES), bundle), bundle)
+
+    f0, single = aqi[0], aqi[1:1 + d]
+    matrix = np.diag(single - f0)
+    for k, (i, j) in enumerate(pairs):
+        matrix[i, j] = matrix[j, i] = aqi[1 + d + k] - single[i] - single[j] + f0
+    return matrix
+
+
+def exact_interactions(row_df, tree_explainer) -> np.ndarray:
+    """(14, 14) SHAP interaction values for a 1-row transformed frame"""
+    values = tree_explainer.shap_interaction_values(row_df)
+    if isinstance(values, list):
+        values = values[0]
+    return np.asarray(values)[0]
+
+
+class InteractionService:
+    """Background computation and LRU cache of interaction matrices"""
+
+    def __init__(self, workers: int = 1, cache_size: int = 256):
+        self.cache = ExplanationCache(cache_size)
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="interactions")
+        self._pending = {}
+        self._failed = OrderedDict()   # key -> error message of the last failed exact job
+        self._lock = threading.Lock()
+        self.refused = 0
+
+    @staticmethod
+    def key(bundle: dict, method: str, inputs: dict):
+        return bundle["path"], bundle["version"], method, tuple(float(inputs[f]) for f in FEATURES)
+
+    def fast(self, inputs: dict, bundle: dict) -> np.ndarray:
+        key = self.key(bundle, "fast", inputs)
+        matrix = self.cache.get(key)
+        if matrix is None:
+            matrix = fast_interactions(inputs, bundle)
+            self.cache.put(key, matrix)
+        return matrix
+
+    def exact(self, inputs: dict, row_df, bundle: dict, tree_explainer):
+        """
+        (matrix, status): status is "ready", "pending" while the matrix is computed in the
+        background, "refused" when the queue is full, or "error" when the background job
+        for these inputs failed, in which case the first element is the error message.
+        """
+        key = self.key(bundle, "exact", inputs)
+        matrix = self.cache.get(key)
+        if matrix is not None:
+            return matrix, "ready"
+        with self._lock:
+            if key in self._pending:
+                return None, "pending"
+            error = self._failed.pop(key, None)
+            if error is not None:
+                return error, "error"
+            if len(self._pending) >= MAX_PENDING:
+                self.refused += 1
+                return None, "refused"
+            self._pending[key] = self._executor.submit(self._run_exact, key, row_df, tree_explainer)
+        return None, "pending"
+
+    def _run_exact(self, key, row_df, tree_explainer):
+        try:
+            self.cache.put(key, exact_interactions(row_df, tree_explainer))
+        except Exception as exc:
+            with self._lock:
+                self._failed[key] = f"{type(exc).__name__}: {exc}"
+                while len(self._failed) > MAX_FAILED:
+                    self._failed.popitem(last=False)
+        finally:
+            with self._lock:
+                del self._pending[key]
+
+    def pending(self) -> int:
+        return len(self._pending)
@@ -0,0 +1,124 @@
+"""
+Prediction intervals around the point AQI.
+
+Two sources of interval members, both evaluated on the one transformed input that the
+point model already uses:
+
+- quantile models: a bundle whose manifest.json lists "model_lower" and "model_upper"
+  (e.g. LightGBM with objective="quantile", alpha=0.05 / 0.95). Each one predicts on
+  the same transformed matrix.
+- conformal residuals: a conformal.json in the bundle directory holding quantiles of
+  (observed - predicted) in pt_target space. Written by:
+
+      python intervals.py calibrate labelled.csv --alpha 0.1
+
+All member outputs are stacked and sent through pt_target.inverse_transform in a single
+call, so the interval adds one or two model.predict calls to the point prediction.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+CONFORMAL_FILE = "conformal.json"
+
+
+def load_conformal(bundle: dict):
+    """Conformal residual quantiles stored next to the bundle, or None"""
+    path = Path(bundle["path"]) / CONFORMAL_FILE
+    if not path.exists():
+        return None
+    calibration = json.loads(path.read_text())
+    if calibration.get("version") != bundle["version"]:
+        return None  # calibrated against a different model
+    return calibration
+
+
+def has_interval(bundle: dict) -> bool:
+    return ("model_lower" in bundle and "model_upper" in bundle) or bundle.get("conformal") is not None
+
+
+def predict_interval(transformed, bundle: dict, num_iteration=None, y_med=None) -> np.ndarray:
+    """
+    (n, 3) array of lower, median and upper AQI for already-transformed inputs.
+    The median column is the point model's prediction; num_iteration truncates only
+    that model (see pipeline.predict_model_space). Pass y_med when the point model's
+    pt_target-space output has already been computed.
+    """
+    from pipeline import predict_model_space
+    if y_med is None:
+        y_med = predict_model_space(transformed, bundle, num_iteration)
+    if "model_lower" in bundle and "model_upper" in bundle:
+        y_trans = np.column_stack([bundle["model_lower"].predict(transformed), y_med,
+                                   bundle["model_upper"].predict(transformed)])
+    else:
+        conformal = bundle["conformal"]
+        y_trans = np.column_stack([y_med + conformal["lower"], y_med, y_med + conformal["upper"]])
+
+    # One inverse transform for every member of every row
+    aqi = bundle["pt_target"].inverse_transform(y_trans.reshape(-1, 1)).reshape(y_trans.shape)
+    # Independently trained quantile models can cross; clamp the bounds around the point
+    # prediction rather than reordering, so column 1 stays the point model's AQI
+    aqi[:, 0] = np.minimum(aqi[:, 0], aqi[:, 1])
+    aqi[:, 2] = np.maximum(aqi[:, 2], aqi[:, 1])
+    return aqi
+
+
+def calibrate(path, bundle: dict, alpha=0.1, target_col="aqi", chunksize=200_000,
+              max_residuals=1_000_000, seed=0) -> dict:
+    """Split-conformal residual quantiles in pt_target space, from a labelled dataset"""
+    import pandas as pd
+
+    from pipeline import read_chunks, transform_features
+    from schema import FEATURES
+
+    rng = np.random.default_rng(seed)
+    residuals, keys = np.empty(0), np.empty(0)
+    seen = 0
+    for chunk in read_chunks(path, chunksize, FEATURES + [target_col]):
+        chunk = chunk.apply(pd.to_numeric, errors="coerce").dropna()
+        if chunk.empty:
+            continue
+        y_pred = bundle["model"].predict(transform_features(chunk, bundle))
+        y_true = bundle["pt_target"].transform(chunk[[target_col]].to_numpy()).ravel()
+        part = y_true - y_pred
+        seen += len(part)
+        # Random keys + keep the max_residuals smallest = uniform sample without replacement
+        residuals = np.concatenate([residuals, part])
+        keys = np.concatenate([keys, rng.random(len(part))])
+        if len(residuals) > max_residuals:
+            keep = np.argpartition(keys, max_residuals)[:max_residuals]
+            residuals, keys = residuals[keep], keys[keep]
+
+    if not len(residuals):
+        raise ValueError(f"No labelled rows in {path}")
+    lower, upper = np.quantile(residuals, [alpha / 2, 1 - alpha / 2])
+    return {"version": bundle["version"], "alpha": alpha, "lower": float(lower),
+            "upper": float(upper), "n": seen}
+
+
+def main(argv=None) -> int:
+    from pipeline import ROOT, load_bundle
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    cal = sub.add_parser("calibrate", help="Write conformal.json for a bundle from labelled readings")
+    cal.add_argument("data", help="CSV or Parquet file with the model features and observed AQI")
+    cal.add_argument("--bundle", default=str(ROOT))
+    cal.add_argument("--alpha", type=float, default=0.1, help="Miscoverage rate (0.1 -> 90%% interval)")
+    cal.add_argument("--target-col", default="aqi")
+    args = parser.parse_args(argv)
+
+    bundle = load_bundle(args.bundle)
+    calibration = calibrate(args.data, bundle, args.alpha, args.target_col)
+    out = Path(args.bundle) / CONFORMAL_FILE
+    out.write_text(json.dumps(calibration, indent=2))
+    print(f"{1 - args.alpha:.0%} interval offsets in pt_target space: "
+          f"[{calibration['lower']:+.3f}, {calibration['upper']:+.3f}] from {calibration['n']:,} rows -> {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
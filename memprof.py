@@ -0,0 +1,199 @@
+"""
+On-demand memory profiling for long-running app workers.
+
+Nothing is traced until an operator starts it. Snapshots are taken on a background
+thread, one at a time, and at most MAX_SNAPSHOTS are kept. Diffs between two snapshots
+are grouped by the function that made the allocation: app.py and the repo's modules
+are resolved to function names via their AST, and other files are grouped per file.
+Copying the traces still holds the GIL briefly, in proportion to the live traced
+allocations, so traceback depth is kept at one frame.
+
+object_report() adds object counts for the things suspected of growing: DataFrames,
+explainers, model objects and large strings (base64 assets), plus session-state and
+cache sizes. Its gc.get_objects() walk holds the GIL for the whole heap, so
+MemoryProfiler.object_report reuses the process-wide part for OBJECT_REPORT_TTL
+seconds and only the caller's session-state sizes are recomputed.
+"""
+import ast
+import gc
+import sys
+import threading
+import time
+import tracemalloc
+from bisect import bisect_right
+from collections import Counter, deque
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+MAX_SNAPSHOTS = 8
+LARGE_STRING = 100_000  # characters
+OBJECT_REPORT_TTL = 60  # seconds
+
+# Type names whose live instance counts are reported
+WATCHED_TYPES = {"DataFrame", "Series", "TreeExplainer", "Tree", "Booster", "LGBMRegressor",
+                 "PowerTransformer", "Figure"}
+
+
+@lru_cache(maxsize=None)
+def _function_index(filename: str):
+    """Sorted (start_line, end_line, qualname) of every function in a repo source file"""
+    try:
+        tree = ast.parse(Path(filename).read_text(encoding="utf-8"))
+    except (OSError, SyntaxError, ValueError):
+        return []
+    spans = []
+
+    def _walk(node, prefix):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                name = f"{prefix}{child.name}"
+                if not isinstance(child, ast.ClassDef):
+                    spans.append((child.lineno, child.end_lineno, name))
+                _walk(child, f"{name}.")
+
+    _walk(tree, "")
+    return sorted(spans)
+
+
+def _owner(filename: str, lineno: int) -> str:
+    """'file:function' for repo code, else the file path"""
+    path = Path(filename)
+    if ROOT not in path.parents:
+        return filename
+    spans = _function_index(filename)
+    i = bisect_right(spans, (lineno, float("inf"), "")) - 1
+    # Innermost enclosing function: scan back over candidates starting at or before lineno
+    while i >= 0:
+        start, end, name = spans[i]
+        if start <= lineno <= end:
+            return f"{path.name}:{name}"
+        i -= 1
+    return f"{path.name}:<module>"
+
+
+class MemoryProfiler:
+    """tracemalloc snapshots taken off the script thread, diffed by function"""
+
+    def __init__(self):
+        self.snapshots = deque(maxlen=MAX_SNAPSHOTS)   # (label, taken_at, snapshot)
+        self._lock = threading.Lock()
+        self.busy = False
+        self._objects = None     # (monotonic time, process-wide object report)
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(1)
+
+    def stop(self):
+        tracemalloc.stop()
+        self.snapshots.clear()
+
+    def request_snapshot(self, label: str = "") -> bool:
+        """Take a snapshot in the background; False if tracing is off or one is in progress"""
+        if not tracemalloc.is_tracing() or not self._lock.acquire(blocking=False):
+            return False
+        self.busy = True
+
+        def _take():
+            try:
+                snapshot = tracemalloc.take_snapshot().filter_traces([
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                    tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+                ])
+                self.snapshots.append((label or f"#{len(self.snapshots) + 1}", datetime.now(), snapshot))
+            finally:
+                self.busy = False
+                self._lock.release()
+
+        threading.Thread(target=_take, name="memprof-snapshot", daemon=True).start()
+        return True
+
+    def object_report(self, session_state=None, max_age: float = OBJECT_REPORT_TTL) -> dict:
+        """object_report(), walking the heap at most once per max_age seconds"""
+        cached = self._objects
+        if cached is None or time.monotonic() - cached[0] > max_age:
+            cached = self._objects = (time.monotonic(), object_report())
+        report = {**cached[1], "age_seconds": round(time.monotonic() - cached[0])}
+        if session_state is not None:
+            report["session_state"] = session_state_sizes(session_state)
+        return report
+
+    def diff(self, older: datetime, newer: datetime, top: int = 25):
+        """
+        [(owner, size_diff_bytes, count_diff)] between the snapshots taken at `older` and
+        `newer`, largest growth first, or None if either has since been rotated out.
+        Snapshots are identified by taken_at because positions shift as the deque rotates.
+        """
+        by_time = {taken_at: snapshot for _, taken_at, snapshot in list(self.snapshots)}
+        if older not in by_time or newer not in by_time:
+            return None
+        old_snap, new_snap = by_time[older], by_time[newer]
+        grouped = Counter()
+        counts = Counter()
+        for stat in new_snap.compare_to(old_snap, "lineno"):
+            frame = stat.traceback[0]
+            owner = _owner(frame.filename, frame.lineno)
+            grouped[owner] += stat.size_diff
+            counts[owner] += stat.count_diff
+        return [(owner, size, counts[owner]) for owner, size in grouped.most_common(top)]
+
+
+def _sizeof(value) -> int:
+    """Rough deep-ish size of a session-state value"""
+    if hasattr(value, "memory_usage"):
+        try:
+            return int(value.memory_usage(deep=True).sum())
+        except TypeError:
+            pass
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_sizeof(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_sizeof(v) for v in value.values())
+    return sys.getsizeof(value)
+
+
+def session_state_sizes(session_state) -> dict:
+    return {str(k): _sizeof(v) for k, v in session_state.items()}
+
+
+def object_report(session_state=None) -> dict:
+    """Counts of watched objects, large strings, session-state sizes and Streamlit cache sizes"""
+    types = Counter()
+    large_strings = large_bytes = 0
+    for obj in gc.get_objects():
+        name = type(obj).__name__
+        if name in WATCHED_TYPES:
+            types[name] += 1
+        elif name == "dict":
+            # Strings aren't GC-tracked; count the large ones held in tracked dicts
+            for value in obj.values():
+                if isinstance(value, str) and len(value) >= LARGE_STRING:
+                    large_strings += 1
+                    large_bytes += len(value)
+
+    report = {"objects": dict(types), "large_strings": large_strings, "large_string_bytes": large_bytes}
+
+    if session_state is not None:
+        report["session_state"] = session_state_sizes(session_state)
+
+    try:
+        from streamlit.runtime import get_instance
+        runtime = get_instance()
+        sessions = runtime._session_mgr.list_active_sessions()
+        report["active_sessions"] = len(sessions)
+        report["history_rows"] = sum(
+            len(info.session.session_state.filtered_state.get("prediction_history", []))
+            for info in sessions)
+        caches = Counter()
+        for stat in runtime.stats_mgr.get_stats():
+            caches[f"{stat.category_name}:{stat.cache_name}"] += stat.byte_length
+        report["caches"] = dict(caches)
+    except Exception as e:  # private runtime API; report what we can
+        report["runtime_error"] = str(e)
+    return report
@@ -0,0 +1,147 @@
+"""
+Per-region model routing.
+
+regions.json at the repo root maps a region key to a bundle directory (relative to
+the repo root) and bounds how many bundles stay loaded:
+
+    {
+      "default": "kl",
+      "regions": {"kl": ".", "tw": "bundles/tw-20250901", "sg": "bundles/sg-20251002"},
+      "max_bundles": 3,
+      "max_mb": 1024
+    }
+
+Without the file every request uses the root bundle. Unknown regions fall back to the
+default. Bundles load on first use; concurrent first requests for a region wait on one
+load. The pool keeps the most recently used bundles within max_bundles and max_mb.
+A bundle's size is estimated from its artifact files on disk. The default bundle is
+pinned, since the app's explanations and drift reference use it.
+
+Objects built from a bundle (its TreeExplainer, its similar-conditions index) are held
+by the pool through derived() and dropped together with the bundle on eviction, so no
+other cache keeps an evicted model alive.
+
+score_by_region() groups a batch by region so each bundle runs one vectorized predict.
+"""
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+
+import numpy as np
+
+from pipeline import ROOT, bundle_files, load_bundle, score_frame
+
+REGIONS_FILE = ROOT / "regions.json"
+DEFAULT_REGION = "default"
+
+
+def bundle_bytes(directory) -> int:
+    """On-disk size of a bundle's artifacts, as a proxy for its resident size"""
+    files, _ = bundle_files(directory)
+    return sum((Path(directory) / name).stat().st_size for name in files.values())
+
+
+class ModelPool:
+    """LRU pool of region bundles, bounded by count and estimated bytes"""
+
+    def __init__(self, regions: dict, default: str, max_bundles: int = 4, max_bytes=None):
+        self.regions = {key: str(ROOT / path) for key, path in regions.items()}
+        self.default = default
+        self.max_bundles = max_bundles
+        self.max_bytes = max_bytes
+        self._bundles = OrderedDict()  # region -> (bundle, bytes), least recently used first
+        self._loading = {}             # region -> Future while its first load is in progress
+        self._derived = {}             # region -> {name: object built from its bundle}
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    @classmethod
+    def from_config(cls, path=REGIONS_FILE) -> "ModelPool":
+        path = Path(path)
+        if not path.exists():
+            return cls({DEFAULT_REGION: "."}, DEFAULT_REGION)
+        config = json.loads(path.read_text())
+        max_mb = config.get("max_mb")
+        return cls(config["regions"], config["default"], config.get("max_bundles", 4),
+                   max_mb * 2**20 if max_mb else None)
+
+    def resolve(self, region) -> str:
+        return region if region in self.regions else self.default
+
+    def get(self, region=None) -> dict:
+        """The bundle for a region, loading it on first use"""
+        key = self.resolve(region)
+        with self._lock:
+            entry = self._bundles.get(key)
+            if entry is not None:
+                self._bundles.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            future = self._loading.get(key)
+            loader = future is None
+            if loader:
+                future = self._loading[key] = Future()
+                self.misses += 1
+        if not loader:
+            return future.result()
+
+        try:
+            bundle = load_bundle(self.regions[key])
+            size = bundle_bytes(self.regions[key])
+        except BaseException as e:
+            with self._lock:
+                del self._loading[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self._bundles[key] = (bundle, size)
+            del self._loading[key]
+            self._evict(keep=key)
+        future.set_result(bundle)
+        return bundle
+
+    def derived(self, region, name: str, factory):
+        """
+        factory(bundle) for a region's bundle, built once and kept while the bundle is
+        resident. Two first calls may both build it; the first one stored wins.
+        """
+        key = self.resolve(region)
+        bundle = self.get(key)
+        with self._lock:
+            derived = self._derived.get(key, {})
+            if name in derived:
+                return derived[name]
+        value = factory(bundle)
+        with self._lock:
+            entry = self._bundles.get(key)
+            if entry is not None and entry[0] is bundle:
+                value = self._derived.setdefault(key, {}).setdefault(name, value)
+        return value
+
+    def _evict(self, keep):
+        """Drop least recently used bundles until the pool is within its limits (lock held)"""
+        while len(self._bundles) > self.max_bundles or (
+                self.max_bytes and sum(size for _, size in self._bundles.values()) > self.max_bytes):
+            victim = next((k for k in self._bundles if k not in (keep, self.default)), None)
+            if victim is None:
+                break
+            del self._bundles[victim]
+            self._derived.pop(victim, None)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"resident": list(self._bundles), "mb": round(sum(s for _, s in self._bundles.values()) / 2**20, 1),
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+def score_by_region(frame, regions, pool: ModelPool, num_iteration=None) -> np.ndarray:
+    """AQI for every row of a frame of raw readings, with one score_frame call per region"""
+    keys = np.array([pool.resolve(r) for r in regions], dtype=object)
+    aqi = np.empty(len(frame))
+    for key in dict.fromkeys(keys):
+        rows = np.flatnonzero(keys == key)
+        aqi[rows] = score_frame(frame.iloc[rows], pool.get(key), num_iteration)
+    return aqi
@@ -0,0 +1,131 @@
+"""
+Model bundle loading and vectorized scoring, shared by app.py and the offline tools.
+
+Scoring follows the same path as predict_aqi in the app:
+  1) apply pt_features to the SKEWED_FEATURES subset,
+  2) predict with the model in transformed target space,
+  3) invert with pt_target back to AQI units.
+"""
+import json
+from concurrent.futures import FIRST_COMPLETED, wait
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from schema import FEATURES, SKEWED_FEATURES
+
+ROOT = Path(__file__).resolve().parent
+
+# File names of the original artifacts; a bundle directory can override them in manifest.json
+DEFAULT_BUNDLE_FILES = {
+    "pt_features": "pt_features.pkl",
+    "pt_target": "pt_target.pkl",
+    "model": "lgb_tuned_model_20250901_105103.pkl",
+}
+
+
+def bundle_files(directory=ROOT):
+    """({artifact name: file name}, version) for a bundle directory, without loading anything"""
+    directory = Path(directory)
+    files = dict(DEFAULT_BUNDLE_FILES)
+    version = Path(files["model"]).stem
+
+    manifest_path = directory / "manifest.json"
+    if manifest_path.exists():
+        manifest = json.loads(manifest_path.read_text())
+        files.update(manifest.get("files", {}))
+        version = manifest.get("version", version)
+    return files, version
+
+
+def load_bundle(directory=ROOT) -> dict:
+    """
+    Load a transformer/model bundle from a directory.
+
+    Returns {"pt_features", "pt_target", "model", "version", "path", "conformal"} plus any
+    extra artifacts (e.g. quantile models) named in the directory's manifest.json, which
+    has the form {"version": ..., "files": {...}}. Without a manifest the original file
+    names are used and the version is the model file's stem.
+    """
+    directory = Path(directory)
+    files, version = bundle_files(directory)
+    bundle = {name: joblib.load(directory / file_name) for name, file_name in files.items()}
+    bundle["version"] = version
+    bundle["path"] = str(directory)
+
+    from intervals import load_conformal
+    bundle["conformal"] = load_conformal(bundle)
+    return bundle
+
+
+def transform_features(frame: pd.DataFrame, bundle: dict) -> pd.DataFrame:
+    """Model input for a frame of raw readings: FEATURES in training order, skewed ones transformed"""
+    transformed = frame[FEATURES].astype(float)
+    transformed[SKEWED_FEATURES] = bundle["pt_features"].transform(transformed[SKEWED_FEATURES])
+    return transformed
+
+
+def predict_model_space(transformed: pd.DataFrame, bundle: dict, num_iteration=None) -> np.ndarray:
+    """
+    Point-model output in pt_target space. num_iteration trades accuracy for speed:
+    K evaluates only the first K boosting iterations, "early" stops each row once its
+    AQI category is settled (see truncation.py).
+    """
+    if num_iteration == "early":
+        from truncation import predict_early_exit
+        return predict_early_exit(transformed, bundle)[0]
+    if num_iteration is None:
+        return bundle["model"].predict(transformed)
+    return bundle["model"].predict(transformed, num_iteration=num_iteration)
+
+
+def predict_transformed(transformed: pd.DataFrame, bundle: dict, num_iteration=None) -> np.ndarray:
+    """
+    Predict on already-transformed inputs and invert pt_target back to AQI units.
+    See predict_model_space for num_iteration.
+    """
+    y_trans = predict_model_space(transformed, bundle, num_iteration).reshape(-1, 1)
+    return bundle["pt_target"].inverse_transform(y_trans).ravel()
+
+
+def score_frame(frame: pd.DataFrame, bundle: dict, num_iteration=None) -> np.ndarray:
+    """AQI (float) for every row of a frame of raw readings, in one vectorized pass"""
+    return predict_transformed(transform_features(frame, bundle), bundle, num_iteration)
+
+
+def read_chunks(path, chunksize: int, columns=None):
+    """Yield DataFrames of at most `chunksize` rows from a CSV or Parquet file"""
+    path = Path(path)
+    if path.suffix.lower() in (".parquet", ".pq"):
+        import pyarrow.parquet as pq
+        parquet = pq.ParquetFile(path)
+        for batch in parquet.iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize, usecols=columns)
+
+
+def imap_bounded(executor, fn, items, max_pending: int):
+    """
+    Like executor.map, but keeps at most `max_pending` tasks in flight so a large
+    input is never read into memory ahead of the workers. Yields (item_index, result)
+    in completion order.
+    """
+    pending = {}
+    items = iter(enumerate(items))
+    exhausted = False
+    while pending or not exhausted:
+        while not exhausted and len(pending) < max_pending:
+            try:
+                index, item = next(items)
+            except StopIteration:
+                exhausted = True
+                break
+            pending[executor.submit(fn, item)] = index
+        if not pending:
+            break
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield pending.pop(future), future.result()
@@ -0,0 +1,186 @@
+"""
+Incremental retraining of the model bundle from accumulated labelled readings.
+
+Reads readings that now have observed AQI (the model features plus an observed AQI
+column, e.g. station archives joined to past predictions) in chunks. It keeps a
+bounded uniform sample of at most --max-rows rows, then:
+
+1) checks whether the new data has drifted from what each PowerTransformer was fitted
+   on (PSI over standard-normal deciles in transformed space, see drift.py),
+2) with no transformer drift: continues training the existing booster on the new data
+   (warm start via init_model, --rounds extra trees),
+   with drift: refits the drifted transformer(s) and retrains the booster from
+   scratch with the tuned parameters, because the old trees' splits are only valid in
+   the old transformed space,
+3) compares old and new bundles on a holdout split and writes a new versioned bundle
+   to bundles/<version>/ (with manifest.json) unless it is worse (--force to override).
+
+The job lowers its own CPU priority and caps LightGBM threads, so it can run on a
+serving host without competing with the app. --background detaches it:
+
+    python retrain.py labelled.csv --background
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+
+from drift import PSI_ALERT, NORMAL_DECILES, psi
+from pipeline import ROOT, load_bundle, read_chunks, score_frame, transform_features
+from schema import FEATURES, SKEWED_FEATURES
+
+BUNDLES_DIR = ROOT / "bundles"
+
+
+def sample_labelled(path, target_col, max_rows, chunksize=200_000, seed=0) -> pd.DataFrame:
+    """Uniform sample of at most max_rows complete rows, read in chunks (bounded memory)"""
+    rng = np.random.default_rng(seed)
+    sample = None
+    for chunk in read_chunks(path, chunksize, FEATURES + [target_col]):
+        chunk = chunk.apply(pd.to_numeric, errors="coerce").dropna()
+        if chunk.empty:
+            continue
+        # Random keys + keep the max_rows smallest = uniform sample without replacement
+        chunk = chunk.assign(_key=rng.random(len(chunk)))
+        sample = chunk if sample is None else pd.concat([sample, chunk])
+        if len(sample) > max_rows:
+            sample = sample.nsmallest(max_rows, "_key")
+    if sample is None:
+        raise ValueError(f"No complete labelled rows in {path}")
+    return sample.drop(columns="_key").reset_index(drop=True)
+
+
+def transformed_psi(values: np.ndarray) -> float:
+    """PSI of standardized, transformed values against the N(0, 1) the transformer was fitted to"""
+    counts = np.bincount(np.searchsorted(NORMAL_DECILES, values, side="right"), minlength=10)
+    return psi(counts / counts.sum(), [0.1] * 10)
+
+
+def transformer_drift(bundle: dict, frame: pd.DataFrame, target_col: str) -> dict:
+    """PSI per skewed feature and for the target, in each transformer's output space"""
+    # transformed_psi compares against N(0, 1), which only holds for standardized output
+    for name in ("pt_features", "pt_target"):
+        if not getattr(bundle[name], "standardize", False):
+            raise ValueError(f"{name} in {bundle['path']} was fitted with standardize=False; "
+                             "its output isn't N(0, 1), so transformer drift can't be scored")
+    transformed = bundle["pt_features"].transform(frame[SKEWED_FEATURES])
+    scores = {name: transformed_psi(transformed[:, j]) for j, name in enumerate(SKEWED_FEATURES)}
+    scores[target_col] = transformed_psi(bundle["pt_target"].transform(frame[[target_col]]).ravel())
+    return scores
+
+
+def mae(bundle: dict, frame: pd.DataFrame, target_col: str) -> float:
+    return float(np.mean(np.abs(score_frame(frame, bundle) - frame[target_col].to_numpy())))
+
+
+def retrain(bundle: dict, frame: pd.DataFrame, target_col="aqi", rounds=100, threads=1,
+            holdout=0.1, seed=0):
+    """Return (new bundle dict, report dict)"""
+    rng = np.random.default_rng(seed)
+    is_holdout = rng.random(len(frame)) < holdout
+    train, test = frame[~is_holdout], frame[is_holdout]
+
+    drift_scores = transformer_drift(bundle, train, target_col)
+    refit_features = any(drift_scores[f] >= PSI_ALERT for f in SKEWED_FEATURES)
+    refit_target = drift_scores[target_col] >= PSI_ALERT
+
+    new = dict(bundle)
+    if refit_features:
+        new["pt_features"] = clone(bundle["pt_features"]).fit(train[SKEWED_FEATURES])
+    if refit_target:
+        new["pt_target"] = clone(bundle["pt_target"]).fit(train[[target_col]])
+
+    X = transform_features(train, new)
+    y = new["pt_target"].transform(train[[target_col]]).ravel()
+    model = clone(bundle["model"]).set_params(n_jobs=threads)
+    if refit_features or refit_target:
+        # Old splits live in the old transformed space: retrain with the tuned parameters
+        model.fit(X, y)
+        mode = "full"
+    else:
+        model.set_params(n_estimators=rounds)
+        model.fit(X, y, init_model=bundle["model"].booster_)
+        mode = "warm_start"
+    new["model"] = model
+
+    report = {
+        "mode": mode,
+        "rows": int(len(train)),
+        "holdout_rows": int(len(test)),
+        "refit": [name for name, flag in (("pt_features", refit_features), ("pt_target", refit_target)) if flag],
+        "drift_psi": {k: round(v, 4) for k, v in drift_scores.items()},
+        "holdout_mae_old": mae(bundle, test, target_col) if len(test) else None,
+        "holdout_mae_new": mae(new, test, target_col) if len(test) else None,
+    }
+    return new, report
+
+
+def write_bundle(bundle: dict, report: dict, parent: str, out_root=BUNDLES_DIR) -> Path:
+    """Write bundles/<version>/ with the three artifacts and a manifest"""
+    version = f"lgb_{datetime.now():%Y%m%d_%H%M%S}"
+    out = Path(out_root) / version
+    out.mkdir(parents=True)
+    files = {"pt_features": "pt_features.pkl", "pt_target": "pt_target.pkl", "model": "model.pkl"}
+    for name, file_name in files.items():
+        joblib.dump(bundle[name], out / file_name)
+    manifest = {"version": version, "parent": parent, "created": datetime.now().isoformat(timespec="seconds"),
+                "files": files, "training": report}
+    (out / "manifest.json").write_text(json.dumps(manifest, indent=2))
+    return out
+
+
+def _lower_priority():
+    try:
+        os.nice(19)
+    except (AttributeError, OSError):
+        pass  # not available on this platform
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("data", help="CSV or Parquet with the model features and observed AQI")
+    parser.add_argument("--bundle", default=str(ROOT), help="Bundle to continue from (default: repo root)")
+    parser.add_argument("--target-col", default="aqi")
+    parser.add_argument("--max-rows", type=int, default=500_000, help="Cap on rows held in memory")
+    parser.add_argument("--rounds", type=int, default=100, help="Extra boosting rounds for a warm start")
+    parser.add_argument("--threads", type=int, default=1, help="LightGBM threads")
+    parser.add_argument("--force", action="store_true", help="Write the bundle even if holdout MAE got worse")
+    parser.add_argument("--background", action="store_true", help="Detach and run at low priority")
+    parser.add_argument("--log", default="retrain.log", help="Log file for --background")
+    args = parser.parse_args(argv)
+
+    if args.background:
+        child = [a for a in (argv if argv is not None else sys.argv[1:]) if a != "--background"]
+        with open(args.log, "a") as log:
+            proc = subprocess.Popen([sys.executable, __file__, *child], stdout=log, stderr=log,
+                                    stdin=subprocess.DEVNULL, start_new_session=True)
+        print(f"Retraining in background (pid {proc.pid}), logging to {args.log}")
+        return 0
+
+    _lower_priority()
+    start = time.perf_counter()
+    bundle = load_bundle(args.bundle)
+    frame = sample_labelled(args.data, args.target_col, args.max_rows)
+    new, report = retrain(bundle, frame, args.target_col, args.rounds, args.threads)
+    print(json.dumps(report, indent=2))
+
+    old_mae, new_mae = report["holdout_mae_old"], report["holdout_mae_new"]
+    if old_mae is not None and new_mae > old_mae and not args.force:
+        print(f"Not writing a bundle: holdout MAE {new_mae:.2f} is worse than {old_mae:.2f}")
+        return 1
+    out = write_bundle(new, report, parent=bundle["version"])
+    print(f"Wrote {out} in {time.perf_counter() - start:.0f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
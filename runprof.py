@@ -0,0 +1,99 @@
+"""
+On-demand cProfile capture of a single script run.
+
+Nothing is imported or enabled until an operator arms a capture. app.py then wraps
+that one run in start()/finish(), and the result is kept in the operator's session
+only. finish() reports the top functions by cumulative time, the raw pstats data
+(readable with `python -m pstats` or snakeviz) and collapsed stacks for
+flamegraph.pl / speedscope.
+
+cProfile records caller -> callee edges, not whole stacks, so the collapsed stacks are
+an approximation. Each function's time is split between its call paths in proportion
+to the time each caller spent in it (gprof-style). Paths below MIN_SHARE of the run are
+dropped.
+"""
+import cProfile
+import marshal
+import pstats
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+TOP_N = 30
+MAX_DEPTH = 60
+MIN_SHARE = 1e-4  # of total run time
+
+
+def _label(func) -> str:
+    """'app.py:predict_aqi' for repo code, 'pandas/core/frame.py:__init__' otherwise"""
+    filename, lineno, name = func
+    if filename == "~":
+        return name  # builtins, e.g. <built-in method numpy.array>
+    path = Path(filename)
+    if ROOT in path.parents:
+        return f"{path.relative_to(ROOT)}:{name}"
+    parts = path.parts
+    for marker in ("site-packages", "dist-packages", "lib"):
+        if marker in parts:
+            parts = parts[len(parts) - parts[::-1].index(marker):]
+            break
+    return f"{'/'.join(parts[-3:])}:{name}"
+
+
+def start() -> cProfile.Profile:
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def top_functions(stats: dict, n: int = TOP_N) -> list:
+    """Rows for the n functions with the highest cumulative time"""
+    rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:n]
+    return [{"function": _label(func), "calls": nc, "tottime_ms": round(tt * 1000, 2),
+             "cumtime_ms": round(ct * 1000, 2)} for func, (cc, nc, tt, ct, callers) in rows]
+
+
+def collapsed_stacks(stats: dict) -> str:
+    """Approximate 'a;b;c <microseconds>' lines from the call graph"""
+    children = {}
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller in callers:
+            children.setdefault(caller, []).append(func)
+    roots = [func for func, entry in stats.items() if not entry[4]]
+    total = sum(stats[func][3] for func in roots) or 1.0
+    folded = {}
+
+    def _walk(func, path, share):
+        _, _, tt, ct, _ = stats[func]
+        key = ";".join(_label(f) for f in path)
+        folded[key] = folded.get(key, 0.0) + tt * share
+        if len(path) >= MAX_DEPTH:
+            return
+        for child in children.get(func, ()):
+            if child in path:
+                continue  # recursion: its time is already counted along this path
+            child_ct = stats[child][3]
+            edge_ct = stats[child][4][func][3]
+            if child_ct <= 0:
+                continue
+            child_share = share * edge_ct / child_ct
+            if child_share * child_ct / total >= MIN_SHARE:
+                _walk(child, path + (child,), child_share)
+
+    for root in roots:
+        _walk(root, (root,), 1.0)
+    return "\n".join(f"{stack} {round(seconds * 1e6)}"
+                     for stack, seconds in sorted(folded.items()) if seconds * 1e6 >= 1)
+
+
+def finish(profiler: cProfile.Profile, label: str) -> dict:
+    """Stop the capture and summarise it for the operator panel"""
+    profiler.disable()
+    stats = pstats.Stats(profiler).stats
+    total = sum(tt for _, _, tt, _, _ in stats.values())
+    return {
+        "label": label,
+        "total_ms": round(total * 1000, 1),
+        "top": top_functions(stats),
+        "pstats": marshal.dumps(stats),  # same format as Stats.dump_stats()
+        "collapsed": collapsed_stacks(stats),
+    }
@@ -0,0 +1,89 @@
+"""
+Feature schema and AQI bands shared by app.py and the offline tools.
+
+Kept free of heavy imports so the app can use it on every tab.
+"""
+import numpy as np
+
+# Model input columns, in the order the model was trained on
+FEATURES = [
+    "so2",
+    "co",
+    "o3",
+    "o3_8hr",
+    "pm10",
+    "pm2.5",
+    "no2",
+    "nox",
+    "co_8hr",
+    "pm2.5_avg",
+    "pm10_avg",
+    "so2_avg",
+    "windspeed",
+    "winddirec",
+]
+
+# Define skewed features that were transformed during training
+SKEWED_FEATURES = [
+    "o3_8hr",
+    "pm10",
+    "pm2.5",
+    "no2",
+    "nox",
+    "pm2.5_avg",
+    "pm10_avg",
+    "so2_avg",
+    "windspeed"
+]
+
+# (min, max, step) of each input, matching the Predict tab sliders
+FEATURE_RANGES = {
+    "so2": (0.0, 1004.0, 1.0),
+    "co": (0.0, 50.4, 0.1),
+    "o3": (0.0, 604.0, 1.0),
+    "o3_8hr": (0.0, 200.0, 1.0),
+    "pm10": (0.0, 604.0, 0.1),
+    "pm2.5": (0.0, 500.4, 0.1),
+    "no2": (0.0, 2049.0, 1.0),
+    "nox": (0.0, 2049.0, 1.0),
+    "co_8hr": (0.0, 50.4, 0.1),
+    "pm2.5_avg": (0.0, 500.4, 0.1),
+    "pm10_avg": (0.0, 604.0, 0.1),
+    "so2_avg": (0.0, 1004.0, 1.0),
+    "windspeed": (0.0, 30.0, 0.1),
+    "winddirec": (0.0, 359.0, 1.0),
+}
+
+# Upper (inclusive) AQI bound of each band but the last
+AQI_BREAKPOINTS = [50, 100, 150, 200, 300]
+
+# (category, css class, color) per band
+AQI_CATEGORIES = [
+    ("Good", "good", "#00e400"),
+    ("Moderate", "moderate", "#ffff00"),
+    ("Unhealthy for Sensitive Groups", "unhealthy-sensitive", "#ff7e00"),
+    ("Unhealthy", "unhealthy", "#ff0000"),
+    ("Very Unhealthy", "very-unhealthy", "#9f7aea"),
+    ("Hazardous", "hazardous", "#7e0023"),
+]
+
+
+def get_aqi_category(aqi_value):
+    """Return AQI category and color based on the range it falls into"""
+    if aqi_value <= 50:
+        return "Good", "good", "#00e400"
+    elif aqi_value <= 100:
+        return "Moderate", "moderate", "#ffff00"
+    elif aqi_value <= 150:
+        return "Unhealthy for Sensitive Groups", "unhealthy-sensitive", "#ff7e00"
+    elif aqi_value <= 200:
+        return "Unhealthy", "unhealthy", "#ff0000"
+    elif aqi_value <= 300:
+        return "Very Unhealthy", "very-unhealthy", "#9f7aea"
+    else:
+        return "Hazardous", "hazardous", "#7e0023"
+
+
+def aqi_band_index(aqi_values):
+    """Vectorized get_aqi_category: index into AQI_CATEGORIES for each (rounded) AQI value"""
+    return np.searchsorted(AQI_BREAKPOINTS, np.rint(aqi_values), side="left")
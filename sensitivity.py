@@ -0,0 +1,167 @@
+"""
+Global sensitivity of the predicted AQI to each input (Sobol indices).
+
+Inputs are sampled with a scrambled Sobol sequence, either uniformly within the
+FEATURE_RANGES the sliders allow or, with --data, through each feature's empirical
+quantiles. From two base matrices A and B and the 14 "radial" matrices AB_i (A with
+column i taken from B), the indices are:
+
+  first order  S_i  = mean(f(B) * (f(AB_i) - f(A))) / Var(f)    (Saltelli 2010)
+  total        ST_i = mean((f(A) - f(AB_i))^2) / 2 / Var(f)      (Jansen 1999)
+
+S_i is the share of the AQI variance explained by input i alone. ST_i adds every
+interaction involving i. All N * 16 rows are scored through the pipeline in large
+batches. Bootstrap intervals come from resampling the N base rows.
+
+Results are stored next to the bundle as sobol.json, tagged with the model version:
+
+    python sensitivity.py compute [--samples 8192] [--data reference.csv]
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from schema import FEATURE_RANGES, FEATURES
+
+SOBOL_FILE = "sobol.json"
+BATCH_ROWS = 250_000
+
+
+def load_indices(bundle: dict):
+    """Stored Sobol indices for this bundle's model version, or None"""
+    path = Path(bundle["path"]) / SOBOL_FILE
+    if not path.exists():
+        return None
+    indices = json.loads(path.read_text())
+    if indices.get("version") != bundle["version"]:
+        return None  # computed for a different model
+    return indices
+
+
+def sample_inputs(n: int, seed: int = 0, reference=None):
+    """
+    (A, B) input matrices of n rows each, in FEATURES order. A uniform Sobol design
+    on [0, 1) is mapped to FEATURE_RANGES, or through the quantiles of a reference frame.
+    """
+    from scipy.stats import qmc
+
+    d = len(FEATURES)
+    # One 2d-dimensional sequence keeps A and B jointly low-discrepancy
+    unit = qmc.Sobol(d=2 * d, scramble=True, seed=seed).random(n)
+    unit_a, unit_b = unit[:, :d], unit[:, d:]
+    if reference is None:
+        low = np.array([FEATURE_RANGES[f][0] for f in FEATURES], dtype=float)
+        high = np.array([FEATURE_RANGES[f][1] for f in FEATURES], dtype=float)
+        return low + unit_a * (high - low), low + unit_b * (high - low)
+
+    def _empirical(u):
+        return np.column_stack([np.nanquantile(reference[f].to_numpy(dtype=float), u[:, i])
+                                for i, f in enumerate(FEATURES)])
+    return _empirical(unit_a), _empirical(unit_b)
+
+
+def sample_reference(path, max_rows: int = 200_000, seed: int = 0, chunksize: int = 200_000):
+    """Uniform sample of at most max_rows rows of a reference file, read in chunks (bounded memory)"""
+    import pandas as pd
+
+    from pipeline import read_chunks
+
+    rng = np.random.default_rng(seed)
+    sample = None
+    for chunk in read_chunks(path, chunksize, FEATURES):
+        # Random keys + keep the max_rows smallest = uniform sample without replacement
+        chunk = chunk.apply(pd.to_numeric, errors="coerce").assign(_key=rng.random(len(chunk)))
+        sample = chunk if sample is None else pd.concat([sample, chunk])
+        if len(sample) > max_rows:
+            sample = sample.nsmallest(max_rows, "_key")
+    if sample is None:
+        raise ValueError(f"No rows in {path}")
+    return sample.drop(columns="_key").reset_index(drop=True)
+
+
+def _score(matrix: np.ndarray, bundle: dict, num_iteration=None) -> np.ndarray:
+    import pandas as pd
+
+    from pipeline import score_frame
+    return np.concatenate([
+        score_frame(pd.DataFrame(matrix[i:i + BATCH_ROWS], columns=FEATURES), bundle, num_iteration)
+        for i in range(0, len(matrix), BATCH_ROWS)
+    ])
+
+
+def sobol_indices(f_a, f_b, f_ab):
+    """(first_order, total) arrays from f(A), f(B) and the (d, n) outputs f(AB_i)"""
+    variance = np.var(np.concatenate([f_a, f_b]))
+    first = np.mean(f_b * (f_ab - f_a), axis=1) / variance
+    total = 0.5 * np.mean((f_a - f_ab) ** 2, axis=1) / variance
+    return first, total
+
+
+def compute(bundle: dict, n: int = 8192, seed: int = 0, reference=None, bootstrap: int = 200,
+            num_iteration=None) -> dict:
+    """Sobol indices for every feature, with bootstrap 95% intervals"""
+    a, b = sample_inputs(n, seed, reference)
+    d = len(FEATURES)
+    # Stack A, B and every AB_i so the model sees one long matrix
+    radial = np.repeat(a[np.newaxis], d, axis=0)
+    radial[np.arange(d), :, np.arange(d)] = b.T
+    outputs = _score(np.concatenate([a, b, radial.reshape(-1, d)]), bundle, num_iteration)
+    f_a, f_b, f_ab = outputs[:n], outputs[n:2 * n], outputs[2 * n:].reshape(d, n)
+
+    first, total = sobol_indices(f_a, f_b, f_ab)
+    rng = np.random.default_rng(seed)
+    resampled = [sobol_indices(f_a[rows], f_b[rows], f_ab[:, rows])
+                 for rows in (rng.integers(0, n, n) for _ in range(bootstrap))]
+    first_ci = np.percentile([r[0] for r in resampled], [2.5, 97.5], axis=0)
+    total_ci = np.percentile([r[1] for r in resampled], [2.5, 97.5], axis=0)
+
+    return {
+        "version": bundle["version"],
+        "samples": n,
+        "evaluations": len(outputs),
+        "inputs": "empirical" if reference is not None else "slider ranges",
+        "aqi_mean": float(np.mean(f_a)),
+        "aqi_std": float(np.std(np.concatenate([f_a, f_b]))),
+        "features": [
+            {"feature": feature, "first": float(first[i]), "total": float(total[i]),
+             "first_ci": [float(first_ci[0, i]), float(first_ci[1, i])],
+             "total_ci": [float(total_ci[0, i]), float(total_ci[1, i])]}
+            for i, feature in enumerate(FEATURES)
+        ],
+    }
+
+
+def main(argv=None) -> int:
+    from pipeline import ROOT, load_bundle
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("compute", help="Write sobol.json for a bundle")
+    run.add_argument("--bundle", default=str(ROOT))
+    run.add_argument("--samples", type=int, default=8192, help="Base rows N (a power of two); scores N * 16 rows")
+    run.add_argument("--data", help="Sample each feature from this CSV/Parquet file's quantiles instead of "
+                                    "the slider ranges")
+    run.add_argument("--reference-rows", type=int, default=200_000,
+                     help="Rows sampled from --data to estimate the quantiles")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--bootstrap", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    bundle = load_bundle(args.bundle)
+    reference = sample_reference(args.data, args.reference_rows, args.seed) if args.data else None
+    indices = compute(bundle, args.samples, args.seed, reference, args.bootstrap)
+
+    out = Path(args.bundle) / SOBOL_FILE
+    out.write_text(json.dumps(indices, indent=2))
+    print(f"{indices['evaluations']:,} model evaluations ({indices['inputs']}) -> {out}")
+    print(f"{'feature':<10} {'S1':>7} {'ST':>7}")
+    for row in sorted(indices["features"], key=lambda r: r["total"], reverse=True):
+        print(f"{row['feature']:<10} {row['first']:7.3f} {row['total']:7.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
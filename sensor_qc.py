@@ -0,0 +1,191 @@
+"""
+Sensor fault detection ahead of the predictor.
+
+Two kinds of checks, both vectorized over a batch of readings:
+
+- rules that hold for any physically sensible reading:
+    * every value within the FEATURE_RANGES the model was trained on
+    * NOx >= NO2 (NO2 is part of NOx) and PM2.5 <= PM10 (PM2.5 is part of PM10)
+    * a rolling average can't be exceeded by one of the hours it averages:
+      24-hr average * 24 >= hourly value, 8-hr average * 8 >= hourly value
+- per-station robust statistics over the last WINDOW readings, kept in a fixed ring
+  buffer per station (constant memory per station):
+    * spike: |x - median| > SPIKE_Z * 1.4826 * MAD, once MIN_HISTORY readings exist
+    * stuck: the same value for STUCK_READINGS readings in a row, for hourly sensor
+      values at least STUCK_MIN_STEPS slider steps above zero. Rolling averages change
+      slowly by design, and a value near the resolution floor (so2 = 1 ppb) is what a
+      clean, stable site reports, so neither is treated as stuck.
+
+SensorQC.process() flags individual features. It then either imputes them (the
+station's rolling median, else NaN, which LightGBM routes down its missing-value
+branches) or quarantines the whole reading. Every reading still enters the station
+history, so a genuine level shift becomes the new median after about WINDOW / 2
+readings instead of being flagged forever.
+"""
+import warnings
+
+import numpy as np
+
+from schema import FEATURE_RANGES, FEATURES
+
+WINDOW = 24
+SPIKE_Z = 6.0
+MIN_HISTORY = 8
+STUCK_READINGS = 6
+STUCK_MIN_STEPS = 10
+
+_COL = {f: i for i, f in enumerate(FEATURES)}
+_LOW = np.array([FEATURE_RANGES[f][0] for f in FEATURES])
+_HIGH = np.array([FEATURE_RANGES[f][1] for f in FEATURES])
+# Smallest meaningful difference per feature; also the floor for MAD
+_RESOLUTION = np.array([FEATURE_RANGES[f][2] for f in FEATURES])
+
+# (average, hourly, hours averaged)
+AVERAGE_PAIRS = [
+    ("pm2.5_avg", "pm2.5", 24),
+    ("pm10_avg", "pm10", 24),
+    ("so2_avg", "so2", 24),
+    ("o3_8hr", "o3", 8),
+    ("co_8hr", "co", 8),
+]
+
+# Features the stuck check applies to, and the smallest value it considers
+_STUCK_CHECKED = np.array([f not in {average for average, _, _ in AVERAGE_PAIRS} for f in FEATURES])
+_STUCK_FLOOR = STUCK_MIN_STEPS * _RESOLUTION
+
+
+def check_rules(values: np.ndarray):
+    """
+    (flags, violations) for an (n, 14) array in FEATURES order: flags is an (n, 14)
+    bool array, violations maps rule -> (mask of rows, message).
+    """
+    values = np.asarray(values, dtype=float)
+    flags = np.zeros(values.shape, dtype=bool)
+    violations = {}
+
+    def _flag(rule, mask, features, message):
+        if mask.any():
+            flags[np.ix_(mask, [_COL[f] for f in features])] = True
+            violations[rule] = (mask, message)
+
+    with np.errstate(invalid="ignore"):
+        outside = (values < _LOW) | (values > _HIGH)
+        if outside.any():
+            flags |= outside
+            violations["out_of_range"] = (outside.any(axis=1), "A reading is outside the range the model knows")
+
+        v = {f: values[:, i] for f, i in _COL.items()}
+        _flag("nox_below_no2", v["nox"] < v["no2"] - _RESOLUTION[_COL["no2"]], ("nox", "no2"),
+              "NOₓ is lower than NO₂, but NO₂ is part of NOₓ")
+        _flag("pm25_above_pm10", v["pm2.5"] > v["pm10"] + _RESOLUTION[_COL["pm10"]], ("pm2.5", "pm10"),
+              "PM₂.₅ is higher than PM₁₀, but PM₂.₅ is part of PM₁₀")
+        for average, hourly, hours in AVERAGE_PAIRS:
+            mask = v[average] * hours < v[hourly] - _RESOLUTION[_COL[hourly]]
+            _flag(f"{average}_below_{hourly}", mask, (average, hourly),
+                  f"The {hours}-hr average is too low to include this hour's {hourly} reading")
+    return flags, violations
+
+
+class StationHistory:
+    """Ring buffers of the last `window` readings per station, for rolling median/MAD"""
+
+    def __init__(self, window: int = WINDOW):
+        self.window = window
+        self._index = {}
+        # float64 like the incoming readings, so a repeated value compares exactly
+        self._buffers = np.full((16, window, len(FEATURES)), np.nan)
+        self._pos = np.zeros(16, dtype=np.int64)
+        self._count = np.zeros(16, dtype=np.int64)
+
+    def rows(self, stations) -> np.ndarray:
+        """Buffer row for each station id, growing the buffers when new stations appear"""
+        for station in stations:
+            if station not in self._index:
+                self._index[station] = len(self._index)
+        needed = len(self._index)
+        if needed > len(self._buffers):
+            grow = max(needed, 2 * len(self._buffers)) - len(self._buffers)
+            self._buffers = np.concatenate(
+                [self._buffers, np.full((grow, self.window, len(FEATURES)), np.nan)])
+            self._pos = np.concatenate([self._pos, np.zeros(grow, dtype=np.int64)])
+            self._count = np.concatenate([self._count, np.zeros(grow, dtype=np.int64)])
+        return np.array([self._index[s] for s in stations], dtype=np.int64)
+
+    def check(self, rows: np.ndarray, values: np.ndarray):
+        """(spike, stuck, median) for one reading per distinct buffer row"""
+        history = self._buffers[rows]                     # (m, window, 14)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # stations without history yet
+            median = np.nanmedian(history, axis=1)
+            mad = np.nanmedian(np.abs(history - median[:, np.newaxis]), axis=1)
+        scale = 1.4826 * np.maximum(mad, _RESOLUTION)
+        count = self._count[rows][:, np.newaxis]
+        with np.errstate(invalid="ignore"):
+            spike = (count >= MIN_HISTORY) & (np.abs(values - median) > SPIKE_Z * scale)
+
+        # The current reading plus the last STUCK_READINGS - 1 entries, most recent first
+        recent = (self._pos[rows][:, np.newaxis] - 1 - np.arange(STUCK_READINGS - 1)) % self.window
+        last = history[np.arange(len(rows))[:, np.newaxis], recent]      # (m, STUCK_READINGS - 1, 14)
+        with np.errstate(invalid="ignore"):
+            stuck = ((count >= STUCK_READINGS - 1) & _STUCK_CHECKED & (values >= _STUCK_FLOOR)
+                     & np.all(np.abs(last - values[:, np.newaxis]) < _RESOLUTION / 2, axis=1))
+        return spike, stuck, median
+
+    def update(self, rows: np.ndarray, values: np.ndarray):
+        """Append one reading per distinct buffer row"""
+        self._buffers[rows, self._pos[rows] % self.window] = values
+        self._pos[rows] = (self._pos[rows] + 1) % self.window
+        self._count[rows] += 1
+
+
+class SensorQC:
+    """Rule checks plus per-station robust statistics; policy is "impute" or "quarantine" """
+
+    def __init__(self, policy: str = "impute", window: int = WINDOW):
+        if policy not in ("impute", "quarantine"):
+            raise ValueError(f"Unknown QC policy {policy!r}")
+        self.policy = policy
+        self.history = StationHistory(window)
+        self.flagged = 0
+        self.quarantined = 0
+
+    def process(self, stations, values) -> dict:
+        """
+        Check a batch of readings, one station id per row of an (n, 14) array in
+        FEATURES order. Returns {"values", "flags", "reasons", "quarantined"}, where
+        values holds the readings with flagged features imputed.
+        """
+        values = np.array(values, dtype=float)
+        flags, violations = check_rules(values)
+        reasons = [[] for _ in range(len(values))]
+        for rule, (mask, _) in violations.items():
+            for i in np.flatnonzero(mask):
+                reasons[i].append(rule)
+
+        median = np.full(values.shape, np.nan)
+        rows = self.history.rows(stations)
+        # A station appearing more than once is processed in order, one wave per repeat
+        wave = np.zeros(len(rows), dtype=np.int64)
+        seen = {}
+        for i, row in enumerate(rows):
+            wave[i] = seen.get(row, 0)
+            seen[row] = wave[i] + 1
+        for w in range(wave.max() + 1 if len(rows) else 0):
+            batch = np.flatnonzero(wave == w)
+            spike, stuck, median[batch] = self.history.check(rows[batch], values[batch])
+            flags[batch] |= spike | stuck
+            for i in batch[spike.any(axis=1)]:
+                reasons[i].append("spike")
+            for i in batch[stuck.any(axis=1)]:
+                reasons[i].append("stuck")
+            self.history.update(rows[batch], values[batch])
+
+        flagged_rows = flags.any(axis=1)
+        self.flagged += int(flagged_rows.sum())
+        if self.policy == "quarantine":
+            quarantined = flagged_rows
+            self.quarantined += int(quarantined.sum())
+        else:
+            quarantined = np.zeros(len(values), dtype=bool)
+            values = np.where(flags, median, values)
+        return {"values": values, "flags": flags, "reasons": reasons, "quarantined": quarantined}
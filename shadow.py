@@ -0,0 +1,164 @@
+"""
+Shadow scoring of a candidate model bundle on live traffic.
+
+predict_aqi hands every input vector, with its primary AQI and latency, to
+ShadowScorer.submit. That is a non-blocking put on a bounded queue, and when the queue
+is full the item is dropped rather than waiting. A daemon thread drains the queue in
+micro-batches and scores each batch with the candidate bundle in one vectorized call.
+It records the AQI delta, whether the category flipped, and per-model latency in a
+local SQLite store. Users never see candidate output.
+
+Latency is like for like: primary_model_ms and candidate_model_ms both time only the
+point model's predict call on one already-transformed row, so neither includes the
+feature transform, interval members, the app's cache or the batch. The candidate is
+re-run one row at a time for this. The primary latency is None (NULL) when the
+prediction was served from the app's cache; summary() leaves those rows out of the
+latency comparison.
+
+    python shadow.py report shadow.sqlite
+"""
+import argparse
+import json
+import queue
+import sqlite3
+import sys
+import threading
+import time
+
+import numpy as np
+
+from schema import FEATURES, aqi_band_index
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS shadow_predictions (
+    ts REAL NOT NULL,
+    primary_version TEXT,
+    candidate_version TEXT,
+    primary_aqi INTEGER,
+    candidate_aqi INTEGER,
+    delta INTEGER,
+    category_flip INTEGER,
+    primary_model_ms REAL,
+    candidate_model_ms REAL,
+    inputs TEXT
+)
+"""
+
+
+class ShadowScorer:
+    """Scores submitted inputs with a candidate bundle off the request path"""
+
+    def __init__(self, bundle_dir, store_path, primary_version: str,
+                 batch_size: int = 64, max_wait: float = 0.5, queue_size: int = 10_000):
+        self.bundle_dir = bundle_dir
+        self.store_path = str(store_path)
+        self.primary_version = primary_version
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self._queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.scored = 0
+        self.error = None
+        self._thread = threading.Thread(target=self._run, name="shadow-scorer", daemon=True)
+        self._thread.start()
+
+    def submit(self, values, primary_aqi: int, primary_model_ms):
+        """Queue one prediction for shadow scoring; never blocks"""
+        try:
+            self._queue.put_nowait((time.time(), tuple(values), primary_aqi, primary_model_ms))
+        except queue.Full:
+            self.dropped += 1
+
+    def _next_batch(self):
+        """Block for one item, then take whatever else arrives within max_wait (up to batch_size)"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        import pandas as pd
+
+        from pipeline import load_bundle, predict_model_space, predict_transformed, transform_features
+
+        try:
+            # Loaded here, not in __init__, so enabling shadowing never delays a rerun
+            bundle = load_bundle(self.bundle_dir)
+        except Exception as e:
+            self.error = f"Could not load candidate bundle: {e}"
+            return
+        db = sqlite3.connect(self.store_path)
+        db.execute(_SCHEMA)
+
+        while True:
+            batch = self._next_batch()
+            frame = pd.DataFrame([values for _, values, _, _ in batch], columns=FEATURES)
+            try:
+                transformed = transform_features(frame, bundle)
+                candidate = np.rint(predict_transformed(transformed, bundle)).astype(int)
+                model_ms = []
+                for i in range(len(batch)):
+                    row = transformed.iloc[[i]]
+                    start = time.perf_counter()
+                    predict_model_space(row, bundle)
+                    model_ms.append((time.perf_counter() - start) * 1000)
+            except Exception as e:
+                self.error = f"Candidate scoring failed: {e}"
+                continue
+
+            primary = np.array([aqi for _, _, aqi, _ in batch])
+            flips = aqi_band_index(primary) != aqi_band_index(candidate)
+            db.executemany(
+                "INSERT INTO shadow_predictions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(ts, self.primary_version, bundle["version"], int(p), int(c), int(c - p), int(f),
+                  primary_ms, candidate_ms, json.dumps(values))
+                 for (ts, values, _, primary_ms), p, c, f, candidate_ms
+                 in zip(batch, primary, candidate, flips, model_ms)])
+            db.commit()
+            self.scored += len(batch)
+
+
+def summary(store_path) -> dict:
+    """Aggregate comparison of primary vs candidate from the shadow store"""
+    db = sqlite3.connect(str(store_path))
+    rows = db.execute(
+        "SELECT delta, category_flip, primary_model_ms, candidate_model_ms, candidate_version "
+        "FROM shadow_predictions"
+    ).fetchall()
+    if not rows:
+        return {"n": 0}
+    delta, flips, primary_ms, candidate_ms = (np.array(col, dtype=float) for col in list(zip(*rows))[:4])
+    primary_ms = primary_ms[~np.isnan(primary_ms)]  # NULL: served from the app's cache
+    return {
+        "n": len(rows),
+        "candidate_versions": sorted({r[4] for r in rows}),
+        "mean_delta": round(float(delta.mean()), 2),
+        "mean_abs_delta": round(float(np.abs(delta).mean()), 2),
+        "p95_abs_delta": round(float(np.percentile(np.abs(delta), 95)), 2),
+        "category_flip_rate": round(float(flips.mean()), 4),
+        "primary_model_ms_p50": round(float(np.median(primary_ms)), 3) if len(primary_ms) else None,
+        "primary_model_ms_n": len(primary_ms),
+        "candidate_model_ms_p50": round(float(np.median(candidate_ms)), 3),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    report = sub.add_parser("report", help="Summarise a shadow store")
+    report.add_argument("store", nargs="?", default="shadow.sqlite")
+    args = parser.parse_args(argv)
+
+    print(json.dumps(summary(args.store), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
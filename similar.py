@@ -0,0 +1,136 @@
+"""
+"Past hours that looked like this": nearest historical readings in model space.
+
+The index is built offline from an archive of readings with observed AQI. Rows go
+through pt_features like any model input, then every column is z-scored so no single
+pollutant dominates the distance. Wind direction is encoded as (sin, cos) so 350° and
+10° are neighbours. A scikit-learn KDTree over those vectors is joblib-dumped together
+with each record's AQI, raw readings, station and time:
+
+    python similar.py build archive.csv --station-col sitename --time-col date
+
+The app loads the dump with mmap_mode="r". The tree's arrays and the record columns
+stay on disk and are paged in on demand, so even millions of rows cost little resident
+memory, and a k-nearest query touches only a few leaves.
+"""
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from schema import FEATURES
+
+ROOT = Path(__file__).resolve().parent
+DEFAULT_INDEX = ROOT / "similar_index.joblib"
+_WIND = FEATURES.index("winddirec")
+
+
+def _encode(transformed: np.ndarray) -> np.ndarray:
+    """Model-space rows with wind direction replaced by its (sin, cos)"""
+    radians = np.deg2rad(transformed[:, _WIND])
+    rest = np.delete(transformed, _WIND, axis=1)
+    return np.column_stack([rest, np.sin(radians), np.cos(radians)])
+
+
+def build(path, bundle: dict, target_col="aqi", station_col="", time_col="", chunksize=500_000,
+          leaf_size=40) -> dict:
+    """The index payload for an archive of labelled readings"""
+    import pandas as pd
+    from sklearn.neighbors import KDTree
+
+    from pipeline import read_chunks, transform_features
+
+    extra = [c for c in (target_col, station_col, time_col) if c]
+    vectors, raw, aqi, stations, times = [], [], [], [], []
+    for chunk in read_chunks(path, chunksize, FEATURES + extra):
+        features = chunk[FEATURES].apply(pd.to_numeric, errors="coerce")
+        target = pd.to_numeric(chunk[target_col], errors="coerce")
+        keep = (features.notna().all(axis=1) & target.notna()).to_numpy()
+        if not keep.any():
+            continue
+        features = features[keep]
+        vectors.append(_encode(transform_features(features, bundle).to_numpy()))
+        raw.append(features.to_numpy(dtype=np.float32))
+        aqi.append(target[keep].to_numpy(dtype=np.float32))
+        if station_col:
+            stations.append(chunk[station_col][keep].astype(str).to_numpy())
+        if time_col:
+            times.append(pd.to_datetime(chunk[time_col][keep], errors="coerce").to_numpy("datetime64[h]"))
+
+    vectors = np.concatenate(vectors)
+    mean, scale = vectors.mean(axis=0), vectors.std(axis=0)
+    scale[scale == 0] = 1.0
+    return {
+        "version": bundle["version"],
+        "mean": mean,
+        "scale": scale,
+        "tree": KDTree((vectors - mean) / scale, leaf_size=leaf_size),
+        "aqi": np.concatenate(aqi),
+        "inputs": np.concatenate(raw),
+        # Fixed-width strings rather than objects, so they memory-map too
+        "station": np.concatenate(stations).astype("U") if stations else None,
+        "time": np.concatenate(times) if times else None,
+    }
+
+
+def load_index(bundle: dict, path=DEFAULT_INDEX):
+    """The memory-mapped index if it exists and was built for this model version, else None"""
+    import joblib
+
+    path = Path(path)
+    if not path.exists():
+        return None
+    index = joblib.load(path, mmap_mode="r")
+    if index.get("version") != bundle["version"]:
+        return None  # built in a different transformed space
+    return index
+
+
+def query(index: dict, inputs: dict, bundle: dict, k: int = 5) -> list:
+    """The k historical records nearest to one reading, closest first"""
+    import pandas as pd
+
+    from pipeline import transform_features
+
+    vector = _encode(transform_features(pd.DataFrame([inputs]), bundle).to_numpy())
+    distance, rows = index["tree"].query((vector - index["mean"]) / index["scale"], k=k)
+    records = []
+    for d, row in zip(distance[0], rows[0]):
+        records.append({
+            "distance": float(d),
+            "aqi": float(index["aqi"][row]),
+            "station": str(index["station"][row]) if index["station"] is not None else None,
+            "time": str(index["time"][row]) if index["time"] is not None else None,
+            "inputs": dict(zip(FEATURES, index["inputs"][row].tolist())),
+        })
+    return records
+
+
+def main(argv=None) -> int:
+    import joblib
+
+    from pipeline import load_bundle
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    make = sub.add_parser("build", help="Build the index from labelled historical readings")
+    make.add_argument("data", help="CSV or Parquet file with the model features and observed AQI")
+    make.add_argument("--bundle", default=str(ROOT))
+    make.add_argument("--target-col", default="aqi")
+    make.add_argument("--station-col", default="", help="Optional station column to show with matches")
+    make.add_argument("--time-col", default="", help="Optional timestamp column to show with matches")
+    make.add_argument("--leaf-size", type=int, default=40)
+    make.add_argument("--out", default=str(DEFAULT_INDEX))
+    args = parser.parse_args(argv)
+
+    bundle = load_bundle(args.bundle)
+    index = build(args.data, bundle, args.target_col, args.station_col, args.time_col, leaf_size=args.leaf_size)
+    # Uncompressed, so every array can be memory-mapped on load
+    joblib.dump(index, args.out)
+    print(f"{len(index['aqi']):,} records indexed for model {index['version']} -> {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
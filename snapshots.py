@@ -0,0 +1,221 @@
+"""
+Materialized hourly AQI per station, precomputed by a scheduled job and read by the app.
+
+Layout of a snapshot directory:
+
+    index.json           {"stations": [id, ...]}
+    2025-09-01.npy       float32 (stations, 24): AQI per station row and hour, NaN if missing
+
+A lookup is a dict access for the station row plus one element of a memory-mapped day
+file, so its cost doesn't depend on how many sessions ask. Day files are rewritten
+atomically; readers re-map a file when its mtime changes. New stations are appended to
+the index, so older day files can have fewer rows than the index.
+
+Windows can't replace a file that another process has mapped, so there readers load
+each day file into memory instead (a day is only stations x 24 float32s) and hold no
+handle that would block the writer. Readers keep the MAX_OPEN_DAYS most recently used
+days mapped and drop the rest.
+
+Each station is scored by its region's bundle through model_pool.score_by_region, the
+same routing the app uses for stations without a snapshot, and stations whose readings
+miss a feature are skipped in both (stations.is_complete), so both kinds agree.
+
+    # every hour, after the feed publishes (e.g. cron "15 * * * *")
+    python snapshots.py hourly --list-url http://.../stations.json --feed-url http://.../stations/{station}.json
+    # backfill from an archive with station, datetime and the model features
+    python snapshots.py backfill archive.csv --station-col sitename --time-col date
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from pathlib import Path
+
+import numpy as np
+
+from schema import FEATURES
+
+ROOT = Path(__file__).resolve().parent
+DEFAULT_DIR = ROOT / "snapshots"
+HOURS = 24
+MAX_OPEN_DAYS = 8   # day files a reader keeps mapped (LRU)
+# Memory-mapping keeps the file open, which blocks os.replace on Windows
+_MMAP_MODE = None if os.name == "nt" else "r"
+
+
+class SnapshotStore:
+    """Reader and writer for a snapshot directory"""
+
+    def __init__(self, directory=DEFAULT_DIR):
+        self.directory = Path(directory)
+        self._lock = threading.Lock()
+        self._index_mtime = None
+        self._rows = {}
+        self._days = OrderedDict()  # day -> (mtime_ns, memmap), least recently used first
+
+    def _day_path(self, day: date) -> Path:
+        return self.directory / f"{day.isoformat()}.npy"
+
+    def _index(self) -> dict:
+        """station -> row, re-read when index.json changes"""
+        path = self.directory / "index.json"
+        try:
+            mtime = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return {}
+        if mtime != self._index_mtime:
+            with self._lock:
+                stations = json.loads(path.read_text())["stations"]
+                self._rows = {station: row for row, station in enumerate(stations)}
+                self._index_mtime = mtime
+        return self._rows
+
+    def _day(self, day: date):
+        path = self._day_path(day)
+        try:
+            mtime = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            cached = self._days.get(day)
+            if cached is None or cached[0] != mtime:
+                cached = (mtime, np.load(path, mmap_mode=_MMAP_MODE))
+                self._days[day] = cached
+            self._days.move_to_end(day)
+            while len(self._days) > MAX_OPEN_DAYS:
+                self._days.popitem(last=False)
+        return cached[1]
+
+    def lookup(self, station: str, when: datetime):
+        """AQI for a station at the hour containing `when`, or None"""
+        row = self._index().get(station)
+        array = self._day(when.date())
+        if row is None or array is None or row >= array.shape[0]:
+            return None
+        value = float(array[row, when.hour])
+        return None if np.isnan(value) else value
+
+    def day(self, station: str, day: date):
+        """(24,) AQI for a station over one day (NaN where missing), or None"""
+        row = self._index().get(station)
+        array = self._day(day)
+        if row is None or array is None or row >= array.shape[0]:
+            return None
+        return np.array(array[row])
+
+    def write(self, records):
+        """Merge (station, datetime, aqi) records into the day files (single writer)"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        index_path = self.directory / "index.json"
+        index = json.loads(index_path.read_text()) if index_path.exists() else {"stations": []}
+        rows = {station: row for row, station in enumerate(index["stations"])}
+        for station, _, _ in records:
+            if station not in rows:
+                rows[station] = len(index["stations"])
+                index["stations"].append(station)
+        _atomic_write(index_path, lambda fh: fh.write(json.dumps(index).encode()))
+
+        by_day = {}
+        for station, when, aqi in records:
+            by_day.setdefault(when.date(), []).append((rows[station], when.hour, aqi))
+        for day, entries in by_day.items():
+            path = self._day_path(day)
+            array = np.full((len(rows), HOURS), np.nan, dtype=np.float32)
+            if path.exists():
+                old = np.load(path)
+                array[:old.shape[0]] = old
+            entry_rows, hours, values = (np.array(column) for column in zip(*entries))
+            array[entry_rows, hours] = values
+            _atomic_write(path, lambda fh: np.save(fh, array))
+        return len(by_day)
+
+
+def _atomic_write(path: Path, write):
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as fh:
+        write(fh)
+    os.replace(tmp, path)
+
+
+def hourly(store: SnapshotStore, feed, pool, when: datetime) -> int:
+    """Score every complete feed station's latest readings, one batch per region, and store them at `when`"""
+    import pandas as pd
+
+    from model_pool import score_by_region
+    from stations import StationFeedError, is_complete
+
+    stations, rows = [], []
+    for station in feed.stations():
+        try:
+            readings = feed.readings(station["id"])
+        except StationFeedError:
+            continue
+        if not is_complete(readings):
+            continue
+        stations.append(station)
+        rows.append(readings)
+    if not rows:
+        return 0
+    aqi = score_by_region(pd.DataFrame(rows, columns=FEATURES), [s.get("region") for s in stations], pool)
+    store.write([(s["id"], when, float(a)) for s, a in zip(stations, aqi)])
+    return len(stations)
+
+
+def backfill(store: SnapshotStore, path, pool, station_col: str, time_col: str, region_col: str = "",
+             chunksize: int = 500_000) -> int:
+    """Score an archive chunk by chunk, routing rows by region_col, and store every (station, hour)"""
+    import pandas as pd
+
+    from model_pool import score_by_region
+    from pipeline import read_chunks
+
+    extra = [station_col, time_col] + ([region_col] if region_col else [])
+    total = 0
+    for chunk in read_chunks(path, chunksize, FEATURES + extra):
+        features = chunk[FEATURES].apply(pd.to_numeric, errors="coerce")
+        regions = chunk[region_col].astype(str).to_numpy() if region_col else [None] * len(chunk)
+        aqi = score_by_region(features, regions, pool)
+        times = pd.to_datetime(chunk[time_col], errors="coerce")
+        valid = times.notna().to_numpy()
+        store.write([(str(s), t.to_pydatetime(), float(a)) for s, t, a
+                     in zip(chunk[station_col][valid], times[valid], aqi[valid])])
+        total += int(valid.sum())
+    return total
+
+
+def main(argv=None) -> int:
+    from model_pool import REGIONS_FILE, ModelPool
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", default=str(DEFAULT_DIR), help="Snapshot directory")
+    parser.add_argument("--regions", default=str(REGIONS_FILE),
+                        help="Region routing config, as used by the app (default: regions.json)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    hour = sub.add_parser("hourly", help="Score the live feed's current readings")
+    hour.add_argument("--list-url", required=True)
+    hour.add_argument("--feed-url", required=True)
+    fill = sub.add_parser("backfill", help="Score an archive of hourly readings")
+    fill.add_argument("data", help="CSV or Parquet file")
+    fill.add_argument("--station-col", default="sitename")
+    fill.add_argument("--time-col", default="date")
+    fill.add_argument("--region-col", default="", help="Region column for model routing (default: default region)")
+    args = parser.parse_args(argv)
+
+    store = SnapshotStore(args.dir)
+    pool = ModelPool.from_config(args.regions)
+    if args.command == "hourly":
+        from stations import StationFeed
+        when = datetime.now().replace(minute=0, second=0, microsecond=0)
+        count = hourly(store, StationFeed(args.feed_url, args.list_url), pool, when)
+        print(f"{count} stations scored for {when:%Y-%m-%d %H:00} -> {args.dir}")
+    else:
+        count = backfill(store, args.data, pool, args.station_col, args.time_col, args.region_col)
+        print(f"{count:,} station-hours scored -> {args.dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""
+Spatial AQI interpolation onto a regular lat/lon grid.
+
+Per-station predictions are interpolated onto a grid covering the stations. Each grid
+cell uses its k nearest stations, found with a KD-tree over local planar coordinates
+(km, equirectangular around the stations' mean latitude, which is accurate at city
+scale):
+
+- "idw":     inverse distance weighting, weights 1 / d**power
+- "kriging": ordinary kriging on the same k neighbours with an exponential variogram;
+             every cell's (k+1) x (k+1) system is solved in one batched np.linalg.solve.
+             Co-located stations are averaged into one; a singular system falls back to IDW
+
+Grids are cached per station snapshot, so reruns with the same predictions are free.
+A 320 x 320 (~100k cell) grid builds in well under a second on one core:
+
+    python spatial.py --cells 320 --stations 60
+"""
+import argparse
+import sys
+import time
+from functools import lru_cache
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+EARTH_KM_PER_DEG = 111.32
+
+
+def to_local_km(lat, lon, lat0):
+    """Equirectangular projection to km around latitude lat0"""
+    lat, lon = np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)
+    return np.column_stack([lon * EARTH_KM_PER_DEG * np.cos(np.radians(lat0)), lat * EARTH_KM_PER_DEG])
+
+
+def grid_axes(lat, lon, cells: int, pad: float = 0.1):
+    """Latitudes and longitudes of a cells x cells grid around the stations' bounding box"""
+    lat_lo, lat_hi = np.min(lat), np.max(lat)
+    lon_lo, lon_hi = np.min(lon), np.max(lon)
+    lat_pad = max((lat_hi - lat_lo) * pad, 0.01)
+    lon_pad = max((lon_hi - lon_lo) * pad, 0.01)
+    return (np.linspace(lat_lo - lat_pad, lat_hi + lat_pad, cells),
+            np.linspace(lon_lo - lon_pad, lon_hi + lon_pad, cells))
+
+
+def _neighbours(station_xy, cell_xy, k):
+    k = min(k, len(station_xy))
+    dist, idx = cKDTree(station_xy).query(cell_xy, k=k)
+    return dist.reshape(len(cell_xy), k), idx.reshape(len(cell_xy), k)
+
+
+def idw(station_xy, values, cell_xy, k=8, power=2.0):
+    dist, idx = _neighbours(station_xy, cell_xy, k)
+    weights = 1.0 / np.maximum(dist, 1e-6) ** power
+    return (weights * values[idx]).sum(axis=1) / weights.sum(axis=1)
+
+
+def _merge_colocated(station_xy, values, resolution_km=1e-3):
+    """Average the values of stations within resolution_km of each other (to the metre)"""
+    _, first, inverse = np.unique(np.round(station_xy / resolution_km), axis=0,
+                                  return_index=True, return_inverse=True)
+    inverse = inverse.ravel()
+    if len(first) == len(station_xy):
+        return station_xy, values
+    merged = np.bincount(inverse, weights=values) / np.bincount(inverse)
+    return station_xy[first], merged
+
+
+def ordinary_kriging(station_xy, values, cell_xy, k=8):
+    """
+    Local ordinary kriging; variogram sill = value variance, range = 1/3 of the station spread.
+    Co-located stations would make the system singular, so they are merged first; any
+    system that is still singular falls back to IDW.
+    """
+    station_xy, values = _merge_colocated(station_xy, values)
+    dist, idx = _neighbours(station_xy, cell_xy, k)
+    k = idx.shape[1]
+    if k < 2 or np.var(values) == 0:
+        return idw(station_xy, values, cell_xy, k)
+    spread = np.ptp(station_xy, axis=0).max()
+    sill, corr_range = np.var(values), max(spread / 3, 1e-3)
+
+    def gamma(h):
+        return sill * (1.0 - np.exp(-h / corr_range))
+
+    # Neighbour-to-neighbour semivariances, bordered for the unbiasedness constraint
+    pts = station_xy[idx]                                              # (cells, k, 2)
+    pair = np.linalg.norm(pts[:, :, None, :] - pts[:, None, :, :], axis=-1)
+    A = np.ones((len(cell_xy), k + 1, k + 1))
+    A[:, :k, :k] = gamma(pair)
+    A[:, k, k] = 0.0
+    b = np.ones((len(cell_xy), k + 1, 1))
+    b[:, :k, 0] = gamma(dist)
+    try:
+        weights = np.linalg.solve(A, b)[:, :k, 0]
+    except np.linalg.LinAlgError:
+        return idw(station_xy, values, cell_xy, k)
+    # Negative weights can overshoot; keep the surface within the observed range
+    return np.clip((weights * values[idx]).sum(axis=1), values.min(), values.max())
+
+
+@lru_cache(maxsize=16)
+def interpolate_snapshot(snapshot: tuple, cells: int = 320, method: str = "idw", k: int = 8):
+    """
+    Interpolate a station snapshot ((lat, lon, aqi), ...) onto a cells x cells grid.
+    Returns (lats, lons, grid) with grid[i, j] at (lats[i], lons[j]). Cached per snapshot.
+    """
+    lat, lon, aqi = (np.array(col, dtype=float) for col in zip(*snapshot))
+    lats, lons = grid_axes(lat, lon, cells)
+    lat0 = lat.mean()
+    mesh_lat, mesh_lon = np.meshgrid(lats, lons, indexing="ij")
+    station_xy = to_local_km(lat, lon, lat0)
+    cell_xy = to_local_km(mesh_lat.ravel(), mesh_lon.ravel(), lat0)
+    interpolate = ordinary_kriging if method == "kriging" else idw
+    grid = interpolate(station_xy, aqi, cell_xy, k=k).reshape(cells, cells)
+    return lats, lons, grid
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cells", type=int, default=320, help="Grid cells per side")
+    parser.add_argument("--stations", type=int, default=60)
+    parser.add_argument("--k", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    # Synthetic stations over a ~60 km city box
+    snapshot = tuple(zip(3.1 + rng.uniform(-0.3, 0.3, args.stations),
+                         101.6 + rng.uniform(-0.3, 0.3, args.stations),
+                         rng.uniform(20, 180, args.stations)))
+    for method in ("idw", "kriging"):
+        start = time.perf_counter()
+        _, _, grid = interpolate_snapshot(snapshot, args.cells, method, args.k)
+        print(f"{method:<8} {grid.size:,} cells in {time.perf_counter() - start:.2f}s "
+              f"(AQI {grid.min():.0f}-{grid.max():.0f})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""
+Live station readings from a configurable HTTP JSON feed.
+
+The feed is described by two URLs (set in st.secrets or passed directly):
+
+    STATION_LIST_URL = "http://localhost:8765/stations.json"
+    STATION_FEED_URL = "http://localhost:8765/stations/{station}.json"
+
+The list endpoint returns [{"id", "name", "lat", "lon"}, ...]. The per-station endpoint
+returns {"station": ..., "observed_at": ..., "readings": {<feature>: value, ...}},
+where <feature> uses the model's names (pm2.5, o3_8hr, ...) unless `field_map` says
+otherwise.
+
+Requests share one pooled keep-alive session. Concurrent requests for the same station
+are coalesced into a single upstream call, and responses are cached until the feed's
+next hourly publication, so every user session together costs the upstream at most one
+request per station per hour. Failures are cached too, for ERROR_TTL seconds, so an
+unreachable upstream costs one request (and one timeout) per URL per ERROR_TTL rather
+than one per rerun. stations_fixture.py serves a local copy for offline use.
+"""
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from datetime import datetime, timedelta
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from schema import FEATURES
+
+# Seconds a failed request is remembered and re-raised without contacting the upstream
+ERROR_TTL = 30.0
+
+
+class StationFeedError(RuntimeError):
+    """The feed could not be reached or returned an unusable payload"""
+
+
+def is_complete(readings: dict) -> bool:
+    """Whether readings cover every model feature; partial stations are never scored"""
+    return all(feature in readings for feature in FEATURES)
+
+
+def next_publication(now: datetime, publish_minute: int) -> datetime:
+    """The next hh:publish_minute after `now`, when the hourly feed refreshes"""
+    candidate = now.replace(minute=publish_minute, second=0, microsecond=0)
+    return candidate if candidate > now else candidate + timedelta(hours=1)
+
+
+class StationFeed:
+    """Pooled, coalescing, hourly-cached client for a station readings feed"""
+
+    def __init__(self, feed_url: str, list_url: str | None = None, field_map: dict | None = None,
+                 publish_minute: int = 10, pool_size: int = 8, timeout: float = 5.0):
+        self.feed_url = feed_url
+        self.list_url = list_url
+        self.field_map = {f: (field_map or {}).get(f, f) for f in FEATURES}
+        self.publish_minute = publish_minute
+        self.timeout = timeout
+
+        self._http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+        self._http.mount("http://", adapter)
+        self._http.mount("https://", adapter)
+
+        self._lock = threading.Lock()
+        self._cache = {}      # url -> (expires_monotonic, payload)
+        self._failures = {}   # url -> (expires_monotonic, error message)
+        self._inflight = {}   # url -> Future
+        self.upstream_requests = 0
+
+    def _expiry(self) -> float:
+        now = datetime.now()
+        return time.monotonic() + (next_publication(now, self.publish_minute) - now).total_seconds()
+
+    def _get_json(self, url: str):
+        """GET `url`, served from cache or by joining a request already in flight"""
+        with self._lock:
+            cached = self._cache.get(url)
+            if cached and cached[0] > time.monotonic():
+                return cached[1]
+            failed = self._failures.get(url)
+            if failed and failed[0] > time.monotonic():
+                raise StationFeedError(failed[1])
+            future = self._inflight.get(url)
+            leader = future is None
+            if leader:
+                future = self._inflight[url] = Future()
+                self.upstream_requests += 1
+
+        if not leader:
+            try:
+                return future.result(timeout=self.timeout * 2)
+            except FutureTimeoutError as e:
+                raise StationFeedError(f"Station feed request timed out: {url}") from e
+
+        try:
+            response = self._http.get(url, timeout=self.timeout)
+            response.raise_for_status()
+            payload = response.json()
+        except (requests.RequestException, ValueError) as e:
+            error = StationFeedError(f"Station feed request failed: {e}")
+            with self._lock:
+                self._failures[url] = (time.monotonic() + ERROR_TTL, str(error))
+                del self._inflight[url]
+            future.set_exception(error)
+            raise error from e
+
+        with self._lock:
+            self._cache[url] = (self._expiry(), payload)
+            self._failures.pop(url, None)
+            del self._inflight[url]
+        future.set_result(payload)
+        return payload
+
+    def stations(self) -> list:
+        """[{"id", "name", "lat", "lon"}, ...] from the list endpoint"""
+        if not self.list_url:
+            return []
+        return self._get_json(self.list_url)
+
+    def readings(self, station: str) -> dict:
+        """Latest readings for a station as {feature: float}; features the feed lacks are omitted"""
+        payload = self._get_json(self.feed_url.format(station=station))
+        values = payload.get("readings", payload)
+        readings = {}
+        for feature, field in self.field_map.items():
+            value = values.get(field)
+            if value is None:
+                continue
+            try:
+                readings[feature] = float(value)
+            except (TypeError, ValueError):
+                continue  # e.g. "ND" for no data
+        if not readings:
+            raise StationFeedError(f"Feed returned no usable readings for station {station!r}")
+        return readings
@@ -0,0 +1,102 @@
+"""
+Local stand-in for the station readings feed, for offline development and tests.
+
+Serves fixtures/stations.json over HTTP/1.1 with keep-alive:
+
+    GET /stations.json             -> [{"id", "name", "lat", "lon"}, ...]
+    GET /stations/<id>.json        -> {"station", "observed_at", "readings": {...}}
+    GET /_hits                     -> {"<path>": request count, ...}
+    POST /alerts                   -> webhook stand-in for alerts.py; received alerts at GET /alerts
+
+    python stations_fixture.py --port 8765
+
+then set STATION_LIST_URL / STATION_FEED_URL in .streamlit/secrets.toml (see stations.py).
+"""
+import argparse
+import json
+import sys
+import threading
+from collections import Counter
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+FIXTURE = Path(__file__).resolve().parent / "fixtures" / "stations.json"
+
+
+def make_handler(stations: dict):
+    hits = Counter()
+    alerts = []
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"   # keep-alive, so pooled clients reuse connections
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            with lock:
+                hits[self.path] += 1
+            if self.path == "/_hits":
+                return self._send_json(200, dict(hits))
+            if self.path == "/alerts":
+                with lock:
+                    return self._send_json(200, list(alerts))
+            if self.path == "/stations.json":
+                return self._send_json(200, [
+                    {k: s[k] for k in ("id", "name", "lat", "lon")} for s in stations.values()
+                ])
+            if self.path.startswith("/stations/") and self.path.endswith(".json"):
+                station = stations.get(self.path[len("/stations/"):-len(".json")])
+                if station:
+                    observed_at = datetime.now().replace(minute=0, second=0, microsecond=0)
+                    return self._send_json(200, {"station": station["id"],
+                                                 "observed_at": observed_at.isoformat(),
+                                                 "readings": station["readings"]})
+            self._send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/alerts":
+                return self._send_json(404, {"error": "not found"})
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            with lock:
+                alerts.append(json.loads(body))
+            self._send_json(202, {"received": len(alerts)})
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def serve(port: int = 8765, fixture=FIXTURE) -> ThreadingHTTPServer:
+    """Start the fixture server in a daemon thread and return it (call .shutdown() to stop)"""
+    stations = {s["id"]: s for s in json.loads(Path(fixture).read_text())}
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(stations))
+    threading.Thread(target=server.serve_forever, name="station-fixture", daemon=True).start()
+    return server
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fixture", default=str(FIXTURE))
+    args = parser.parse_args(argv)
+
+    server = serve(args.port, args.fixture)
+    print(f"Serving {args.fixture} on http://127.0.0.1:{args.port} (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
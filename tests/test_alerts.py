@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+
+from alerts import AlertEngine
+
+T0 = datetime(2025, 9, 1, 0, 0)
+
+
+class ListSink:
+    def __init__(self):
+        self.alerts = []
+
+    def deliver(self, alert):
+        self.alerts.append(alert)
+
+
+def run(subscriptions, readings, station="cheras"):
+    """Feed (hours after T0, aqi) readings; returns the subscription ids fired per reading"""
+    engine = AlertEngine(subscriptions, [ListSink()])
+    return [[a["subscription"] for a in engine.observe(station, T0 + timedelta(hours=h), aqi)]
+            for h, aqi in readings]
+
+
+THRESHOLD = {"id": "t", "station": "cheras", "type": "threshold", "threshold": 150, "hysteresis": 10}
+
+
+def test_threshold_fires_once_and_rearms_below_hysteresis():
+    fired = run([THRESHOLD], [(0, 100), (1, 160), (2, 155), (3, 145), (4, 160), (5, 135), (6, 160)])
+    assert fired == [[], ["t"], [], [], [], [], ["t"]]
+
+
+def test_crossing_during_cooldown_is_delivered_when_it_ends():
+    rule = {**THRESHOLD, "cooldown_minutes": 120}
+    fired = run([rule], [(0, 160), (0.5, 130), (1, 160), (1.5, 165), (2.1, 170), (2.5, 175)])
+    assert fired == [["t"], [], [], [], ["t"], []]
+
+
+def test_crossing_during_cooldown_is_dropped_if_it_rearms_first():
+    rule = {**THRESHOLD, "cooldown_minutes": 120}
+    fired = run([rule], [(0, 160), (0.5, 130), (1, 160), (1.5, 130), (3, 125), (4, 160)])
+    assert fired == [["t"], [], [], [], [], ["t"]]
+
+
+def test_wildcard_threshold_applies_to_every_station():
+    rule = {**THRESHOLD, "station": "*"}
+    assert run([rule], [(0, 100), (1, 160)], station="klang") == [[], ["t"]]
+
+
+WORSEN = {"id": "w", "station": "*", "type": "worsen", "steps": 2, "window_hours": 3}
+
+
+def test_worsen_fires_within_the_window():
+    # Good (0) -> Unhealthy for Sensitive Groups (2) within an hour
+    assert run([WORSEN], [(0, 40), (1, 120), (2, 125)]) == [[], ["w"], []]
+
+
+def test_worsen_ignores_readings_outside_the_window():
+    assert run([WORSEN], [(0, 40), (4, 120)]) == [[], []]
+
+
+def test_worsen_rearms_after_recovering():
+    fired = run([WORSEN], [(0, 40), (1, 120), (2, 45), (3, 130)])
+    assert fired == [[], ["w"], [], ["w"]]
+
+
+def test_worsen_during_cooldown_is_delivered_when_it_ends():
+    rule = {**WORSEN, "cooldown_minutes": 180}
+    fired = run([rule], [(0, 40), (1, 120), (2, 45), (2.5, 130), (3.5, 135), (4.5, 140)])
+    # Re-armed at 2 h and worse again at 2.5 h, but still cooling until 4 h
+    assert fired == [[], ["w"], [], [], [], ["w"]]
@@ -0,0 +1,73 @@
+import numpy as np
+
+from schema import FEATURES
+from sensor_qc import STUCK_READINGS, SensorQC
+
+# A clean reading from fixtures/stations.json (Cheras)
+CLEAN = {
+    "so2": 1, "co": 0.8, "o3": 42, "o3_8hr": 38, "pm10": 45.4, "pm2.5": 35.6, "no2": 31,
+    "nox": 35, "co_8hr": 0.7, "pm2.5_avg": 34.7, "pm10_avg": 37.6, "so2_avg": 1,
+    "windspeed": 2.2, "winddirec": 297,
+}
+# Hour-to-hour variation of the fine-grained hourly sensors
+WOBBLE = {"o3": 1.0, "pm10": 0.4, "pm2.5": 0.3, "no2": 1.0, "nox": 1.0, "windspeed": 0.1, "winddirec": 3.0}
+
+
+def stable_readings(hours):
+    rows = []
+    for hour in range(hours):
+        offset = (hour % 3) - 1   # -1, 0, 1, -1, ...
+        rows.append([CLEAN[f] + offset * WOBBLE.get(f, 0.0) for f in FEATURES])
+    return np.array(rows, dtype=float)
+
+
+def feed(qc, station, rows):
+    return [qc.process([station], row[np.newaxis]) for row in rows]
+
+
+def test_stable_clean_station_is_not_flagged():
+    # so2, co and the rolling averages stay exactly flat, as they do at a quiet site
+    qc = SensorQC("quarantine")
+    results = feed(qc, "cheras", stable_readings(48))
+    assert not any(r["flags"].any() for r in results)
+    assert not any(r["quarantined"].any() for r in results)
+    assert qc.flagged == qc.quarantined == 0
+
+
+def test_flat_low_coarse_and_averaged_values_are_not_stuck():
+    qc = SensorQC()
+    rows = stable_readings(24)
+    results = feed(qc, "cheras", rows)
+    for feature in ("so2", "so2_avg", "co", "co_8hr", "pm2.5_avg", "pm10_avg", "o3_8hr"):
+        column = FEATURES.index(feature)
+        assert not any(r["flags"][0, column] for r in results), feature
+
+
+def test_stuck_sensor_is_flagged_on_the_sixth_equal_reading():
+    qc = SensorQC()
+    rows = stable_readings(12)
+    o3 = FEATURES.index("o3")
+    rows[4:, o3] = 55.0
+    results = feed(qc, "cheras", rows)
+    flagged = [bool(r["flags"][0, o3]) for r in results]
+    first_stuck = 4 + STUCK_READINGS - 1
+    assert not any(flagged[:first_stuck])
+    assert all(flagged[first_stuck:])
+    assert "stuck" in results[first_stuck]["reasons"][0]
+
+
+def test_stuck_reading_is_quarantined():
+    qc = SensorQC("quarantine")
+    rows = stable_readings(12)
+    rows[4:, FEATURES.index("pm10")] = 123.4
+    results = feed(qc, "cheras", rows)
+    held = [bool(r["quarantined"][0]) for r in results]
+    assert held == [False] * (4 + STUCK_READINGS - 1) + [True] * (12 - 4 - STUCK_READINGS + 1)
+
+
+def test_rule_violation_is_flagged():
+    qc = SensorQC()
+    row = stable_readings(1)
+    row[0, FEATURES.index("nox")] = 10.0   # below no2
+    result = qc.process(["cheras"], row)
+    assert "nox_below_no2" in result["reasons"][0]
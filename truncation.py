@@ -0,0 +1,104 @@
+"""
+Faster, approximate scoring by evaluating only part of the LightGBM ensemble.
+
+The knob is the `num_iteration` argument of pipeline.predict_transformed/score_frame:
+
+    None      every tree (the default)
+    K         only the first K boosting iterations (LightGBM's own num_iteration)
+    "early"   per-row early exit: trees are evaluated in stages of STAGE_TREES, and a
+              row stops once the remaining trees can no longer move it across an AQI
+              category boundary. Its category then matches the full model exactly;
+              its AQI uses the midpoint of what the remaining trees could still add.
+
+The early-exit bound comes from the model dump. Each tree's smallest and largest leaf
+values are summed over the trees not evaluated yet. The category boundaries are mapped
+into model space with pt_target, which is monotonic.
+
+bench/truncation_curve.py measures accuracy against latency for both knobs, to pick
+a K per use case.
+"""
+import argparse
+
+import numpy as np
+
+from schema import AQI_BREAKPOINTS
+
+STAGE_TREES = 50
+
+
+def trees_arg(value: str):
+    """argparse type for --trees: a positive iteration count or 'early'"""
+    if value == "early":
+        return value
+    count = int(value)
+    if count <= 0:
+        raise argparse.ArgumentTypeError("--trees must be a positive number of iterations or 'early'")
+    return count
+
+
+def _booster(model):
+    return getattr(model, "booster_", model)
+
+
+def iterations(model) -> int:
+    """Iterations a default predict() uses: the best iteration when early stopping recorded one"""
+    best = getattr(model, "best_iteration_", None)
+    return best or _booster(model).current_iteration()
+
+
+def tree_bounds(model):
+    """(rest_min, rest_max): the smallest/largest sum trees k.. can add, for k = 0..n"""
+    n_trees = iterations(model)
+    lows, highs = np.zeros(n_trees + 1), np.zeros(n_trees + 1)
+    for k, tree in enumerate(_booster(model).dump_model()["tree_info"][:n_trees]):
+        leaves = []
+        stack = [tree["tree_structure"]]
+        while stack:
+            node = stack.pop()
+            if "leaf_value" in node:
+                leaves.append(node["leaf_value"])
+            else:
+                stack.extend((node["left_child"], node["right_child"]))
+        lows[k], highs[k] = min(leaves), max(leaves)
+    # Suffix sums; the trailing zero is "nothing left"
+    return np.cumsum(lows[::-1])[::-1], np.cumsum(highs[::-1])[::-1]
+
+
+def _cached_bounds(bundle: dict):
+    """Tree bounds and model-space category boundaries, computed once per bundle"""
+    if "tree_bounds" not in bundle:
+        boundaries = np.asarray(AQI_BREAKPOINTS, dtype=float) + 0.5  # bands use the rounded AQI
+        bundle["tree_bounds"] = (
+            *tree_bounds(bundle["model"]),
+            bundle["pt_target"].transform(boundaries.reshape(-1, 1)).ravel(),
+        )
+    return bundle["tree_bounds"]
+
+
+def predict_early_exit(transformed, bundle: dict, stage: int = STAGE_TREES):
+    """
+    (model-space prediction, trees_used) for already-transformed inputs, stopping each
+    row once its AQI category can no longer change.
+    """
+    rest_min, rest_max, boundaries = _cached_bounds(bundle)
+    booster = _booster(bundle["model"])
+    n_trees = len(rest_min) - 1
+    values = np.asarray(transformed, dtype=float)
+
+    raw = np.zeros(len(values))
+    used = np.full(len(values), n_trees)
+    active = np.arange(len(values))
+    for start in range(0, n_trees, stage):
+        count = min(stage, n_trees - start)
+        raw[active] += booster.predict(values[active], start_iteration=start, num_iteration=count,
+                                       raw_score=True)
+        end = start + count
+        lo, hi = raw[active] + rest_min[end], raw[active] + rest_max[end]
+        settled = np.searchsorted(boundaries, lo) == np.searchsorted(boundaries, hi)
+        used[active[settled]] = end
+        active = active[~settled]
+        if not active.size:
+            break
+
+    # Unevaluated trees contribute the midpoint of their range, which stays inside the band
+    return raw + (rest_min[used] + rest_max[used]) / 2, used
@@ -0,0 +1,67 @@
+"""
+Monte Carlo propagation of sensor error through the model.
+
+Every reading gets a Gaussian error with sigma = sqrt(absolute^2 + (relative * value)^2).
+NOISE_MODELS gives typical bands for low-cost sensors. Rolling averages are much less
+noisy than the hourly values they average. Perturbed vectors are clipped to the
+FEATURE_RANGES the sliders allow, and wind direction wraps around 360 degrees.
+
+All draws go through the pipeline in a single transform/predict/inverse call. A
+thousand rows cost about as much as a few single-row predictions.
+"""
+import numpy as np
+import pandas as pd
+
+from pipeline import score_frame
+from schema import AQI_CATEGORIES, FEATURE_RANGES, FEATURES, aqi_band_index
+
+# feature -> (absolute sigma in the feature's units, relative sigma)
+NOISE_MODELS = {
+    "so2":       (2.0, 0.10),
+    "co":        (0.1, 0.10),
+    "o3":        (3.0, 0.10),
+    "o3_8hr":    (1.5, 0.05),
+    "pm10":      (5.0, 0.15),
+    "pm2.5":     (3.0, 0.15),
+    "no2":       (3.0, 0.10),
+    "nox":       (4.0, 0.10),
+    "co_8hr":    (0.05, 0.05),
+    "pm2.5_avg": (1.0, 0.05),
+    "pm10_avg":  (2.0, 0.05),
+    "so2_avg":   (1.0, 0.05),
+    "windspeed": (0.3, 0.10),
+    "winddirec": (15.0, 0.0),
+}
+
+
+def perturb(inputs: dict, n: int, seed: int = 0, noise=NOISE_MODELS) -> np.ndarray:
+    """(n, 14) perturbed copies of one reading, in FEATURES order"""
+    values = np.array([float(inputs[f]) for f in FEATURES])
+    absolute = np.array([noise.get(f, (0.0, 0.0))[0] for f in FEATURES])
+    relative = np.array([noise.get(f, (0.0, 0.0))[1] for f in FEATURES])
+    sigma = np.sqrt(absolute ** 2 + (relative * values) ** 2)
+
+    draws = values + np.random.default_rng(seed).standard_normal((n, len(FEATURES))) * sigma
+    low = np.array([FEATURE_RANGES[f][0] for f in FEATURES])
+    high = np.array([FEATURE_RANGES[f][1] for f in FEATURES])
+    wind = FEATURES.index("winddirec")
+    draws[:, wind] %= 360.0
+    return np.clip(draws, low, high)
+
+
+def propagate(inputs: dict, bundle: dict, n: int = 1000, seed: int = 0, noise=NOISE_MODELS,
+              num_iteration=None) -> dict:
+    """AQI distribution and category probabilities under sensor noise"""
+    draws = perturb(inputs, n, seed, noise)
+    aqi = score_frame(pd.DataFrame(draws, columns=FEATURES), bundle, num_iteration)
+    counts = np.bincount(aqi_band_index(aqi), minlength=len(AQI_CATEGORIES))
+    p05, p50, p95 = np.percentile(aqi, [5, 50, 95])
+    return {
+        "n": n,
+        "mean": float(aqi.mean()),
+        "std": float(aqi.std()),
+        "p05": float(p05),
+        "p50": float(p50),
+        "p95": float(p95),
+        "bands": {name: float(c) / n for (name, _, _), c in zip(AQI_CATEGORIES, counts)},
+    }